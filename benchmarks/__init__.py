@@ -0,0 +1,3 @@
+"""
+Benchmarks for the pipeline stages on synthetic inputs.
+"""
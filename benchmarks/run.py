@@ -0,0 +1,283 @@
+"""
+Benchmark the pipeline stages on synthetic inputs and compare against stored baselines.
+
+Runs offline, e.g. for CI:
+
+    python -m benchmarks.run --sizes small --layouts grid organic
+
+Use `--update-baseline` to record the current timings as the new baselines. Exits with status 1 if
+any stage's wall time or peak memory regresses beyond the tolerances. A fixed calibration workload
+is timed before and after each case, and baseline wall times are scaled by the ratio of the run's
+median calibration times so that baselines recorded on another machine remain comparable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from cityseer import config
+
+from benchmarks import synthetic
+from process import (
+    centrality,
+    dataset_io,
+    dual_attributes,
+    dual_network,
+    landuse,
+    network_structures,
+    population,
+    premises,
+    profiling,
+    result_store,
+)
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = Path(__file__).parent / "baselines.json"
+CENT_DISTANCES = [200, 500, 1000, 2000]
+LU_DISTANCES = [100, 200, 500, 1000]
+CENT_VARIANTS = [
+    centrality.CentralityVariant("shortest", length_weighted=True),
+    centrality.CentralityVariant("simplest", length_weighted=True),
+    centrality.CentralityVariant("shortest"),
+    centrality.CentralityVariant("simplest"),
+    centrality.CentralityVariant("segment"),
+]
+# wall time increases below this are not flagged, as cityseer polls its rust calls every 0.1s and
+# so each call's wall time varies by up to 0.1s
+MIN_REGRESSION_SECONDS = 0.25
+# recorded with the stages of each case, as the median of repeats before and after each case
+CALIBRATION_STAGE = "calibration"
+CALIBRATION_REPEATS = 15
+
+
+def calibration_timings(repeats: int = CALIBRATION_REPEATS) -> list[float]:
+    """
+    Time repeats of a fixed array and interpreter workload, as a measure of the machine's speed.
+    """
+    values = np.random.default_rng(0).random(200_000)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        np.sort(values)
+        sum(math.sqrt(value) for value in range(100_000))
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def stage_metrics(profiler: profiling.StageProfiler) -> dict[str, dict[str, float]]:
+    """
+    Return the measurements compared against the baselines, per stage.
+    """
+    return {
+        record.name: {
+            "wall_s": record.wall_s,
+            "cpu_s": record.cpu_s,
+            "peak_rss_mb": record.peak_rss_mb,
+            "rss_delta_mb": record.rss_delta_mb,
+            "rows": record.rows,
+            "rows_per_s": record.rows_per_s,
+        }
+        for record in profiler.stages
+    }
+
+
+def run_pipeline(inputs: dict[str, Path], out_dir: Path) -> dict[str, dict[str, float]]:
+    """
+    Run each pipeline stage on the synthetic inputs, recording each stage.
+    """
+    profiler = profiling.StageProfiler()
+    streets_gdf = gpd.read_file(inputs["streets"])
+    bounds = gpd.read_file(inputs["neighbourhoods"])
+    bounds_union_geom = bounds.buffer(10).geometry.union_all()
+    with profiler.stage("network", rows=len(streets_gdf)):
+        nodes_gdf, edges_gdf = dual_network.dual_network_from_gpd(
+            streets_gdf, live_geom=bounds_union_geom
+        )
+        nodes_gdf["bearing"] = dual_attributes.primal_edge_bearings(
+            nodes_gdf["primal_edge"].to_numpy()
+        )
+    with profiler.stage("prune", rows=len(nodes_gdf)):
+        nodes_gdf, edges_gdf = network_structures.prune_network(
+            nodes_gdf, edges_gdf, max(CENT_DISTANCES)
+        )
+    node_count = len(nodes_gdf)
+    with profiler.stage("network_structure", rows=node_count):
+        structures = {
+            length_weighted: network_structures.build_network_structure(
+                nodes_gdf, edges_gdf, length_weighted
+            )
+            for length_weighted in [True, False]
+        }
+    nodes_centroids_gdf = gpd.GeoDataFrame(geometry=nodes_gdf.geometry.centroid, crs=nodes_gdf.crs)
+    joined_gdf = gpd.sjoin(nodes_centroids_gdf, bounds, how="left", predicate="intersects")
+    # grid nodes can fall on the edges between neighbourhoods
+    joined_gdf = joined_gdf[~joined_gdf.index.duplicated()]
+    nodes_gdf["district"] = joined_gdf["NOMDIS"]
+    results = result_store.ResultStore.create(out_dir / "results", nodes_gdf.index)
+    with profiler.stage("population", rows=node_count):
+        dual_points = shapely.from_wkt(nodes_gdf["dual_node"].to_numpy())
+        pop_samples = population.sample_rasters(
+            {"pop_dens": str(inputs["population"])},
+            shapely.get_x(dual_points),
+            shapely.get_y(dual_points),
+            index=nodes_gdf.index,
+            nodata=synthetic.POP_NODATA,
+        )
+        results.put(pop_samples)
+    for variant in CENT_VARIANTS:
+        with profiler.stage(f"centrality_{variant.prefix}{variant.method}", rows=node_count):
+            # cycles are reported per centrality variant and are overwritten in the store
+            results.put(
+                centrality.compute_centralities(
+                    [variant], structures.get, nodes_gdf.index, distances=CENT_DISTANCES
+                )
+            )
+    with profiler.stage("premises", rows=synthetic.PREMISES_DENSITY * len(streets_gdf)):
+        premises_gdf = premises.load_premises(str(inputs["premises"]))
+    with profiler.stage("assign", rows=len(premises_gdf)):
+        data_map = landuse.assign_premises(premises_gdf, structures[False])
+    landuses_map = dict(premises_gdf["division_desc"])
+    for compute_func, stage_name in [
+        (landuse.compute_mixed_uses, "mixed_uses"),
+        (landuse.compute_accessibilities, "accessibility"),
+    ]:
+        for angular in [False, True]:
+            with profiler.stage(f"{stage_name}{'_ang' if angular else ''}", rows=node_count):
+                results.put(
+                    compute_func(data_map, landuses_map, structures[False], LU_DISTANCES, angular)
+                )
+    with profiler.stage("population_access", rows=node_count):
+        pop_cells = population.raster_cells(inputs["population"], nodata=synthetic.POP_NODATA)
+        results.put(
+            population.compute_population_access(
+                pop_cells, structures[False], nodes_gdf.index, distances=LU_DISTANCES
+            )
+        )
+    nodes_gdf = nodes_gdf[nodes_gdf["district"].notna()]
+    with profiler.stage("write", rows=len(nodes_gdf)):
+        nodes_gdf = nodes_gdf.join(results.get(rows=nodes_gdf.index))
+        dataset_io.write_dataset(nodes_gdf, out_dir / "dataset")
+
+    return stage_metrics(profiler)
+
+
+def compare(
+    results: dict[str, dict[str, dict[str, float]]],
+    baselines: dict[str, dict[str, dict[str, float]]],
+    wall_tolerance: float,
+    rss_tolerance: float,
+    min_regression_seconds: float = MIN_REGRESSION_SECONDS,
+) -> list[str]:
+    """
+    Return a description of each stage exceeding its baseline by more than the tolerances.
+
+    Where both the results and the baselines of a case have a calibration stage, baseline wall
+    times are scaled by the ratio of the calibration times.
+    """
+    regressions = []
+    for case, stages in results.items():
+        case_baselines = baselines.get(case, {})
+        speed_ratio = 1.0
+        if CALIBRATION_STAGE in stages and CALIBRATION_STAGE in case_baselines:
+            speed_ratio = (
+                stages[CALIBRATION_STAGE]["wall_s"] / case_baselines[CALIBRATION_STAGE]["wall_s"]
+            )
+        for stage, metrics in stages.items():
+            baseline = case_baselines.get(stage)
+            if baseline is None or stage == CALIBRATION_STAGE:
+                continue
+            expected_wall = baseline["wall_s"] * speed_ratio
+            if (
+                metrics["wall_s"] > expected_wall * (1 + wall_tolerance)
+                and metrics["wall_s"] - expected_wall > min_regression_seconds
+            ):
+                regressions.append(
+                    f"{case} {stage}: wall {metrics['wall_s']}s vs baseline {baseline['wall_s']}s, "
+                    f"{expected_wall:.4f}s at {speed_ratio:.2f}x the baseline calibration time"
+                )
+            if metrics["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + rss_tolerance):
+                regressions.append(
+                    f"{case} {stage}: peak RSS {metrics['peak_rss_mb']}MB "
+                    f"vs baseline {baseline['peak_rss_mb']}MB"
+                )
+
+    return regressions
+
+
+def _load_json(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: list[str] | None = None, run_func: Callable = run_pipeline) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(synthetic.SIZES))
+    parser.add_argument("--layouts", nargs="+", default=["grid"], choices=synthetic.LAYOUTS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--wall-tolerance", type=float, default=0.5)
+    parser.add_argument("--rss-tolerance", type=float, default=0.25)
+    parser.add_argument("--min-regression-seconds", type=float, default=MIN_REGRESSION_SECONDS)
+    parser.add_argument("--output", type=Path, help="optional path for the JSON results")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+    config.QUIET_MODE = True
+
+    results = {}
+    timings = calibration_timings()
+    for size in args.sizes:
+        for layout in args.layouts:
+            case = f"{layout}-{size}"
+            logger.info(f"Benchmarking {case}")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                inputs = synthetic.write_inputs(tmp_dir, size, layout=layout, seed=args.seed)
+                results[case] = run_func(inputs, Path(tmp_dir))
+            timings.extend(calibration_timings())
+    # the machine's speed is taken over the whole run, as single timings are noisy on shared hosts
+    calibration = {"wall_s": round(float(np.median(timings)), 4)}
+    results = {case: {CALIBRATION_STAGE: calibration, **stages} for case, stages in results.items()}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    baselines = _load_json(args.baseline)
+    if args.update_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+            f.write("\n")
+        logger.info(f"Updated baselines at {args.baseline}")
+        return 0
+    regressions = compare(
+        results,
+        baselines,
+        args.wall_tolerance,
+        args.rss_tolerance,
+        min_regression_seconds=args.min_regression_seconds,
+    )
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    if not regressions:
+        logger.info("No regressions against baselines")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Synthetic street networks, premises, neighbourhoods, and population rasters for benchmarking.
+
+Inputs are generated deterministically per seed in EPSG:25830 around central Madrid, with the same
+columns as the real inputs so that the pipeline stages run on them unchanged.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+
+from process import premises_lu_schema
+
+CRS = 25830
+ORIGIN = (438_000.0, 4_472_000.0)
+# grid cells per side for each benchmark size
+SIZES = {"small": 16, "medium": 32, "large": 64}
+LAYOUTS = ("grid", "organic")
+SPACING = 100.0
+# premises per street segment
+PREMISES_DENSITY = 4
+POP_CELL_SIZE = 100.0
+POP_NODATA = -200
+
+
+def street_network(
+    cells: int,
+    layout: str = "grid",
+    spacing: float = SPACING,
+    seed: int = 0,
+) -> gpd.GeoDataFrame:
+    """
+    Generate a street network of `cells` x `cells` blocks.
+
+    The `organic` layout jitters the intersections, bends the segments, and removes a share of the
+    segments, approximating an irregular street pattern with dead ends.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}, expected one of {LAYOUTS}.")
+    rng = np.random.default_rng(seed)
+    cols, rows = np.meshgrid(np.arange(cells + 1), np.arange(cells + 1), indexing="ij")
+    xs = ORIGIN[0] + cols * spacing
+    ys = ORIGIN[1] + rows * spacing
+    if layout == "organic":
+        xs = xs + rng.uniform(-0.3, 0.3, xs.shape) * spacing
+        ys = ys + rng.uniform(-0.3, 0.3, ys.shape) * spacing
+    # horizontal then vertical segments between adjacent intersections
+    starts = np.concatenate(
+        [
+            np.column_stack([xs[:-1].ravel(), ys[:-1].ravel()]),
+            np.column_stack([xs[:, :-1].ravel(), ys[:, :-1].ravel()]),
+        ]
+    )
+    ends = np.concatenate(
+        [
+            np.column_stack([xs[1:].ravel(), ys[1:].ravel()]),
+            np.column_stack([xs[:, 1:].ravel(), ys[:, 1:].ravel()]),
+        ]
+    )
+    mids = (starts + ends) / 2
+    if layout == "organic":
+        mids = mids + rng.uniform(-0.1, 0.1, mids.shape) * spacing
+        keep = rng.random(len(starts)) > 0.12
+        starts, mids, ends = starts[keep], mids[keep], ends[keep]
+    coords = np.stack([starts, mids, ends], axis=1)
+    geoms = shapely.linestrings(coords)
+
+    return gpd.GeoDataFrame(
+        {"clased": "Calle", "nombre": [f"calle_{i}" for i in range(len(geoms))]},
+        geometry=geoms,
+        crs=CRS,
+    )
+
+
+def neighbourhoods(streets_gdf: gpd.GeoDataFrame, splits: int = 2) -> gpd.GeoDataFrame:
+    """
+    Split the network extents into `splits` x `splits` districts of four neighbourhoods each.
+    """
+    min_x, min_y, max_x, max_y = streets_gdf.total_bounds
+    x_edges = np.linspace(min_x, max_x, splits * 2 + 1)
+    y_edges = np.linspace(min_y, max_y, splits * 2 + 1)
+    records = []
+    for i in range(splits * 2):
+        for j in range(splits * 2):
+            records.append(
+                {
+                    "NOMDIS": f"district_{i // 2}_{j // 2}",
+                    "NOMBRE": f"neighbourhood_{i}_{j}",
+                    "geometry": shapely.box(x_edges[i], y_edges[j], x_edges[i + 1], y_edges[j + 1]),
+                }
+            )
+
+    return gpd.GeoDataFrame(records, geometry="geometry", crs=CRS)
+
+
+def premises(streets_gdf: gpd.GeoDataFrame, count: int, seed: int = 0) -> gpd.GeoDataFrame:
+    """
+    Generate census premises per the raw census columns, with a share of null and no activity rows.
+    """
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = streets_gdf.total_bounds
+    sections = list(premises_lu_schema.section_schema)
+    divisions = list(premises_lu_schema.division_schema)
+
+    return gpd.GeoDataFrame(
+        {
+            "id_local": np.arange(count) + 100_000,
+            "id_distrito_local": rng.integers(1, 22, count),
+            "desc_distrito_local": "CENTRO",
+            "id_barrio_local": rng.integers(1, 132, count),
+            "desc_barrio_local": "SOL",
+            "cod_barrio_local": rng.integers(1, 132, count),
+            "id_seccion_censal_local": rng.integers(1, 2500, count),
+            "desc_seccion_censal_local": "001",
+            "id_seccion": rng.integers(1, len(sections), count),
+            "desc_seccion": rng.choice(sections, count),
+            "id_division": rng.integers(1, len(divisions), count),
+            "desc_division": rng.choice(divisions, count),
+            "id_epigrafe": rng.integers(1, 500, count),
+            "desc_epigrafe": "epigrafe",
+        },
+        geometry=shapely.points(rng.uniform(min_x, max_x, count), rng.uniform(min_y, max_y, count)),
+        crs=CRS,
+    )
+
+
+def population_raster(streets_gdf: gpd.GeoDataFrame, path: str | Path, seed: int = 0) -> None:
+    """
+    Write a tiled GeoTIFF population raster covering the network, with a nodata border.
+    """
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = streets_gdf.total_bounds
+    width = int(np.ceil((max_x - min_x) / POP_CELL_SIZE)) + 2
+    height = int(np.ceil((max_y - min_y) / POP_CELL_SIZE)) + 2
+    values = rng.gamma(2.0, 20.0, (height, width)).astype(np.float32)
+    values[[0, -1], :] = POP_NODATA
+    values[:, [0, -1]] = POP_NODATA
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=width,
+        height=height,
+        count=1,
+        dtype="float32",
+        crs=f"EPSG:{CRS}",
+        transform=from_origin(
+            min_x - POP_CELL_SIZE, max_y + POP_CELL_SIZE, POP_CELL_SIZE, POP_CELL_SIZE
+        ),
+        nodata=POP_NODATA,
+        tiled=True,
+        blockxsize=16,
+        blockysize=16,
+    ) as dataset:
+        dataset.write(values, 1)
+
+
+def write_inputs(
+    out_dir: str | Path,
+    size: str,
+    layout: str = "grid",
+    seed: int = 0,
+) -> dict[str, Path]:
+    """
+    Write the synthetic inputs for a benchmark size and layout, returning the paths per input.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    streets_gdf = street_network(SIZES[size], layout=layout, seed=seed)
+    paths = {
+        "streets": out_dir / "street_network.gpkg",
+        "neighbourhoods": out_dir / "neighbourhoods.gpkg",
+        "premises": out_dir / "premises_activities.gpkg",
+        "population": out_dir / "population_clipped.tif",
+    }
+    streets_gdf.to_file(paths["streets"])
+    neighbourhoods(streets_gdf).to_file(paths["neighbourhoods"])
+    premises(streets_gdf, len(streets_gdf) * PREMISES_DENSITY, seed=seed).to_file(paths["premises"])
+    population_raster(streets_gdf, paths["population"], seed=seed)
+
+    return paths
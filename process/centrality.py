@@ -0,0 +1,353 @@
+"""
+Single driver for the shortest, simplest, and segment centrality variants.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from cityseer import config, rustalgos, sampling
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+CENTRALITY_METHODS = ("shortest", "simplest", "segment")
+# per column summaries of the relative errors of sampled centralities
+ERROR_COLS = [
+    "distance",
+    "sample_fraction",
+    "expected_sources",
+    "rel_error_median",
+    "rel_error_p90",
+]
+
+
+@dataclass(frozen=True)
+class CentralityVariant:
+    """
+    A centrality method run against either the unweighted or the length weighted network structure.
+    """
+
+    method: str
+    length_weighted: bool = False
+
+    def __post_init__(self) -> None:
+        if self.method not in CENTRALITY_METHODS:
+            raise ValueError(
+                f"Unknown centrality method {self.method}, expected one of {CENTRALITY_METHODS}."
+            )
+        if self.method == "segment" and self.length_weighted:
+            raise ValueError("Segment centralities are not weighted by node weights.")
+
+    @property
+    def prefix(self) -> str:
+        return "cc_lw_" if self.length_weighted else "cc_"
+
+
+def col_key(prefix: str, measure: str, distance: int, angular: bool = False) -> str:
+    """
+    Format an output column label, e.g. `cc_lw_harmonic_500_ang`.
+    """
+    key = f"{prefix}{measure}_{distance}"
+    if angular:
+        key += "_ang"
+    return key
+
+
+def _unpack_shortest(
+    result: rustalgos.centrality.CentralityShortestResult,
+    prefix: str,
+    distances: list[int],
+    temp_data: dict[str, np.ndarray],
+) -> None:
+    for measure_key, attr_key in [
+        ("beta", "node_beta"),
+        ("density", "node_density"),
+        ("farness", "node_farness"),
+        ("harmonic", "node_harmonic"),
+        ("betweenness", "node_betweenness"),
+        ("betweenness_beta", "node_betweenness_beta"),
+    ]:
+        for distance in distances:
+            temp_data[col_key(prefix, measure_key, distance)] = getattr(result, attr_key)[distance]
+    for distance in distances:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            temp_data[col_key(prefix, "hillier", distance)] = (
+                result.node_density[distance] ** 2 / result.node_farness[distance]
+            )
+        # cycles do not depend on node weights so are written once without a weighting prefix
+        temp_data[col_key("cc_", "cycles", distance)] = result.node_cycles[distance]
+
+
+def _unpack_simplest(
+    result: rustalgos.centrality.CentralitySimplestResult,
+    prefix: str,
+    distances: list[int],
+    temp_data: dict[str, np.ndarray],
+) -> None:
+    for measure_key, attr_key in [
+        ("density", "node_density"),
+        ("harmonic", "node_harmonic"),
+        ("farness", "node_farness"),
+        ("betweenness", "node_betweenness"),
+    ]:
+        for distance in distances:
+            temp_data[col_key(prefix, measure_key, distance, angular=True)] = getattr(
+                result, attr_key
+            )[distance]
+    for distance in distances:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            temp_data[col_key(prefix, "hillier", distance, angular=True)] = (
+                result.node_density[distance] ** 2 / result.node_farness[distance]
+            )
+
+
+def _unpack_segment(
+    result: rustalgos.centrality.CentralitySegmentResult,
+    prefix: str,
+    distances: list[int],
+    temp_data: dict[str, np.ndarray],
+) -> None:
+    for measure_key, attr_key in [
+        ("seg_density", "segment_density"),
+        ("seg_harmonic", "segment_harmonic"),
+        ("seg_beta", "segment_beta"),
+        ("seg_betweenness", "segment_betweenness"),
+    ]:
+        for distance in distances:
+            temp_data[col_key(prefix, measure_key, distance)] = getattr(result, attr_key)[distance]
+
+
+def compute_centralities(
+    variants: Sequence[CentralityVariant],
+    get_network_structure: Callable[[bool], rustalgos.graph.NetworkStructure],
+    node_index: pd.Index,
+    distances: list[int],
+    angular_scaling_unit: float = 90,
+    farness_scaling_offset: float = 1,
+    sample_probability: float | None = None,
+    sampling_weights: list[float] | None = None,
+    random_seed: int | None = None,
+) -> pd.DataFrame:
+    """
+    Compute the requested centrality variants and return them as one frame with prefixed columns.
+
+    Variants are grouped by network structure so that each structure is requested once. Each method
+    runs a single traversal per source node which accumulates closeness and betweenness together,
+    and the results are written directly to `cc_` (unweighted) or `cc_lw_` (length weighted)
+    columns. Sources can optionally be sampled from all nodes with `sample_probability`, scaled per
+    node by `sampling_weights`, in which case closeness and betweenness are scaled by the inverse of
+    each source's sampling probability.
+    """
+    if len(set(variants)) != len(variants):
+        raise ValueError("Duplicate centrality variants requested.")
+    temp_data: dict[str, np.ndarray] = {}
+    node_keys: list | None = None
+    for length_weighted in sorted({variant.length_weighted for variant in variants}, reverse=True):
+        network_structure = get_network_structure(length_weighted)
+        node_count = network_structure.street_node_count()
+        for variant in [v for v in variants if v.length_weighted is length_weighted]:
+            if variant.method == "shortest":
+                partial_func = partial(
+                    network_structure.centrality_shortest,
+                    distances=distances,
+                    compute_closeness=True,
+                    compute_betweenness=True,
+                    sample_probability=sample_probability,
+                    sampling_weights=sampling_weights,
+                    random_seed=random_seed,
+                )
+                unpack_func = _unpack_shortest
+            elif variant.method == "simplest":
+                partial_func = partial(
+                    network_structure.centrality_simplest,
+                    distances=distances,
+                    compute_closeness=True,
+                    compute_betweenness=True,
+                    angular_scaling_unit=angular_scaling_unit,
+                    farness_scaling_offset=farness_scaling_offset,
+                    sample_probability=sample_probability,
+                    sampling_weights=sampling_weights,
+                    random_seed=random_seed,
+                )
+                unpack_func = _unpack_simplest
+            else:
+                if sample_probability is not None:
+                    raise ValueError(
+                        "Segment centralities do not support sampling the source nodes."
+                    )
+                partial_func = partial(
+                    network_structure.segment_centrality,
+                    distances=distances,
+                    compute_closeness=True,
+                    compute_betweenness=True,
+                )
+                unpack_func = _unpack_segment
+            result = config.wrap_progress(
+                total=node_count,
+                rust_struct=network_structure,
+                partial_func=partial_func,
+                desc=f"{variant.prefix}{variant.method}",
+            )
+            if node_keys is None:
+                node_keys = list(result.node_keys_py)
+            unpack_func(result, variant.prefix, distances, temp_data)
+
+    return pd.DataFrame(temp_data, index=node_keys).reindex(node_index)
+
+
+def epsilon_sample_fractions(
+    distances: Sequence[int], epsilon: float = sampling.HOEFFDING_EPSILON
+) -> dict[int, float]:
+    """
+    Return the source sample fraction per distance for a target normalised error `epsilon`.
+
+    Fractions follow cityseer's Hoeffding bound at 90% confidence for the nodes reachable on a
+    canonical street grid, per `sampling.compute_distance_p`.
+    """
+    return {
+        distance: sampling.compute_distance_p(distance, epsilon=epsilon) for distance in distances
+    }
+
+
+def stratum_sample_rates(
+    strata: npt.ArrayLike, fraction: float, min_stratum_sources: int = 0
+) -> npt.NDArray[np.float64]:
+    """
+    Return the source sampling rate per node, `fraction` unless raised for small strata.
+
+    Strata with fewer than `min_stratum_sources` expected sources are sampled at the rate giving
+    that many, up to all of their nodes. Missing strata values form their own stratum.
+    """
+    codes = pd.factorize(np.asarray(strata), use_na_sentinel=False)[0]
+    stratum_sizes = np.bincount(codes)
+    stratum_rates = np.clip(min_stratum_sources / stratum_sizes, fraction, 1.0)
+
+    return stratum_rates[codes]
+
+
+def _set_hillier(data: pd.DataFrame, variants: Sequence[CentralityVariant], distance: int) -> None:
+    for variant in variants:
+        angular = variant.method == "simplest"
+        density = data[col_key(variant.prefix, "density", distance, angular)]
+        farness = data[col_key(variant.prefix, "farness", distance, angular)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            data[col_key(variant.prefix, "hillier", distance, angular)] = density**2 / farness
+
+
+def compute_centralities_sampled(
+    variants: Sequence[CentralityVariant],
+    get_network_structure: Callable[[bool], rustalgos.graph.NetworkStructure],
+    node_index: pd.Index,
+    distances: list[int],
+    sample_fractions: Mapping[int, float],
+    strata: npt.ArrayLike | None = None,
+    min_stratum_sources: int = 0,
+    replicates: int = 4,
+    random_seed: int | None = None,
+    angular_scaling_unit: float = 90,
+    farness_scaling_offset: float = 1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Compute the centrality variants from sampled sources for the distances in `sample_fractions`.
+
+    Distances without a fraction below 1 are computed exactly, as are segment centralities, which do
+    not support sampling. Cycles are not estimated for sampled distances and are NaN. Otherwise,
+    sources are sampled from all nodes, including those which are not live as their paths reach the
+    live nodes. Where `strata` are given in `node_index` order, e.g. districts, the rates of strata
+    with few nodes are raised per `stratum_sample_rates`. Simplest paths depend on the maximum
+    distance of each call, so angular centralities below the largest sampled distance can differ
+    slightly from the unsampled run, which traverses all distances at once.
+
+    The sample is drawn as `replicates` independent samples at the rates divided by `replicates`:
+    the estimates are the means of the replicate estimates, and the spread of the replicate
+    estimates gives their standard errors. Returns the centralities, and per sampled column the
+    median and 90th percentile relative errors at 95% confidence over the nodes with non-zero
+    estimates.
+    """
+    if replicates < 2:
+        raise ValueError("At least two replicates are required to estimate the errors.")
+    sampled = {
+        distance: fraction
+        for distance, fraction in sample_fractions.items()
+        if distance in distances and fraction < 1
+    }
+    exact_distances = [distance for distance in distances if distance not in sampled]
+    sampled_variants = [variant for variant in variants if variant.method != "segment"]
+    segment_variants = [variant for variant in variants if variant.method == "segment"]
+    partial_func = partial(
+        compute_centralities,
+        get_network_structure=get_network_structure,
+        node_index=node_index,
+        angular_scaling_unit=angular_scaling_unit,
+        farness_scaling_offset=farness_scaling_offset,
+    )
+    frames = []
+    exact_variants = sampled_variants if sampled else variants
+    if exact_distances and exact_variants:
+        frames.append(partial_func(exact_variants, distances=exact_distances))
+    if sampled and segment_variants:
+        # segment betweenness depends on the maximum distance of the call, so all distances are
+        # computed together as per the unsampled run
+        frames.append(partial_func(segment_variants, distances=distances))
+    rng = np.random.default_rng(random_seed)
+    strata = np.zeros(len(node_index)) if strata is None else np.asarray(strata)
+    t_score = stats.t.ppf(0.975, replicates - 1)
+    error_records = []
+    for distance, fraction in sorted(sampled.items()) if sampled_variants else []:
+        rates = stratum_sample_rates(strata, fraction, min_stratum_sources)
+        # each replicate samples nodes at the max rate, scaled per node by the weights
+        max_rate = rates.max()
+        sampling_weights = (rates / max_rate).tolist()
+        logger.info(
+            f"Sampling {rates.sum():.0f} of {len(node_index)} sources for {distance}m "
+            f"in {replicates} replicates"
+        )
+        replicate_frames = [
+            partial_func(
+                sampled_variants,
+                distances=[distance],
+                sample_probability=max_rate / replicates,
+                sampling_weights=sampling_weights,
+                random_seed=int(seed),
+            )
+            for seed in rng.integers(2**32, size=replicates)
+        ]
+        replicate_data = np.stack([frame.to_numpy(dtype=np.float64) for frame in replicate_frames])
+        estimates = pd.DataFrame(
+            replicate_data.mean(axis=0), index=node_index, columns=replicate_frames[0].columns
+        )
+        # ratios are taken from the mean density and farness
+        _set_hillier(estimates, sampled_variants, distance)
+        # cityseer's cycle counts from sampled sources don't scale to the exact counts
+        cycles_key = col_key("cc_", "cycles", distance)
+        if cycles_key in estimates.columns:
+            estimates[cycles_key] = np.nan
+        std_errs = replicate_data.std(axis=0, ddof=1) / np.sqrt(replicates)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_errs = t_score * std_errs / np.abs(estimates.to_numpy())
+        for col_idx, column in enumerate(estimates.columns):
+            if column == cycles_key:
+                continue
+            col_errs = rel_errs[:, col_idx]
+            col_errs = col_errs[np.isfinite(col_errs) & (estimates[column].to_numpy() != 0)]
+            error_records.append(
+                {
+                    "column": column,
+                    "distance": distance,
+                    "sample_fraction": fraction,
+                    "expected_sources": rates.sum(),
+                    "rel_error_median": np.median(col_errs) if len(col_errs) else np.nan,
+                    "rel_error_p90": np.quantile(col_errs, 0.9) if len(col_errs) else np.nan,
+                }
+            )
+        frames.append(estimates)
+    errors = pd.DataFrame.from_records(error_records, columns=["column", *ERROR_COLS])
+
+    return pd.concat(frames, axis=1), errors.set_index("column")
@@ -8,305 +8,470 @@ Extracts:
 
 from __future__ import annotations
 
+from pathlib import Path
+
 import geopandas as gpd
-import numpy as np
-from cityseer.metrics import layers, networks
-from cityseer.tools import graphs, io, util
-from rasterio import MemoryFile
-from rasterstats import point_query
-from shapely import geometry, wkt
-from tqdm import tqdm
+import pandas as pd
+import shapely
 
-from process import premises_lu_schema
+from process import (
+    centrality,
+    counts,
+    dataset_io,
+    dual_attributes,
+    dual_network,
+    landuse,
+    network_structures,
+    population,
+    premises,
+    premises_lu_schema,
+    profiling,
+    result_store,
+    scenarios,
+    stage_cache,
+    tiling,
+)
 
 # update the paths to correspond to your file locations if different to below
 # create a temp folder if not existing before running
 PATH_STREETS = "./data/street_network.gpkg"
 PATH_NEIGHBOURHOODS = "./data/neighbourhoods.gpkg"
-PATH_OUT_DATASET = "./temp/dataset.gpkg"
-PATH_OUT_DATASET_SUBSET = "./temp/dataset_subset.gpkg"
+PATH_OUT_DATASET = "./temp/dataset"
 PATH_PREMISES = "./data/premises_activities.gpkg"
 PATH_OUT_PREMISES = "./data/premises_clean.gpkg"
 PATH_POPULATION = "./data/population_clipped.tif"
+PATH_CACHE = "./temp/cache"
+PATH_OUT_RUN_REPORTS = "./temp/run_reports"
+PATH_OUT_RESULTS = "./temp/results"
+PATH_OUT_CENT_ERRORS = "./temp/centrality_errors.csv"
+PATH_OUT_SCENARIOS = "./temp/scenarios"
+# optional pedestrian / bicycle count series, e.g. "./data/2021_ped_counts.csv"
+PATH_COUNTS = None
+PATH_OUT_COUNTS = "./temp/counts.parquet"
+PATH_OUT_COUNT_STATIONS = "./temp/count_stations.parquet"
 
 CENT_DISTANCES = [200, 500, 1000, 2000, 5000, 10000]
 LU_DISTANCES = [100, 200, 500, 1000, 2000]
+# centrality variants - length weighted variants are written to cc_lw_ columns
+CENT_VARIANTS = [
+    centrality.CentralityVariant("shortest", length_weighted=True),
+    centrality.CentralityVariant("simplest", length_weighted=True),
+    centrality.CentralityVariant("shortest"),
+    centrality.CentralityVariant("simplest"),
+    centrality.CentralityVariant("segment"),
+]
+# to match Space Syntax convention of 0 - 180 = 0 - 2
+ANGULAR_SCALING_UNIT = 90
+FARNESS_SCALING_OFFSET = 0
+# optional tiled execution - live nodes are partitioned by district and tiles are run in a process
+# pool, with the same results as the single process run
+# tiles over CENT_TILE_MAX_NODES are split further to bound the memory per worker
+CENT_TILED = False
+CENT_TILE_MAX_NODES = 20000
+CENT_WORKERS = None
+# optional approximate centralities from sampled sources, as a sample fraction per distance
+# e.g. {5000: 0.2, 10000: 0.1}, or centrality.epsilon_sample_fractions([5000, 10000]) for the
+# fractions giving cityseer's default target error
+# districts are sampled for at least CENT_SAMPLE_MIN_DISTRICT_SOURCES sources, and the sample is
+# drawn in replicates to estimate the errors, which are written to PATH_OUT_CENT_ERRORS
+# segment centralities are always exact
+CENT_SAMPLE_FRACTIONS = {}
+CENT_SAMPLE_MIN_DISTRICT_SOURCES = 100
+CENT_SAMPLE_REPLICATES = 4
+CENT_SAMPLE_SEED = 0
+# when the premises census is updated, only land-uses for nodes within reach of changes are updated
+LU_INCREMENTAL = True
+# premises are read in chunks of this many features - set to None to read in one pass
+PREMISES_CHUNK_SIZE = 500_000
+
+# what-if street edits, scored against the baseline metrics once these are computed, e.g.
+# scenarios.Scenario("link", add_streets=(shapely.LineString([(x1, y1), (x2, y2)]),))
+# scenarios.Scenario("closure", remove_streets=("<dual node key>",))
+SCENARIOS = []
+
+# counting stations are snapped to the nearest written node within this distance
+COUNTS_MAX_SNAP_DIST = 50
+
+# stage outputs are cached per their inputs and parameters
+# set CACHE_ENABLED to False to force a full rerun
+CACHE_ENABLED = True
+CACHE_MAX_BYTES = 20 * 1024**3
+CACHE_MAX_AGE_DAYS = 30
+
+# each run writes a JSON report of per-stage timings, memory, and counts to PATH_OUT_RUN_REPORTS
+# the report is updated as each stage starts and finishes, so is kept if the run fails
+# stages named here are also stack sampled, e.g. {"centrality"}, with profiles written alongside
+PROFILE_STAGES = set()
+
+# %%
+# incompatible options are rejected before any stage runs
+if CENT_TILED and CENT_SAMPLE_FRACTIONS:
+    raise ValueError("Tiled centralities are exact, so can not be combined with sampling.")
+if SCENARIOS and CENT_SAMPLE_FRACTIONS:
+    raise ValueError("Scenarios are diffed against exact centralities, not sampled centralities.")
 
 # %%
-# open streets
-edges_gdf = gpd.read_file(PATH_STREETS)
-# convert multipart geoms to single
-edges_gdf_singles = edges_gdf.explode(drop=True)
-# generate networkx
-G_nx = io.nx_from_generic_geopandas(edges_gdf_singles)
-# removes degree 2 if found
-G_nx = graphs.nx_remove_filler_nodes(G_nx)
-G_nx = graphs.nx_remove_dangling_nodes(G_nx)
+# per-stage timings, memory, and counts are recorded for the run report
+profiler = profiling.StageProfiler(PATH_OUT_RUN_REPORTS, profile_stages=PROFILE_STAGES)
+# stage cache - reruns skip stages whose inputs and parameters are unchanged
+cache = stage_cache.StageCache(
+    PATH_CACHE,
+    max_bytes=CACHE_MAX_BYTES,
+    max_age_days=CACHE_MAX_AGE_DAYS,
+    enabled=CACHE_ENABLED,
+)
+network_key = cache.key(
+    "network",
+    cache.file_digest(PATH_STREETS),
+    cache.file_digest(PATH_NEIGHBOURHOODS),
+    cache.file_digest(dual_network.__file__),
+    cache.file_digest(dual_attributes.__file__),
+)
 
 # %%
 # city boundary
 bounds = gpd.read_file(PATH_NEIGHBOURHOODS)
 bounds_union_geom = bounds.buffer(10).geometry.unary_union
 
-# %%
-# decided not to decompose
-# prepare dual
-G_nx_dual = graphs.nx_to_dual(G_nx)
 
 # %%
-# computations only run for live nodes
-for nd_key, nd_data in tqdm(G_nx_dual.nodes(data=True), total=G_nx_dual.number_of_nodes()):
-    point = geometry.Point(nd_data["x"], nd_data["y"])
-    # set live nodes for nodes within boundary
-    if not bounds_union_geom.contains(point):
-        G_nx_dual.nodes[nd_key]["live"] = False
-    # extract edge bearings for visualisation
-    primal_edge = nd_data["primal_edge"]
-    G_nx_dual.nodes[nd_key]["bearing"] = util.measure_bearing(
-        list(primal_edge.coords)[0], list(primal_edge.coords)[-1]
+def prepare_network() -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    # open streets
+    streets_gdf = gpd.read_file(PATH_STREETS)
+    # multipart geoms are exploded, then nodes snapped, parallel edges merged, filler and dangling
+    # nodes removed, and the dual prepared, all as arrays per cityseer's networkx workflow
+    # decided not to decompose
+    # computations only run for live nodes, and node weights are set per primal edge lengths
+    # the unweighted structure is rebuilt from the same nodes with unit weights
+    nodes_gdf, edges_gdf = dual_network.dual_network_from_gpd(
+        streets_gdf, live_geom=bounds_union_geom
     )
+    # copy bearing info for primal
+    nodes_gdf["bearing"] = dual_attributes.primal_edge_bearings(nodes_gdf["primal_edge"].to_numpy())
+
+    return nodes_gdf, edges_gdf
+
+
+with profiler.stage("network") as record:
+    record.cached = cache.has("network", network_key)
+    nodes_gdf, edges_gdf = cache.run("network", network_key, prepare_network)
+    record.rows = len(nodes_gdf)
+    record.counts = {"live_nodes": int(nodes_gdf["live"].sum()), "edges": len(edges_gdf)}
 
-# %%
-# extract unweighted structure
-_nodes_gdf, _edges_gdf, network_structure = io.network_structure_from_nx(
-    G_nx_dual,
-)
 
 # %%
-# create separate network structure with length weighted data
-for nd_key, nd_data in tqdm(G_nx_dual.nodes(data=True), total=G_nx_dual.number_of_nodes()):
-    # set node weight accord to primal edge lengths
-    primal_edge = nd_data["primal_edge"]
-    G_nx_dual.nodes[nd_key]["weight"] = primal_edge.length
-
-# extract length weighted structure
-nodes_gdf, edges_gdf, network_structure_len_wt = io.network_structure_from_nx(
-    G_nx_dual,
+def prune_network() -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    # the streets are buffered well beyond the boundary, so nodes beyond the furthest centrality
+    # distance from any live node are dropped - live node centralities are unchanged
+    pruned_nodes_gdf, pruned_edges_gdf = network_structures.prune_network(
+        nodes_gdf, edges_gdf, max(CENT_DISTANCES)
+    )
+    # copy neighbourhood identifiers to nodes
+    nodes_centroids = pruned_nodes_gdf.geometry.centroid
+    nodes_centroids_gdf = gpd.GeoDataFrame(geometry=nodes_centroids, crs=pruned_nodes_gdf.crs)
+    joined_gdf = gpd.sjoin(nodes_centroids_gdf, bounds, how="left", predicate="intersects")
+    pruned_nodes_gdf = pruned_nodes_gdf.assign(
+        district=joined_gdf["NOMDIS"], neighb=joined_gdf["NOMBRE"]
+    )
+
+    return pruned_nodes_gdf, pruned_edges_gdf
+
+
+prune_key = cache.key(
+    "prune", network_key, cache.file_digest(network_structures.__file__), max(CENT_DISTANCES)
 )
+with profiler.stage("prune", rows=len(nodes_gdf)) as record:
+    record.cached = cache.has("prune", prune_key)
+    nodes_gdf, edges_gdf = cache.run("prune", prune_key, prune_network)
+    record.counts = {"nodes": len(nodes_gdf), "edges": len(edges_gdf)}
 
+# metrics are kept in a memory-mapped float32 column store instead of being joined to nodes_gdf
+# columns are only read back into memory for the nodes being written
+results = result_store.ResultStore.create(PATH_OUT_RESULTS, nodes_gdf.index)
 
 # %%
-# copy bearing info for primal
-def copy_primal_bearings(row):
-    return G_nx_dual.nodes[row.name]["bearing"]
+# network structures are rebuilt from the cached nodes and edges on first use
+network_structures_cache = {}
 
 
-nodes_gdf["bearing"] = nodes_gdf.apply(copy_primal_bearings, axis=1)
-# copy neighbourhood identifiers to nodes
-nodes_centroids = nodes_gdf.geometry.centroid
-nodes_centroids_gdf = gpd.GeoDataFrame(geometry=nodes_centroids, crs=nodes_gdf.crs)
-joined_gdf = gpd.sjoin(nodes_centroids_gdf, bounds, how="left", predicate="intersects")
-nodes_gdf["district"] = joined_gdf["NOMDIS"]
-nodes_gdf["neighb"] = joined_gdf["NOMBRE"]
+def get_network_structure(length_weighted: bool):
+    if length_weighted not in network_structures_cache:
+        network_structures_cache[length_weighted] = network_structures.build_network_structure(
+            nodes_gdf, edges_gdf, length_weighted
+        )
+    return network_structures_cache[length_weighted]
+
 
 # %%
 # population data
-with open(PATH_POPULATION, "rb") as f:
-    memfile = MemoryFile(f.read())
-    with memfile.open() as dataset:
-        pop_raster = dataset.read()
-        for node_idx, node_row in tqdm(nodes_gdf.iterrows(), total=len(nodes_gdf)):
-            pop_val = point_query(
-                wkt.loads(node_row["dual_node"]),
-                pop_raster,
-                interpolate="nearest",
-                nodata=-200,
-                affine=dataset.transform,
-            )[0]
-            if pop_val is None:
-                pop_val = 0
-            nodes_gdf.at[node_idx, "pop_dens"] = np.clip(pop_val, 0, np.inf)
-# convert from 100m2 to 1km2
-nodes_gdf["pop_dens"] = nodes_gdf["pop_dens"] * 100
+def sample_population() -> pd.Series:
+    dual_points = shapely.from_wkt(nodes_gdf["dual_node"].to_numpy())
+    pop_samples = population.sample_rasters(
+        {"pop_dens": PATH_POPULATION},
+        shapely.get_x(dual_points),
+        shapely.get_y(dual_points),
+        index=nodes_gdf.index,
+        nodata=-200,
+    )
+    # convert from 100m2 to 1km2
+    return pop_samples["pop_dens"] * 100
 
-# %%
-# run shortest path centrality
-nodes_gdf = networks.node_centrality_shortest(
-    network_structure_len_wt,
-    nodes_gdf,
-    distances=CENT_DISTANCES,
-)
-# run simplest path centrality
-nodes_gdf = networks.node_centrality_simplest(
-    network_structure_len_wt,
-    nodes_gdf,
-    distances=CENT_DISTANCES,
-    angular_scaling_unit=90,  # to match Space Syntax convention of 0 - 180 = 0 - 2
-    farness_scaling_offset=0,  # to match Space Syntax convention of 0 - 180 = 0 - 2
+
+population_key = cache.key(
+    "population",
+    prune_key,
+    cache.file_digest(PATH_POPULATION),
+    cache.file_digest(population.__file__),
 )
+with profiler.stage("population", rows=len(nodes_gdf)) as record:
+    record.cached = cache.has("population", population_key)
+    results.put(cache.run("population", population_key, sample_population))
+
 
 # %%
-# rename length weighted columns for saving (prevents overwriting)
-for col_extract in [
-    "cc_density",
-    "cc_beta",
-    "cc_farness",
-    "cc_harmonic",
-    "cc_hillier",
-    "cc_betweenness",
-    "cc_betweenness_beta",
-]:
-    new_col_extract = col_extract.replace("cc_", "cc_lw_")
-    nodes_gdf.columns = [col.replace(col_extract, new_col_extract) for col in nodes_gdf.columns]
+def compute_centralities() -> tuple[pd.DataFrame, pd.DataFrame]:
+    # one driver runs every variant and writes cc_ / cc_lw_ prefixed columns directly
+    if CENT_SAMPLE_FRACTIONS:
+        return centrality.compute_centralities_sampled(
+            CENT_VARIANTS,
+            get_network_structure,
+            nodes_gdf.index,
+            distances=CENT_DISTANCES,
+            sample_fractions=CENT_SAMPLE_FRACTIONS,
+            strata=nodes_gdf["district"],
+            min_stratum_sources=CENT_SAMPLE_MIN_DISTRICT_SOURCES,
+            replicates=CENT_SAMPLE_REPLICATES,
+            random_seed=CENT_SAMPLE_SEED,
+            angular_scaling_unit=ANGULAR_SCALING_UNIT,
+            farness_scaling_offset=FARNESS_SCALING_OFFSET,
+        )
+    if CENT_TILED:
+        tiles = tiling.partition_tiles(
+            nodes_gdf, tile_col="district", max_tile_nodes=CENT_TILE_MAX_NODES
+        )
+        cent_data = tiling.compute_centralities_tiled(
+            CENT_VARIANTS,
+            nodes_gdf,
+            edges_gdf,
+            tiles,
+            distances=CENT_DISTANCES,
+            angular_scaling_unit=ANGULAR_SCALING_UNIT,
+            farness_scaling_offset=FARNESS_SCALING_OFFSET,
+            max_workers=CENT_WORKERS,
+        )
+        return cent_data, pd.DataFrame(columns=centrality.ERROR_COLS)
+    cent_data = centrality.compute_centralities(
+        CENT_VARIANTS,
+        get_network_structure,
+        nodes_gdf.index,
+        distances=CENT_DISTANCES,
+        angular_scaling_unit=ANGULAR_SCALING_UNIT,
+        farness_scaling_offset=FARNESS_SCALING_OFFSET,
+    )
+    # exact centralities have no errors
+    return cent_data, pd.DataFrame(columns=centrality.ERROR_COLS)
 
 
-# %%
-# rerun without length weightings - renamed lw columns won't be overwritten
-# run shortest path centrality
-nodes_gdf = networks.node_centrality_shortest(
-    network_structure,
-    nodes_gdf,
-    distances=CENT_DISTANCES,
-)
-# run simplest path centrality
-nodes_gdf = networks.node_centrality_simplest(
-    network_structure,
-    nodes_gdf,
-    distances=CENT_DISTANCES,
-    angular_scaling_unit=90,  # to match Space Syntax convention of 0 - 180 = 0 - 2
-    farness_scaling_offset=0,  # to match Space Syntax convention of 0 - 180 = 0 - 2
+centrality_key = cache.key(
+    "centrality",
+    prune_key,
+    cache.file_digest(centrality.__file__),
+    CENT_DISTANCES,
+    CENT_VARIANTS,
+    ANGULAR_SCALING_UNIT,
+    FARNESS_SCALING_OFFSET,
+    CENT_SAMPLE_FRACTIONS,
+    CENT_SAMPLE_MIN_DISTRICT_SOURCES,
+    CENT_SAMPLE_REPLICATES,
+    CENT_SAMPLE_SEED,
 )
+with profiler.stage(
+    "centrality", rows=int(nodes_gdf["live"].sum()), variants=len(CENT_VARIANTS)
+) as record:
+    record.cached = cache.has("centrality", centrality_key)
+    cent_data, cent_errors = cache.run("centrality", centrality_key, compute_centralities)
+    results.put(cent_data)
+if not cent_errors.empty:
+    cent_errors.to_csv(PATH_OUT_CENT_ERRORS)
+# frames and network structures are released once stored so that memory does not grow per stage
+del cent_data, cent_errors
+network_structures_cache.clear()
+
 
 # %%
-# run segment path centrality
-nodes_gdf = networks.segment_centrality(
-    network_structure,
-    nodes_gdf,
-    distances=CENT_DISTANCES,
+def prepare_premises() -> gpd.GeoDataFrame:
+    # load only the retained columns, with descriptions as categoricals mapped to english
+    # null and no activity premises are removed per chunk
+    premises_eng = premises.load_premises(PATH_PREMISES, chunk_size=PREMISES_CHUNK_SIZE)
+    # save cleaned version
+    premises.write_premises(premises_eng, PATH_OUT_PREMISES)
+
+    return premises_eng
+
+
+premises_key = cache.key(
+    "premises",
+    cache.file_digest(PATH_PREMISES),
+    cache.file_digest(premises.__file__),
+    cache.file_digest(premises_lu_schema.__file__),
 )
+with profiler.stage("premises") as record:
+    record.cached = cache.has("premises", premises_key)
+    premises_eng = cache.run("premises", premises_key, prepare_premises)
+    record.rows = len(premises_eng)
 
-# %%
-# load premises
-premises = gpd.read_file(PATH_PREMISES)
 
 # %%
-# rename columns to english
-premises_eng = premises.rename(
-    columns={
-        "id_local": "local_id",
-        "id_distrito_local": "local_distr_id",
-        "desc_distrito_local": "local_distr_desc",
-        "id_barrio_local": "local_neighb_id",
-        "desc_barrio_local": "local_neighb_desc",
-        "cod_barrio_local": "local_neighb_code",
-        "id_seccion_censal_local": "local_census_section_id",
-        "desc_seccion_censal_local": "local_census_section_desc",
-        "id_seccion": "section_id",
-        "desc_seccion": "section_desc",
-        "id_division": "division_id",
-        "desc_division": "division_desc",
-        "id_epigrafe": "epigraph_id",
-        "desc_epigrafe": "epigraph_desc",
-        "geometry": "geometry",
-    }
+# land-uses and population access only need the network within reach of the furthest land-use
+# distance, and share the unweighted network structure
+lu_nodes_gdf, lu_edges_gdf = network_structures.prune_network(
+    nodes_gdf, edges_gdf, max(LU_DISTANCES)
 )
-# cast index to string
-premises_eng.index = premises_eng.index.astype(str)
-# map section descriptions to english
-premises_eng["section_desc"] = premises_eng["section_desc"].replace(
-    premises_lu_schema.section_schema
-)
-# map division descriptions to english
-premises_eng["division_desc"] = premises_eng["division_desc"].replace(
-    premises_lu_schema.division_schema
-)
-# remove none / null
-premises_eng = premises_eng[~premises_eng["section_desc"].str.contains("none|null", na=False)]
-premises_eng = premises_eng[
-    ~premises_eng["division_desc"].str.contains("Null Value at Origin|No Activity", na=False)
-]
-# %%
-# save cleaned version
-premises_eng.to_file(PATH_OUT_PREMISES)
+lu_network_structures_cache = {}
+
+
+def get_lu_network_structure():
+    if not lu_network_structures_cache:
+        lu_network_structures_cache[False] = network_structures.build_network_structure(
+            lu_nodes_gdf, lu_edges_gdf, length_weighted=False
+        )
+    return lu_network_structures_cache[False]
+
 
 # %%
-# compute mixed uses
-nodes_gdf, premises_eng = layers.compute_mixed_uses(
-    premises_eng,
-    landuse_column_label="division_desc",
-    nodes_gdf=nodes_gdf,
-    network_structure=network_structure,
-    distances=LU_DISTANCES,
-    compute_hill=False,
-    compute_hill_weighted=True,
-)
-# compute mixed uses using simplest paths
-nodes_gdf, premises_eng = layers.compute_mixed_uses(
-    premises_eng,
-    landuse_column_label="division_desc",
-    nodes_gdf=nodes_gdf,
-    network_structure=network_structure,
-    distances=LU_DISTANCES,
-    compute_hill=False,
-    compute_hill_weighted=True,
-    angular=True,
+def compute_landuses() -> pd.DataFrame:
+    landuse_base = cache.load("landuse_base", landuse_base_key) if LU_INCREMENTAL else None
+    if landuse_base is None:
+        network_structure = get_lu_network_structure()
+        # premises are assigned to the network once and reused for all land-use calls
+        data_map = landuse.assign_premises(premises_eng, network_structure)
+        lu_data = landuse.compute_landuses(
+            premises_eng,
+            network_structure,
+            nodes_gdf.index,
+            distances=LU_DISTANCES,
+            data_map=data_map,
+        )
+    else:
+        # only nodes within reach of added, removed, or reclassified premises are recomputed
+        prev_premises, prev_lu_data = landuse_base
+        lu_data = landuse.update_landuses(
+            prev_lu_data,
+            prev_premises,
+            premises_eng,
+            lu_nodes_gdf,
+            lu_edges_gdf,
+            distances=LU_DISTANCES,
+        )
+    cache.store(
+        "landuse_base", landuse_base_key, (landuse.premises_snapshot(premises_eng), lu_data)
+    )
+
+    return lu_data
+
+
+# the most recent land-use metrics and the premises they were computed from
+landuse_base_key = cache.key(
+    "landuse_base", prune_key, cache.file_digest(landuse.__file__), LU_DISTANCES
 )
-# compute accessibility
-nodes_gdf, premises_eng = layers.compute_accessibilities(
-    premises_eng,
-    landuse_column_label="division_desc",
-    accessibility_keys=[
-        "food_bev",
-        "creat_entert",
-        "retail",
-        "services",
-        "education",
-        "accommod",
-        "sports_rec",
-        "health",
-    ],
-    nodes_gdf=nodes_gdf,
-    network_structure=network_structure,
-    distances=LU_DISTANCES,
+landuse_key = cache.key(
+    "landuse", prune_key, premises_key, cache.file_digest(landuse.__file__), LU_DISTANCES
 )
-# compute accessibility using simplest paths
-nodes_gdf, premises_eng = layers.compute_accessibilities(
-    premises_eng,
-    landuse_column_label="division_desc",
-    accessibility_keys=[
-        "food_bev",
-        "creat_entert",
-        "retail",
-        "services",
-        "education",
-        "accommod",
-        "sports_rec",
-        "health",
-    ],
-    nodes_gdf=nodes_gdf,
-    network_structure=network_structure,
-    distances=LU_DISTANCES,
-    angular=True,
+with profiler.stage(
+    "landuse", rows=int(nodes_gdf["live"].sum()), premises=len(premises_eng)
+) as record:
+    record.cached = cache.has("landuse", landuse_key)
+    results.put(cache.run("landuse", landuse_key, compute_landuses))
+
+
+# %%
+def compute_population_access() -> pd.DataFrame:
+    # raster cells are assigned to the network as points weighted by their population
+    # cells beyond reach of the network are skipped
+    reach = max(LU_DISTANCES) + landuse.MAX_ASSIGN_DIST
+    min_x, min_y, max_x, max_y = lu_nodes_gdf.total_bounds
+    pop_cells = population.raster_cells(
+        PATH_POPULATION,
+        nodata=-200,
+        bounds=(min_x - reach, min_y - reach, max_x + reach, max_y + reach),
+    )
+    # people reachable within each distance, as cc_pop_sum_{distance}_nw / _wt
+    return population.compute_population_access(
+        pop_cells, get_lu_network_structure(), nodes_gdf.index, distances=LU_DISTANCES
+    )
+
+
+population_access_key = cache.key(
+    "population_access",
+    prune_key,
+    cache.file_digest(PATH_POPULATION),
+    cache.file_digest(population.__file__),
+    cache.file_digest(landuse.__file__),
+    LU_DISTANCES,
 )
+with profiler.stage("population_access", rows=int(nodes_gdf["live"].sum())) as record:
+    record.cached = cache.has("population_access", population_access_key)
+    results.put(cache.run("population_access", population_access_key, compute_population_access))
+lu_network_structures_cache.clear()
 
 # %%
 # save only live nodes
 nodes_gdf_live = nodes_gdf[nodes_gdf.live]
 # filter out non located per districts
 nodes_gdf_live = nodes_gdf[~nodes_gdf.district.isna()]
+# materialise the metrics for the written nodes only
+nodes_gdf_live = nodes_gdf_live.join(results.get(rows=nodes_gdf_live.index))
 # simplify geom if necessary
 nodes_gdf_live.geometry = nodes_gdf_live.geometry.simplify(2)
-# pare back data types to reduce size
-for col in nodes_gdf_live.select_dtypes(include=["int64"]).columns:
-    nodes_gdf_live[col] = nodes_gdf_live[col].astype("int32")
-for col in nodes_gdf_live.select_dtypes(include=["float64"]).columns:
-    nodes_gdf_live[col] = nodes_gdf_live[col].astype("float32")
-# save
-nodes_gdf_live.to_file(PATH_OUT_DATASET)
+# save as GeoParquet partitioned by district, with 64 bit columns pared back to 32 bits
+# district or column subsets can be read per dataset_io.read_dataset without a separate subset file
+with profiler.stage("write", rows=len(nodes_gdf_live), columns=nodes_gdf_live.shape[1]):
+    dataset_io.write_dataset(nodes_gdf_live, PATH_OUT_DATASET)
+
 
 # %%
-# save subset
-nodes_gdf_subset = nodes_gdf_live[
-    nodes_gdf_live["district"].isin(
-        [
-            "Centro",
-            "Arganzuela",
-            "Retiro",
-            "Salamanca",
-            "Chamartín",
-            "Tetuán",
-            "Chamberí",
-        ]
+# hourly count series per node, joinable to the dataset on the node key, as validation targets
+def load_counts() -> tuple[pd.DataFrame, pd.DataFrame]:
+    return counts.load_counts(PATH_COUNTS, nodes_gdf_live, max_snap_dist=COUNTS_MAX_SNAP_DIST)
+
+
+if PATH_COUNTS is not None:
+    counts_key = cache.key(
+        "counts",
+        prune_key,
+        cache.file_digest(PATH_COUNTS),
+        cache.file_digest(counts.__file__),
+        COUNTS_MAX_SNAP_DIST,
     )
-]
-nodes_gdf_subset.to_file(PATH_OUT_DATASET_SUBSET)
+    with profiler.stage("counts") as record:
+        record.cached = cache.has("counts", counts_key)
+        node_counts, count_stations = cache.run("counts", counts_key, load_counts)
+        record.rows = len(node_counts)
+        record.counts = {"stations": len(count_stations)}
+    node_counts.to_parquet(PATH_OUT_COUNTS, compression="zstd")
+    count_stations.to_parquet(PATH_OUT_COUNT_STATIONS, compression="zstd")
+
+# %%
+# only nodes within reach of each scenario's edits are recomputed, and changed values are written
+if SCENARIOS:
+    Path(PATH_OUT_SCENARIOS).mkdir(parents=True, exist_ok=True)
+for scenario in SCENARIOS:
+    with profiler.stage(f"scenario_{scenario.name}") as record:
+        scenario_diff = scenarios.evaluate_scenario(
+            scenario,
+            nodes_gdf,
+            edges_gdf,
+            results,
+            premises_eng,
+            CENT_VARIANTS,
+            cent_distances=CENT_DISTANCES,
+            lu_distances=LU_DISTANCES,
+            angular_scaling_unit=ANGULAR_SCALING_UNIT,
+            farness_scaling_offset=FARNESS_SCALING_OFFSET,
+        )
+        record.rows = scenario_diff["node"].nunique()
+    scenario_diff.to_parquet(f"{PATH_OUT_SCENARIOS}/{scenario.name}.parquet")
+
+# %%
+# per-stage timings, memory, and counts for comparison across runs
+profiler.write_report()
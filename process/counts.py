@@ -0,0 +1,159 @@
+"""
+Streaming loader for pedestrian and bicycle count series, snapped to the dual network.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+# count CSV columns retained, renamed to english - count columns missing from a file are skipped
+COUNT_COLUMNS = {
+    "FECHA": "date",
+    "IDENTIFICADOR": "station_id",
+    "LATITUD": "lat",
+    "LONGITUD": "lng",
+    "PEATONES": "pedestrians",
+    "BICICLETAS": "bicycles",
+}
+COUNT_VALUE_COLUMNS = ["pedestrians", "bicycles"]
+COUNT_DATE_FORMAT = "%d/%m/%Y %H:%M"
+COUNT_CHUNK_ROWS = 500_000
+# stations further than this from a dual node are not snapped
+MAX_SNAP_DIST = 50
+
+
+def _count_column(col: str) -> str | None:
+    return COUNT_COLUMNS.get(col.strip().upper())
+
+
+def _read_header(path: str | Path, encoding: str) -> pd.Index:
+    return pd.read_csv(path, sep=";", nrows=0, encoding=encoding).columns
+
+
+def read_count_chunks(
+    path: str | Path, chunk_rows: int = COUNT_CHUNK_ROWS, encoding: str = "utf-8"
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the count CSV in chunks of `chunk_rows`, with columns renamed per `COUNT_COLUMNS`.
+
+    Decimals are read with comma separators and dates are floored to the hour.
+    """
+    # station ids are read as strings per the header as written, e.g. padded or in lower case
+    dtype = {col: str for col in _read_header(path, encoding) if _count_column(col) == "station_id"}
+    with pd.read_csv(
+        path,
+        sep=";",
+        decimal=",",
+        usecols=lambda col: _count_column(col) is not None,
+        dtype=dtype,
+        chunksize=chunk_rows,
+        encoding=encoding,
+    ) as reader:
+        for chunk in reader:
+            chunk = chunk.rename(columns=_count_column)
+            dates = pd.to_datetime(chunk.pop("date"), format=COUNT_DATE_FORMAT)
+            chunk["hour"] = dates.dt.floor("h")
+            yield chunk
+
+
+def read_count_value_columns(path: str | Path, encoding: str = "utf-8") -> list[str]:
+    """
+    Return the count value columns present in the count CSV header, renamed per `COUNT_COLUMNS`.
+    """
+    present = {_count_column(col) for col in _read_header(path, encoding)}
+
+    return [col for col in COUNT_VALUE_COLUMNS if col in present]
+
+
+def snap_to_nodes(
+    x: np.ndarray, y: np.ndarray, nodes_gdf: gpd.GeoDataFrame, max_dist: float = MAX_SNAP_DIST
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the nearest dual node key and its distance for each point, per a KD-tree of the nodes.
+
+    Points further than `max_dist` from any node, or with missing coordinates, get a missing key
+    and distance.
+    """
+    tree = cKDTree(np.column_stack([nodes_gdf["x"].to_numpy(), nodes_gdf["y"].to_numpy()]))
+    xys = np.column_stack([x, y])
+    valid = np.isfinite(xys).all(axis=1)
+    dists = np.full(len(xys), np.inf)
+    positions = np.full(len(xys), len(nodes_gdf))
+    dists[valid], positions[valid] = tree.query(xys[valid], distance_upper_bound=max_dist)
+    # cKDTree returns the node count as the position when no node is within reach
+    snapped = positions < len(nodes_gdf)
+    node_keys = np.full(len(positions), None, dtype=object)
+    node_keys[snapped] = nodes_gdf.index.to_numpy()[positions[snapped]]
+
+    return node_keys, np.where(snapped, dists, np.nan)
+
+
+def load_counts(
+    path: str | Path,
+    nodes_gdf: gpd.GeoDataFrame,
+    max_snap_dist: float = MAX_SNAP_DIST,
+    chunk_rows: int = COUNT_CHUNK_ROWS,
+    encoding: str = "utf-8",
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load hourly count series per dual node of `nodes_gdf`, and the counting stations.
+
+    The CSV is read in chunks, each reduced to hourly counts per station before the next is read.
+    Stations are projected to the nodes CRS and snapped to the nearest node, and the counts of
+    stations snapped to the same node are summed. Returns the counts as `node`, `hour`, and count
+    columns, sorted by node and hour, and the stations with their snapped `node` and `snap_dist`.
+    """
+    value_cols = read_count_value_columns(path, encoding=encoding)
+    if not value_cols:
+        raise ValueError(f"No count columns {COUNT_VALUE_COLUMNS} found in {path}.")
+    station_chunks = []
+    count_chunks = []
+    row_count = 0
+    for chunk in read_count_chunks(path, chunk_rows=chunk_rows, encoding=encoding):
+        row_count += len(chunk)
+        station_chunks.append(chunk.groupby("station_id")[["lat", "lng"]].first())
+        # stations can span chunks, so hourly counts are summed again once all chunks are read
+        count_chunks.append(
+            chunk.groupby(["station_id", "hour"], observed=True)[value_cols].sum(min_count=1)
+        )
+    if not row_count:
+        raise ValueError(f"No count rows read from {path}.")
+    stations = pd.concat(station_chunks).groupby(level=0).first()
+    station_counts = pd.concat(count_chunks).groupby(level=[0, 1]).sum(min_count=1)
+    logger.info(f"Read {len(station_counts)} hourly counts for {len(stations)} stations")
+
+    station_points = gpd.GeoSeries.from_xy(stations["lng"], stations["lat"], crs=4326).to_crs(
+        nodes_gdf.crs
+    )
+    stations["node"], stations["snap_dist"] = snap_to_nodes(
+        station_points.x.to_numpy(), station_points.y.to_numpy(), nodes_gdf, max_snap_dist
+    )
+    missing_coords = stations[["lat", "lng"]].isna().any(axis=1)
+    if missing_coords.any():
+        missing_ids = ", ".join(stations.index[missing_coords])
+        logger.warning(f"Stations without coordinates, not snapped: {missing_ids}")
+    unsnapped = stations.index[stations["node"].isna() & ~missing_coords]
+    if len(unsnapped):
+        logger.warning(f"Stations beyond {max_snap_dist}m of a node: {', '.join(unsnapped)}")
+
+    station_counts = station_counts.join(stations["node"], on="station_id")
+    node_counts = (
+        station_counts.dropna(subset=["node"])
+        .groupby(["node", "hour"])[value_cols]
+        .sum(min_count=1)
+        .astype(np.float32)
+        .reset_index()
+    )
+    node_counts["node"] = node_counts["node"].astype("category")
+    logger.info(f"Snapped counts to {node_counts['node'].nunique()} nodes")
+
+    return node_counts, stations
@@ -0,0 +1,106 @@
+"""
+Partitioned GeoParquet output for the nodes dataset.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+from urllib.parse import quote
+
+import geopandas as gpd
+import pyarrow.parquet as pq
+
+# 64 bit columns are pared back to 32 bits to reduce size
+DOWNCAST_DTYPES = {"int64": "int32", "float64": "float32"}
+
+
+def dataset_dtypes(gdf: gpd.GeoDataFrame) -> dict[str, str]:
+    """
+    Return the output dtype for each column to be downcast.
+    """
+    return {
+        col: DOWNCAST_DTYPES[str(dtype)]
+        for col, dtype in gdf.dtypes.items()
+        if str(dtype) in DOWNCAST_DTYPES
+    }
+
+
+def write_dataset(
+    gdf: gpd.GeoDataFrame,
+    path: str | Path,
+    partition_col: str = "district",
+    compression: str = "zstd",
+) -> None:
+    """
+    Write the dataset as GeoParquet files partitioned per `partition_col`.
+
+    Files are written per hive layout, e.g. `dataset/district=Centro/part-0.parquet`, so readers
+    can skip partitions. Each file includes bounding box covering columns for spatial filtering.
+    Rows with a missing `partition_col` are dropped. Any existing dataset at `path` is replaced once
+    the new dataset is written.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    gdf = gdf.astype(dataset_dtypes(gdf))
+    for partition_val, partition_gdf in gdf.groupby(partition_col, sort=True):
+        partition_dir = tmp_path / f"{partition_col}={quote(str(partition_val), safe='')}"
+        partition_dir.mkdir(parents=True)
+        partition_gdf.drop(columns=partition_col).to_parquet(
+            partition_dir / "part-0.parquet",
+            compression=compression,
+            write_covering_bbox=True,
+        )
+    if path.exists():
+        shutil.rmtree(path)
+    tmp_path.rename(path)
+
+
+def _file_metadata(path: str | Path) -> tuple[list[str], str, list[str]]:
+    # partitions share the schema, so the first file describes the dataset
+    file_path = min(Path(path).glob("*/*.parquet"))
+    schema = pq.read_schema(file_path)
+    geo = json.loads(schema.metadata[b"geo"])
+    index_cols = [
+        col
+        for col in json.loads(schema.metadata[b"pandas"])["index_columns"]
+        if isinstance(col, str)
+    ]
+
+    return schema.names, geo["primary_column"], index_cols
+
+
+def dataset_columns(path: str | Path) -> list[str]:
+    """
+    Return the data columns of the dataset, excluding the geometry, index, and bbox columns.
+    """
+    names, geometry_col, index_cols = _file_metadata(path)
+
+    return [col for col in names if col not in [geometry_col, "bbox", *index_cols]]
+
+
+def read_dataset(
+    path: str | Path,
+    districts: Sequence[str] | None = None,
+    columns: Sequence[str] | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    partition_col: str = "district",
+) -> gpd.GeoDataFrame:
+    """
+    Read the dataset, optionally only for the given districts, columns, and bounding box.
+
+    District filters skip the other partitions' files and column selections skip the other columns'
+    data, so subsets are read without scanning the full dataset. Districts are read back as
+    categoricals.
+    """
+    filters = None if districts is None else [(partition_col, "in", list(districts))]
+    if columns is not None:
+        # the geometry and node index are always read
+        _, geometry_col, index_cols = _file_metadata(path)
+        columns = list(dict.fromkeys([*columns, geometry_col, *index_cols]))
+
+    return gpd.read_parquet(path, columns=columns, filters=filters, bbox=bbox)
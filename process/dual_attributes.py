@@ -0,0 +1,24 @@
+"""
+Vectorised bearings for dual graph nodes.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+import shapely
+
+
+def primal_edge_bearings(primal_edges: npt.NDArray[np.object_]) -> npt.NDArray[np.float64]:
+    """
+    Bearings in degrees from the first to the last coordinate of each primal edge.
+    """
+    start_pts = shapely.get_point(primal_edges, 0)
+    end_pts = shapely.get_point(primal_edges, -1)
+
+    return np.rad2deg(
+        np.arctan2(
+            shapely.get_y(end_pts) - shapely.get_y(start_pts),
+            shapely.get_x(end_pts) - shapely.get_x(start_pts),
+        )
+    )
@@ -0,0 +1,614 @@
+"""
+Array-backed construction of the cleaned dual network, in place of the networkx graph workflow.
+
+Street geometries are exploded and snapped to nodes on coordinates rounded to 0.1m, parallel edges
+are merged, filler nodes, short dead-ends, and small disconnected components are removed, and the
+network is converted to its dual. Each step follows its `cityseer` counterpart per
+`io.nx_from_generic_geopandas`, `graphs.nx_remove_filler_nodes`, `graphs.nx_remove_dangling_nodes`,
+`graphs.nx_to_dual`, and `io.network_structure_from_nx`, with node and edge keys formatted the same,
+so the returned nodes and edges GeoDataFrames can be used in place of those from networkx. The
+network is held as coordinate, node, and edge arrays throughout instead of as networkx graphs with a
+geometry per edge. Only 2D coordinates are supported.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import shapely
+from scipy import sparse
+from scipy.sparse import csgraph
+from shapely import ops
+
+logger = logging.getLogger(__name__)
+
+# node coordinates are rounded to 1 decimal, i.e. 10cm for metre units, as per cityseer
+ROUND_DECIMALS = 1
+# vertices within this distance of a half geom's end are not duplicated
+SPLIT_TOLERANCE = 1e-6
+
+
+@dataclass
+class PrimalEdges:
+    """
+    Primal edges as arrays. Each geometry runs from its `start` node to its `end` node.
+
+    `seq` is the order in which edges were added, which orders parallel edges for their keys.
+    """
+
+    start: npt.NDArray[np.int64]
+    end: npt.NDArray[np.int64]
+    geoms: npt.NDArray[np.object_]
+    seq: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def take(self, idxs: npt.NDArray) -> PrimalEdges:
+        return PrimalEdges(self.start[idxs], self.end[idxs], self.geoms[idxs], self.seq[idxs])
+
+    def append(self, other: PrimalEdges) -> PrimalEdges:
+        return PrimalEdges(
+            np.concatenate([self.start, other.start]),
+            np.concatenate([self.end, other.end]),
+            np.concatenate([self.geoms, other.geoms]),
+            np.concatenate([self.seq, other.seq]),
+        )
+
+    def degrees(self, node_count: int) -> npt.NDArray[np.int64]:
+        """
+        Node degrees, with self-loops counted twice as per networkx.
+        """
+        return np.bincount(self.start, minlength=node_count) + np.bincount(
+            self.end, minlength=node_count
+        )
+
+
+def round_coords(coords: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    Round coordinates per Python's `round`, as used for cityseer node keys.
+
+    `np.round` scales before rounding, so can round the other way for values next to a rounding
+    boundary. Only those values are rounded per `round`.
+    """
+    rounded = np.round(coords, ROUND_DECIMALS)
+    scaled = coords * 10**ROUND_DECIMALS
+    near_boundary = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_boundary.any():
+        rounded[near_boundary] = [round(val, ROUND_DECIMALS) for val in coords[near_boundary]]
+    return rounded
+
+
+def node_keys_from_xy(node_xy: npt.NDArray[np.float64]) -> npt.NDArray[np.str_]:
+    """
+    Return the primal node keys for rounded node coordinates, as per cityseer.
+    """
+    return np.array([f"x{x}-y{y}" for x, y in node_xy.tolist()], dtype=np.str_)
+
+
+def _line_ends(
+    coords_idxs: npt.NDArray[np.int64], line_count: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Return the first and last coordinate index per line for coordinates grouped by line.
+    """
+    counts = np.bincount(coords_idxs, minlength=line_count)
+    last = np.cumsum(counts) - 1
+    return last - counts + 1, last
+
+
+def _join_parts(
+    parts: npt.NDArray[np.object_],
+    reverse: npt.NDArray[np.bool_],
+    groups: npt.NDArray[np.int64],
+) -> npt.NDArray[np.object_]:
+    """
+    Join consecutive line parts per group, reversing parts as flagged, into one line per group.
+
+    Parts must be sorted by group and each part must start where the previous part ends. The shared
+    coordinate between parts is dropped, as per `util.weld_linestring_coords`.
+    """
+    coords, part_idxs = shapely.get_coordinates(parts, return_index=True)
+    first, last = _line_ends(part_idxs, len(parts))
+    pos = np.arange(len(coords)) - first[part_idxs]
+    coords = coords[np.where(reverse[part_idxs], last[part_idxs] - pos, first[part_idxs] + pos)]
+    group_start = np.ones(len(parts), dtype=bool)
+    group_start[1:] = groups[1:] != groups[:-1]
+    keep = (pos > 0) | group_start[part_idxs]
+    return shapely.linestrings(coords[keep], indices=groups[part_idxs][keep])
+
+
+def explode_streets(
+    streets_gdf: gpd.GeoDataFrame,
+    drop_self_loops_dist: float = 50,
+) -> tuple[PrimalEdges, npt.NDArray[np.float64]]:
+    """
+    Explode street geometries into primal edges between nodes snapped on rounded coordinates.
+
+    As per `io.nx_from_generic_geopandas`, empty and zero length geometries are dropped, all
+    coordinates are rounded, and self-loops shorter than `drop_self_loops_dist` are dropped. Nodes
+    are numbered in the order they are first encountered. Returns the edges and node coordinates.
+    """
+    geoms = shapely.get_parts(streets_gdf.geometry.to_numpy())
+    geoms = geoms[shapely.get_type_id(geoms) == shapely.GeometryType.LINESTRING]
+    geoms = geoms[~shapely.is_empty(geoms) & (shapely.length(geoms) > 0)]
+    coords, line_idxs = shapely.get_coordinates(geoms, return_index=True)
+    coords = round_coords(coords)
+    geoms = shapely.linestrings(coords, indices=line_idxs)
+    first, last = _line_ends(line_idxs, len(geoms))
+    is_loop = (coords[first] == coords[last]).all(axis=1)
+    keep = ~(is_loop & (shapely.length(geoms) < drop_self_loops_dist))
+    geoms, first, last = geoms[keep], first[keep], last[keep]
+    # interleave start and end coordinates so nodes are numbered per first appearance
+    end_coords = np.stack([coords[first], coords[last]], axis=1).reshape(-1, 2)
+    unique_coords, first_seen, inverse = np.unique(
+        end_coords, axis=0, return_index=True, return_inverse=True
+    )
+    node_order = np.argsort(first_seen, kind="stable")
+    node_ids = np.empty_like(node_order)
+    node_ids[node_order] = np.arange(len(node_order))
+    edge_nodes = node_ids[inverse.ravel()].reshape(-1, 2)
+    edges = PrimalEdges(edge_nodes[:, 0], edge_nodes[:, 1], geoms, np.arange(len(geoms)))
+
+    return edges, unique_coords[node_order]
+
+
+def _merge_parallel_group(
+    edges: PrimalEdges,
+    group: npt.NDArray[np.int64],
+    node_xy: npt.NDArray[np.float64],
+    contains_buffer_dist: float,
+) -> PrimalEdges:
+    """
+    Merge a group of parallel edges per `graphs.nx_merge_parallel_edges` by midline.
+    """
+    group = group[np.argsort(edges.seq[group], kind="stable")]
+    geoms = list(edges.geoms[group])
+    shortest_pos = int(np.argmin(shapely.length(edges.geoms[group])))
+    shortest_geom = geoms[shortest_pos]
+    shortest_buffer = shortest_geom.buffer(contains_buffer_dist)
+    kept = []
+    longer_geoms = []
+    for pos, geom in enumerate(geoms):
+        if pos == shortest_pos:
+            continue
+        if shortest_buffer.contains(geom):
+            longer_geoms.append(geom)
+        else:
+            kept.append(group[pos])
+    start_node = min(edges.start[group[0]], edges.end[group[0]])
+    end_node = max(edges.start[group[0]], edges.end[group[0]])
+    if not longer_geoms:
+        merged_start = edges.start[group[shortest_pos]]
+        merged_end = edges.end[group[shortest_pos]]
+        merged_geom = shortest_geom
+    else:
+        # midline of the nearest points on the longer geoms to each of the shortest geom's coords
+        new_coords = []
+        for coord in shortest_geom.coords:
+            short_point = shapely.Point(coord)
+            multi_points = [short_point]
+            for longer_geom in longer_geoms:
+                longer_point = ops.nearest_points(short_point, longer_geom)[-1]
+                if (
+                    shapely.Point(longer_geom.coords[0]).distance(longer_point) < 1
+                    or shapely.Point(longer_geom.coords[-1]).distance(longer_point) < 1
+                ):
+                    continue
+                multi_points.append(longer_point)
+            mid_point = shapely.MultiPoint(multi_points).centroid
+            new_coords.append((mid_point.x, mid_point.y))
+        start_xy = node_xy[start_node]
+        if np.hypot(*(new_coords[0] - start_xy)) > np.hypot(*(new_coords[-1] - start_xy)):
+            new_coords = new_coords[::-1]
+        new_coords[0] = tuple(start_xy)
+        new_coords[-1] = tuple(node_xy[end_node])
+        merged_start, merged_end = start_node, end_node
+        merged_geom = shapely.LineString(new_coords)
+        if merged_geom.length < 0.001:
+            merged_start = edges.start[group[shortest_pos]]
+            merged_end = edges.end[group[shortest_pos]]
+            merged_geom = shortest_geom
+    kept = np.array(kept, dtype=np.int64)
+    # unmerged edges are keyed before the merged edge
+    return PrimalEdges(
+        np.append(edges.start[kept], merged_start),
+        np.append(edges.end[kept], merged_end),
+        np.append(edges.geoms[kept], merged_geom),
+        np.sort(edges.seq[group])[: len(kept) + 1],
+    )
+
+
+def merge_parallel_edges(
+    edges: PrimalEdges,
+    node_xy: npt.NDArray[np.float64],
+    contains_buffer_dist: float = 1,
+) -> PrimalEdges:
+    """
+    Merge parallel edges contained by the buffered shortest edge between the same nodes.
+    """
+    node_count = len(node_xy)
+    pair_keys = np.minimum(edges.start, edges.end) * node_count + np.maximum(edges.start, edges.end)
+    _pairs, pair_idxs, pair_counts = np.unique(pair_keys, return_inverse=True, return_counts=True)
+    is_parallel = pair_counts[pair_idxs] > 1
+    if not is_parallel.any():
+        return edges
+    merged = edges.take(np.flatnonzero(~is_parallel))
+    parallel_idxs = np.flatnonzero(is_parallel)
+    parallel_idxs = parallel_idxs[np.argsort(pair_idxs[parallel_idxs], kind="stable")]
+    group_bounds = np.flatnonzero(np.diff(pair_idxs[parallel_idxs])) + 1
+    for group in np.split(parallel_idxs, group_bounds):
+        merged = merged.append(_merge_parallel_group(edges, group, node_xy, contains_buffer_dist))
+    logger.info(f"Merged {len(edges) - len(merged)} parallel edges")
+
+    return merged.take(np.argsort(merged.seq, kind="stable"))
+
+
+def _degree_two_neighbours(
+    edges: PrimalEdges, node_count: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.bool_]]:
+    """
+    Return the two incident edges and neighbours of each degree two node, and the filler nodes.
+
+    Filler nodes are degree two nodes with two distinct neighbours, not including themselves.
+    """
+    degrees = edges.degrees(node_count)
+    ends_node = np.concatenate([edges.start, edges.end])
+    ends_edge = np.tile(np.arange(len(edges)), 2)
+    ends_other = np.concatenate([edges.end, edges.start])
+    is_deg_two = degrees[ends_node] == 2
+    sorted_ends = np.flatnonzero(is_deg_two)
+    sorted_ends = sorted_ends[np.argsort(ends_node[sorted_ends], kind="stable")]
+    nodes = ends_node[sorted_ends[::2]]
+    incident = np.full((node_count, 2), -1, dtype=np.int64)
+    neighbours = np.full((node_count, 2), -1, dtype=np.int64)
+    incident[nodes, 0] = ends_edge[sorted_ends[::2]]
+    incident[nodes, 1] = ends_edge[sorted_ends[1::2]]
+    neighbours[nodes, 0] = ends_other[sorted_ends[::2]]
+    neighbours[nodes, 1] = ends_other[sorted_ends[1::2]]
+    is_filler = np.zeros(node_count, dtype=bool)
+    is_filler[nodes] = (
+        (neighbours[nodes, 0] != neighbours[nodes, 1])
+        & (neighbours[nodes, 0] != nodes)
+        & (neighbours[nodes, 1] != nodes)
+    )
+
+    return incident, neighbours, is_filler
+
+
+def remove_filler_nodes(
+    edges: PrimalEdges,
+    node_alive: npt.NDArray[np.bool_],
+    key_ranks: npt.NDArray[np.int64],
+) -> tuple[PrimalEdges, npt.NDArray[np.bool_]]:
+    """
+    Replace chains of edges through degree two nodes with single edges.
+
+    As per `graphs.nx_remove_filler_nodes`, chains are found from their first node in node order,
+    and are merged from the end found by following the neighbour with the lowest key.
+    `key_ranks` ranks the node keys as strings. Returns the edges and the updated mask of the
+    remaining nodes.
+    """
+    node_count = len(node_alive)
+    incident, neighbours, is_filler = _degree_two_neighbours(edges, node_count)
+    # walk chains over python lists, which are faster to index per element than arrays
+    incident_l = incident.tolist()
+    neighbours_l = neighbours.tolist()
+    is_filler_l = is_filler.tolist()
+    key_ranks_l = key_ranks.tolist()
+    edge_starts = edges.start.tolist()
+    removed = np.zeros(node_count, dtype=bool)
+    chain_edges: list[int] = []
+    chain_reverse: list[bool] = []
+    chain_idxs: list[int] = []
+    chain_ends: list[tuple[int, int]] = []
+    for nd_idx in np.flatnonzero(is_filler).tolist():
+        if removed[nd_idx]:
+            continue
+        nb_a, nb_b = neighbours_l[nd_idx]
+        # find the chain end in the direction of the lowest keyed neighbour
+        link_idx = nd_idx
+        anchor_idx = nb_a if key_ranks_l[nb_a] < key_ranks_l[nb_b] else nb_b
+        while is_filler_l[anchor_idx] and anchor_idx != nd_idx:
+            nb_a, nb_b = neighbours_l[anchor_idx]
+            link_idx, anchor_idx = anchor_idx, nb_b if nb_a == link_idx else nb_a
+        # follow the chain back from the anchor
+        trailing_idx, next_idx = anchor_idx, link_idx
+        while True:
+            via_idx = next_idx if is_filler_l[next_idx] else trailing_idx
+            other_idx = trailing_idx if via_idx == next_idx else next_idx
+            edge_idx = incident_l[via_idx][0 if neighbours_l[via_idx][0] == other_idx else 1]
+            chain_edges.append(edge_idx)
+            chain_reverse.append(edge_starts[edge_idx] != trailing_idx)
+            chain_idxs.append(len(chain_ends))
+            if not is_filler_l[next_idx] or next_idx == anchor_idx:
+                break
+            removed[next_idx] = True
+            nb_a, nb_b = neighbours_l[next_idx]
+            trailing_idx, next_idx = next_idx, nb_b if nb_a == trailing_idx else nb_a
+        chain_ends.append((anchor_idx, next_idx))
+    if not chain_ends:
+        return edges, node_alive
+    chain_edges_arr = np.array(chain_edges, dtype=np.int64)
+    chain_ends_arr = np.array(chain_ends, dtype=np.int64)
+    chain_geoms = _join_parts(
+        edges.geoms[chain_edges_arr],
+        np.array(chain_reverse, dtype=bool),
+        np.array(chain_idxs, dtype=np.int64),
+    )
+    chains = PrimalEdges(
+        chain_ends_arr[:, 0],
+        chain_ends_arr[:, 1],
+        chain_geoms,
+        edges.seq.max() + 1 + np.arange(len(chain_ends)),
+    )
+    keep = np.ones(len(edges), dtype=bool)
+    keep[chain_edges_arr] = False
+    logger.info(f"Removed {removed.sum()} filler nodes")
+
+    return edges.take(np.flatnonzero(keep)).append(chains), node_alive & ~removed
+
+
+def remove_dangling_nodes(
+    edges: PrimalEdges,
+    node_alive: npt.NDArray[np.bool_],
+    key_ranks: npt.NDArray[np.int64],
+    despine: float = 15,
+    remove_disconnected: int = 100,
+) -> tuple[PrimalEdges, npt.NDArray[np.bool_]]:
+    """
+    Remove dead-ends up to `despine` long and components of fewer than `remove_disconnected` nodes.
+
+    As per `graphs.nx_remove_dangling_nodes`, filler nodes left by the removed dead-ends are removed
+    before finding the components.
+    """
+    node_count = len(node_alive)
+    degrees = edges.degrees(node_count)
+    lengths = shapely.length(edges.geoms)
+    dangling = np.zeros(node_count, dtype=bool)
+    for nodes, other_nodes in [(edges.start, edges.end), (edges.end, edges.start)]:
+        is_dangling = (degrees[nodes] == 1) & (lengths <= despine) & (nodes != other_nodes)
+        dangling[nodes[is_dangling]] = True
+    node_alive = node_alive & ~dangling
+    edges = edges.take(np.flatnonzero(node_alive[edges.start] & node_alive[edges.end]))
+    logger.info(f"Removed {dangling.sum()} dangling nodes")
+    edges, node_alive = remove_filler_nodes(edges, node_alive, key_ranks)
+    adjacency = sparse.coo_matrix(
+        (np.ones(len(edges)), (edges.start, edges.end)), shape=(node_count, node_count)
+    )
+    _n_components, labels = csgraph.connected_components(adjacency, directed=False)
+    component_sizes = np.bincount(labels[node_alive], minlength=labels.max() + 1)
+    node_alive = node_alive & (component_sizes[labels] >= remove_disconnected)
+    edges = edges.take(np.flatnonzero(node_alive[edges.start] & node_alive[edges.end]))
+
+    return edges, node_alive
+
+
+def _component_node_order(
+    edges: PrimalEdges, node_alive: npt.NDArray[np.bool_]
+) -> npt.NDArray[np.int64]:
+    """
+    Order the live nodes by component, per the first node in each, then by node order.
+    """
+    node_count = len(node_alive)
+    adjacency = sparse.coo_matrix(
+        (np.ones(len(edges)), (edges.start, edges.end)), shape=(node_count, node_count)
+    )
+    _n_components, labels = csgraph.connected_components(adjacency, directed=False)
+    alive_idxs = np.flatnonzero(node_alive)
+    component_first = np.full(labels.max() + 1, node_count)
+    np.minimum.at(component_first, labels[alive_idxs], alive_idxs)
+
+    return alive_idxs[np.lexsort((alive_idxs, component_first[labels[alive_idxs]]))]
+
+
+def _half_geoms(
+    geoms: npt.NDArray[np.object_],
+) -> tuple[npt.NDArray[np.object_], npt.NDArray[np.object_]]:
+    """
+    Split each line at its midpoint per `ops.substring`, returning the first and second halves.
+    """
+    lengths = shapely.length(geoms)
+    coords, line_idxs = shapely.get_coordinates(geoms, return_index=True)
+    first, last = _line_ends(line_idxs, len(geoms))
+    seg_lengths = np.zeros(len(coords))
+    seg_lengths[1:] = np.hypot(*(coords[1:] - coords[:-1]).T)
+    seg_lengths[first] = 0
+    cumulative = np.cumsum(seg_lengths)
+    dists = cumulative - cumulative[first][line_idxs]
+    half = lengths[line_idxs] / 2
+    mids = shapely.get_coordinates(shapely.line_interpolate_point(geoms, lengths / 2))
+    is_inner = (np.arange(len(coords)) > first[line_idxs]) & (
+        np.arange(len(coords)) < last[line_idxs]
+    )
+    in_first = is_inner & (dists > SPLIT_TOLERANCE) & (dists < half - SPLIT_TOLERANCE)
+    in_second = (
+        is_inner & (dists > half + SPLIT_TOLERANCE) & (dists < lengths[line_idxs] - SPLIT_TOLERANCE)
+    )
+    line_range = np.arange(len(geoms))
+    # each half as ends and inner vertices, stably sorted back into line order
+    first_coords = np.concatenate([coords[first], coords[in_first], mids])
+    first_idxs = np.concatenate([line_range, line_idxs[in_first], line_range])
+    first_order = np.argsort(first_idxs, kind="stable")
+    second_coords = np.concatenate([mids, coords[in_second], coords[last]])
+    second_idxs = np.concatenate([line_range, line_idxs[in_second], line_range])
+    second_order = np.argsort(second_idxs, kind="stable")
+
+    return (
+        shapely.linestrings(first_coords[first_order], indices=first_idxs[first_order]),
+        shapely.linestrings(second_coords[second_order], indices=second_idxs[second_order]),
+    )
+
+
+def _dual_edges(
+    edges: PrimalEdges, node_count: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray]:
+    """
+    Return the dual edges as the primal edges and shared primal node per pair, and their geoms.
+
+    Primal edges sharing a node are paired, except where their other ends are also shared, as per
+    `graphs.nx_to_dual`. Each dual edge geom runs from the first edge's midpoint to the shared node
+    to the second edge's midpoint. Self-loops are joined from their first half only.
+    """
+    is_loop = edges.start == edges.end
+    edge_range = np.arange(len(edges))
+    ends_node = np.concatenate([edges.start, edges.end[~is_loop]])
+    ends_edge = np.concatenate([edge_range, edge_range[~is_loop]])
+    ends_other = np.concatenate([edges.end, edges.start[~is_loop]])
+    ends_at_start = np.arange(len(ends_node)) < len(edges)
+    # all pairs of ends per node
+    ends_order = np.argsort(ends_node, kind="stable")
+    node_counts = np.bincount(ends_node, minlength=node_count)
+    node_first = np.cumsum(node_counts) - node_counts
+    sorted_nodes = ends_node[ends_order]
+    pos = np.arange(len(ends_order)) - node_first[sorted_nodes]
+    pair_counts = node_counts[sorted_nodes] - 1 - pos
+    left = np.repeat(np.arange(len(ends_order)), pair_counts)
+    ramp = np.arange(len(left)) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    right = left + 1 + ramp
+    left, right = ends_order[left], ends_order[right]
+    keep = ends_other[left] != ends_other[right]
+    left, right = left[keep], right[keep]
+    # join the half of each edge at the shared node
+    first_halves, second_halves = _half_geoms(edges.geoms)
+    ends_half = np.where(ends_at_start, first_halves[ends_edge], second_halves[ends_edge])
+    half_parts = np.column_stack([ends_half[left], ends_half[right]]).ravel()
+    reverse_parts = np.column_stack([ends_at_start[left], ~ends_at_start[right]]).ravel()
+    dual_geoms = _join_parts(half_parts, reverse_parts, np.repeat(np.arange(len(left)), 2))
+
+    return ends_edge[left], ends_edge[right], ends_node[left], dual_geoms
+
+
+def build_dual(
+    edges: PrimalEdges,
+    node_keys: npt.NDArray[np.str_],
+    node_a: npt.NDArray[np.int64],
+    node_b: npt.NDArray[np.int64],
+    edge_keys: npt.NDArray[np.int64],
+    live: npt.NDArray[np.bool_],
+    crs: Any,
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Build the dual nodes and edges GeoDataFrames from primal edges, in the order of the edges.
+
+    Each primal edge becomes a dual node keyed per its primal nodes `node_a` and `node_b`, indexing
+    `node_keys`, and its `edge_keys`, which number parallel edges. Dual edges join the primal edges
+    sharing a node, per `_dual_edges`.
+    """
+    key_a, key_b = node_keys[node_a], node_keys[node_b]
+    dual_keys = [
+        f"{min(a, b)}_{max(a, b)}_k{k}"
+        for a, b, k in zip(key_a.tolist(), key_b.tolist(), edge_keys.tolist(), strict=True)
+    ]
+    mid_points = shapely.line_interpolate_point(edges.geoms, 0.5, normalized=True)
+    xs, ys = shapely.get_x(mid_points), shapely.get_y(mid_points)
+    nodes_gdf = gpd.GeoDataFrame(
+        {
+            "ns_node_idx": np.arange(len(edges)),
+            "x": xs,
+            "y": ys,
+            "z": None,
+            "live": live,
+            "weight": shapely.length(edges.geoms),
+            "primal_edge": edges.geoms,
+            "primal_edge_node_a": key_a,
+            "primal_edge_node_b": key_b,
+            "primal_edge_idx": edge_keys,
+        },
+        index=pd.Index(dual_keys),
+        geometry="primal_edge",
+        crs=crs,
+    )
+    nodes_gdf["dual_node"] = shapely.to_wkt(mid_points)
+    # dual edges in both directions, ordered per start node then end node
+    hub_idxs, spoke_idxs, shared_nodes, dual_geoms = _dual_edges(edges, len(node_keys))
+    start_idxs = np.concatenate([hub_idxs, spoke_idxs])
+    end_idxs = np.concatenate([spoke_idxs, hub_idxs])
+    edge_geoms = np.concatenate([dual_geoms, shapely.reverse(dual_geoms)])
+    primal_node_ids = np.tile(node_keys[shared_nodes], 2)
+    dual_order = np.lexsort((end_idxs, start_idxs))
+    start_idxs, end_idxs = start_idxs[dual_order], end_idxs[dual_order]
+    edge_geoms, primal_node_ids = edge_geoms[dual_order], primal_node_ids[dual_order]
+    dual_keys_arr = nodes_gdf.index.to_numpy()
+    start_keys, end_keys = dual_keys_arr[start_idxs], dual_keys_arr[end_idxs]
+    start_pts, end_pts = shapely.get_point(edge_geoms, 0), shapely.get_point(edge_geoms, -1)
+    edges_gdf = gpd.GeoDataFrame(
+        {
+            "ns_edge_idx": np.arange(len(start_idxs)),
+            "start_ns_node_idx": start_idxs,
+            "end_ns_node_idx": end_idxs,
+            "edge_idx": 0,
+            "nx_start_node_key": start_keys,
+            "nx_end_node_key": end_keys,
+            "imp_factor": 1.0,
+            "total_bearing": np.rad2deg(
+                np.arctan2(
+                    shapely.get_y(end_pts) - shapely.get_y(start_pts),
+                    shapely.get_x(end_pts) - shapely.get_x(start_pts),
+                )
+            ),
+            "geom": edge_geoms,
+            "primal_node_id": primal_node_ids,
+        },
+        index=pd.Index([f"{s}-{e}" for s, e in zip(start_keys, end_keys, strict=True)]),
+        geometry="geom",
+        crs=crs,
+    )
+    logger.info(f"Dual network of {len(nodes_gdf)} nodes and {len(edges_gdf)} edges")
+
+    return nodes_gdf, edges_gdf
+
+
+def dual_network_from_gpd(
+    streets_gdf: gpd.GeoDataFrame,
+    live_geom: shapely.Geometry | None = None,
+    despine: float = 15,
+    remove_disconnected: int = 100,
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Build the cleaned dual network's nodes and edges GeoDataFrames from street LineStrings.
+
+    The GeoDataFrames match those returned by `io.network_structure_from_nx` for the dual of the
+    cleaned networkx graph, for use with `network_structures.build_network_structure`. Dual nodes
+    are live where contained by `live_geom`, if given, and are weighted by their primal edge
+    lengths.
+    """
+    edges, node_xy = explode_streets(streets_gdf)
+    node_keys = node_keys_from_xy(node_xy)
+    key_ranks = np.empty(len(node_keys), dtype=np.int64)
+    key_ranks[np.argsort(node_keys)] = np.arange(len(node_keys))
+    node_alive = np.ones(len(node_xy), dtype=bool)
+    edges = merge_parallel_edges(edges, node_xy)
+    edges, node_alive = remove_filler_nodes(edges, node_alive, key_ranks)
+    edges, node_alive = remove_dangling_nodes(
+        edges, node_alive, key_ranks, despine=despine, remove_disconnected=remove_disconnected
+    )
+    logger.info(f"Primal network of {node_alive.sum()} nodes and {len(edges)} edges")
+    # order dual nodes per their primal edges' first node, then per edge as added
+    node_ranks = np.full(len(node_xy), len(node_xy))
+    node_ranks[_component_node_order(edges, node_alive)] = np.arange(node_alive.sum())
+    swap = node_ranks[edges.end] < node_ranks[edges.start]
+    node_a = np.where(swap, edges.end, edges.start)
+    node_b = np.where(swap, edges.start, edges.end)
+    pairs = pd.DataFrame({"a": node_a, "b": node_b, "seq": edges.seq})
+    pair_first_seq = pairs.groupby(["a", "b"])["seq"].transform("min").to_numpy()
+    edge_order = np.lexsort((edges.seq, pair_first_seq, node_ranks[node_a]))
+    edges, node_a, node_b = edges.take(edge_order), node_a[edge_order], node_b[edge_order]
+    # parallel edges are keyed in the order added
+    edge_keys = pairs.iloc[edge_order].groupby(["a", "b"]).cumcount().to_numpy()
+    live = np.ones(len(edges), dtype=bool)
+    if live_geom is not None:
+        mid_points = shapely.line_interpolate_point(edges.geoms, 0.5, normalized=True)
+        shapely.prepare(live_geom)
+        live = shapely.contains_xy(live_geom, shapely.get_x(mid_points), shapely.get_y(mid_points))
+    nodes_gdf, edges_gdf = build_dual(
+        edges, node_keys, node_a, node_b, edge_keys, live, streets_gdf.crs
+    )
+
+    return nodes_gdf, edges_gdf
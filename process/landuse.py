@@ -0,0 +1,268 @@
+"""
+Mixed use and accessibility metrics for the premises land-uses, with incremental updates.
+"""
+
+from __future__ import annotations
+
+import logging
+from functools import partial
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import shapely
+from cityseer import config, rustalgos
+from cityseer.metrics import layers
+
+from process import network_structures
+
+logger = logging.getLogger(__name__)
+
+ACCESSIBILITY_KEYS = [
+    "food_bev",
+    "creat_entert",
+    "retail",
+    "services",
+    "education",
+    "accommod",
+    "sports_rec",
+    "health",
+]
+# premises further than this from the network are not assigned
+MAX_ASSIGN_DIST = 100
+# columns retained from the premises when diffing census releases
+SNAPSHOT_COLS = ["local_id", "epigraph_id", "division_desc", "geometry"]
+# premises have one row per activity, so rows are keyed by premise and activity
+SNAPSHOT_KEY = ["local_id", "epigraph_id"]
+
+
+def assign_premises(
+    premises_gdf: gpd.GeoDataFrame,
+    network_structure: rustalgos.graph.NetworkStructure,
+    max_netw_assign_dist: int = MAX_ASSIGN_DIST,
+) -> rustalgos.data.DataMap:
+    """
+    Assign the premises to the network once for reuse by the mixed use and accessibility calls.
+    """
+    return layers.build_data_map(premises_gdf, network_structure, max_netw_assign_dist)
+
+
+def compute_mixed_uses(
+    data_map: rustalgos.data.DataMap,
+    landuses_map: dict[str, str],
+    network_structure: rustalgos.graph.NetworkStructure,
+    distances: list[int],
+    angular: bool = False,
+) -> pd.DataFrame:
+    """
+    Compute hill weighted mixed uses, named as per `layers.compute_mixed_uses`.
+    """
+    result = config.wrap_progress(
+        total=network_structure.street_node_count(),
+        rust_struct=data_map,
+        partial_func=partial(
+            data_map.mixed_uses,
+            network_structure=network_structure,
+            landuses_map=landuses_map,
+            distances=distances,
+            compute_hill=False,
+            compute_hill_weighted=True,
+            angular=angular,
+        ),
+    )
+    temp_data = {}
+    for distance in distances:
+        for q_key in [0, 1, 2]:
+            data_key = config.prep_gdf_key(f"hill_q{q_key}", distance, angular, weighted=True)
+            temp_data[data_key] = result.hill_weighted[q_key][distance]
+
+    return pd.DataFrame(temp_data, index=result.node_keys_py)
+
+
+def compute_accessibilities(
+    data_map: rustalgos.data.DataMap,
+    landuses_map: dict[str, str],
+    network_structure: rustalgos.graph.NetworkStructure,
+    distances: list[int],
+    angular: bool = False,
+) -> pd.DataFrame:
+    """
+    Compute accessibilities for `ACCESSIBILITY_KEYS`, named as per `layers.compute_accessibilities`.
+    """
+    result = config.wrap_progress(
+        total=network_structure.street_node_count(),
+        rust_struct=data_map,
+        partial_func=partial(
+            data_map.accessibility,
+            network_structure=network_structure,
+            landuses_map=landuses_map,
+            accessibility_keys=ACCESSIBILITY_KEYS,
+            distances=distances,
+            angular=angular,
+        ),
+    )
+    temp_data = {}
+    for acc_key in ACCESSIBILITY_KEYS:
+        acc_result = result.result[acc_key]
+        for distance in distances:
+            nw_key = config.prep_gdf_key(acc_key, distance, angular, weighted=False)
+            temp_data[nw_key] = acc_result.unweighted[distance]
+            wt_key = config.prep_gdf_key(acc_key, distance, angular, weighted=True)
+            temp_data[wt_key] = acc_result.weighted[distance]
+            if distance == max(distances):
+                dist_key = config.prep_gdf_key(f"{acc_key}_nearest_max", distance, angular)
+                temp_data[dist_key] = acc_result.distance[distance]
+
+    return pd.DataFrame(temp_data, index=result.node_keys_py)
+
+
+def compute_landuses(
+    premises_gdf: gpd.GeoDataFrame,
+    network_structure: rustalgos.graph.NetworkStructure,
+    node_index: pd.Index,
+    distances: list[int],
+    landuse_col: str = "division_desc",
+    data_map: rustalgos.data.DataMap | None = None,
+) -> pd.DataFrame:
+    """
+    Compute hill weighted mixed uses and accessibilities in metric and angular forms.
+
+    The premises are assigned to the network once, unless a `data_map` is provided, and the same
+    assignment is used for all four calls.
+    """
+    if data_map is None:
+        data_map = assign_premises(premises_gdf, network_structure)
+    landuses_map = dict(premises_gdf[landuse_col])
+    lu_frames = []
+    for compute_func in [compute_mixed_uses, compute_accessibilities]:
+        for angular in [False, True]:
+            lu_frames.append(
+                compute_func(data_map, landuses_map, network_structure, distances, angular)
+            )
+
+    return pd.concat(lu_frames, axis=1).reindex(node_index)
+
+
+def premises_snapshot(premises_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Retain the premises columns needed to diff against a later census release.
+
+    Rows are indexed by `SNAPSHOT_KEY` plus the occurrence of the key, so that repeated activities
+    for a premise are also unique.
+    """
+    snapshot = premises_gdf[SNAPSHOT_COLS].reset_index(drop=True)
+    occurrence = snapshot.groupby(SNAPSHOT_KEY, observed=True, sort=False).cumcount()
+    return snapshot.set_index([*SNAPSHOT_KEY, occurrence.rename("occurrence")], drop=False)
+
+
+def diff_premises(
+    prev_premises_gdf: gpd.GeoDataFrame,
+    premises_gdf: gpd.GeoDataFrame,
+) -> npt.NDArray[np.object_]:
+    """
+    Return the locations of premises added, removed, reclassified, or moved between two releases.
+
+    Premises rows are matched per `premises_snapshot`, so an activity added to or removed from a
+    premise counts as an added or removed row. Reclassified or moved rows contribute both their
+    previous and current locations.
+    """
+    prev = premises_snapshot(prev_premises_gdf)
+    curr = premises_snapshot(premises_gdf)
+    added = curr.index.difference(prev.index)
+    removed = prev.index.difference(curr.index)
+    common = curr.index.intersection(prev.index)
+    prev_common = prev.reindex(common)
+    curr_common = curr.reindex(common)
+    changed = common[
+        (prev_common["division_desc"].to_numpy() != curr_common["division_desc"].to_numpy())
+        | ~shapely.equals(prev_common.geometry.to_numpy(), curr_common.geometry.to_numpy())
+    ]
+    logger.info(
+        f"Premises diff: {len(added)} added, {len(removed)} removed, {len(changed)} changed"
+    )
+    changed_geoms = np.concatenate(
+        [
+            curr.loc[added].geometry.to_numpy(),
+            prev.loc[removed].geometry.to_numpy(),
+            prev.loc[changed].geometry.to_numpy(),
+            curr.loc[changed].geometry.to_numpy(),
+        ]
+    )
+
+    return shapely.centroid(changed_geoms)
+
+
+def within_distance(
+    geoms: npt.NDArray[np.object_],
+    targets: npt.NDArray[np.object_],
+    max_distance: float,
+) -> npt.NDArray[np.bool_]:
+    """
+    Flag the geometries within `max_distance` of any of the target geometries.
+    """
+    within = np.zeros(len(geoms), dtype=bool)
+    if not len(targets):
+        return within
+    tree = shapely.STRtree(targets)
+    geom_idxs, _target_idxs = tree.query_nearest(geoms, max_distance=max_distance)
+    within[geom_idxs] = True
+
+    return within
+
+
+def affected_nodes(
+    nodes_gdf: gpd.GeoDataFrame,
+    changed_geoms: npt.NDArray[np.object_],
+    max_distance: float,
+) -> pd.Index:
+    """
+    Return the live nodes within `max_distance` of the changed premises.
+
+    Euclidean distances never exceed network distances, so these are a superset of the nodes within
+    `max_distance` network distance of the changes.
+    """
+    node_points = shapely.points(nodes_gdf["x"].to_numpy(), nodes_gdf["y"].to_numpy())
+    in_reach = within_distance(node_points, changed_geoms, max_distance)
+
+    return nodes_gdf.index[in_reach & nodes_gdf["live"].to_numpy(dtype=bool)]
+
+
+def update_landuses(
+    lu_data: pd.DataFrame,
+    prev_premises_gdf: gpd.GeoDataFrame,
+    premises_gdf: gpd.GeoDataFrame,
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    distances: list[int],
+    landuse_col: str = "division_desc",
+) -> pd.DataFrame:
+    """
+    Patch previously computed land-use metrics for a new premises census release.
+
+    Only nodes within `max(distances)` of added, removed, reclassified, or moved premises are
+    recomputed: these are set as the only live nodes and only premises within reach of them are
+    assigned to the network. Rows for all other nodes are carried over unchanged.
+    """
+    changed_geoms = diff_premises(prev_premises_gdf, premises_gdf)
+    affected = affected_nodes(nodes_gdf, changed_geoms, max(distances))
+    logger.info(f"Recomputing land-uses for {len(affected)} of {len(nodes_gdf)} nodes")
+    lu_data = lu_data.copy()
+    if not len(affected):
+        return lu_data
+    # only premises within reach of the affected nodes contribute to their metrics
+    affected_points = shapely.points(nodes_gdf.loc[affected, ["x", "y"]].to_numpy())
+    premises_subset = premises_gdf[
+        within_distance(premises_gdf.geometry.to_numpy(), affected_points, max(distances))
+    ]
+    network_structure = network_structures.build_network_structure(
+        nodes_gdf.assign(live=nodes_gdf.index.isin(affected)),
+        edges_gdf,
+        length_weighted=False,
+    )
+    patch = compute_landuses(
+        premises_subset, network_structure, nodes_gdf.index, distances, landuse_col
+    )
+    lu_data.loc[affected, patch.columns] = patch.loc[affected]
+
+    return lu_data
@@ -0,0 +1,192 @@
+"""
+Helpers for rebuilding cityseer network structures from dual nodes and edges GeoDataFrames.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from cityseer import rustalgos
+from scipy import sparse
+from scipy.sparse import csgraph
+
+logger = logging.getLogger(__name__)
+
+# as per util.align_linestring_coords
+ALIGN_TOLERANCE = 0.5
+
+
+def build_network_structure(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    length_weighted: bool,
+) -> rustalgos.graph.NetworkStructure:
+    """
+    Build a dual network structure with either length weighted or unit node weights.
+
+    Equivalent to `io.network_structure_from_gpd`, but node keys are mapped and edge geoms aligned
+    to their start nodes as arrays, and rows are passed from lists instead of iterated as Series.
+    Edges whose nodes are not in `nodes_gdf` are skipped.
+    """
+    network_structure = rustalgos.graph.NetworkStructure()
+    node_zs = [None] * len(nodes_gdf)
+    if "z" in nodes_gdf.columns:
+        z_vals = pd.to_numeric(nodes_gdf["z"], errors="coerce")
+        node_zs = [None if np.isnan(z) else z for z in z_vals.astype(float).tolist()]
+    node_weights = nodes_gdf["weight"].astype(float) if length_weighted else 1.0
+    node_weights = np.broadcast_to(node_weights, len(nodes_gdf)).tolist()
+    for nd_key, x, y, live, weight, z in zip(
+        nodes_gdf.index.astype(str).tolist(),
+        nodes_gdf["x"].astype(float).tolist(),
+        nodes_gdf["y"].astype(float).tolist(),
+        nodes_gdf["live"].astype(bool).tolist(),
+        node_weights,
+        node_zs,
+        strict=True,
+    ):
+        network_structure.add_street_node(nd_key, x, y, live, weight, z=z)
+    start_idxs = nodes_gdf.index.get_indexer(edges_gdf["nx_start_node_key"])
+    end_idxs = nodes_gdf.index.get_indexer(edges_gdf["nx_end_node_key"])
+    found = (start_idxs >= 0) & (end_idxs >= 0)
+    if not found.all():
+        logger.info(f"Skipping {(~found).sum()} edges with start or end node keys not found")
+    edges_gdf = edges_gdf[found]
+    start_idxs, end_idxs = start_idxs[found], end_idxs[found]
+    # align geoms to start from their start nodes
+    geoms = edges_gdf.geometry.to_numpy()
+    start_xys = np.column_stack([nodes_gdf["x"].to_numpy(), nodes_gdf["y"].to_numpy()])[start_idxs]
+    first_xys = shapely.get_coordinates(shapely.get_point(geoms, 0))
+    last_xys = shapely.get_coordinates(shapely.get_point(geoms, -1))
+    first_dists = np.hypot(*(first_xys - start_xys).T)
+    last_dists = np.hypot(*(last_xys - start_xys).T)
+    misaligned = np.minimum(first_dists, last_dists) > ALIGN_TOLERANCE
+    if misaligned.any():
+        raise ValueError(
+            f"Edge geom {edges_gdf.index[misaligned][0]} is further than {ALIGN_TOLERANCE} from "
+            "its start node."
+        )
+    geoms = np.where(first_dists > last_dists, shapely.reverse(geoms), geoms)
+    primal_node_ids = [None] * len(edges_gdf)
+    if "primal_node_id" in edges_gdf.columns:
+        primal_node_ids = [
+            str(nd_key) if pd.notna(nd_key) else None for nd_key in edges_gdf["primal_node_id"]
+        ]
+    for start_idx, end_idx, edge_idx, start_key, end_key, geom_wkt, imp_factor, nd_key in zip(
+        start_idxs.tolist(),
+        end_idxs.tolist(),
+        edges_gdf["edge_idx"].astype(int).tolist(),
+        edges_gdf["nx_start_node_key"].tolist(),
+        edges_gdf["nx_end_node_key"].tolist(),
+        shapely.to_wkt(geoms, rounding_precision=-1).tolist(),
+        edges_gdf["imp_factor"].astype(float).tolist(),
+        primal_node_ids,
+        strict=True,
+    ):
+        network_structure.add_street_edge(
+            start_idx,
+            end_idx,
+            edge_idx,
+            start_key,
+            end_key,
+            geom_wkt,
+            imp_factor,
+            shared_primal_node_key=nd_key,
+        )
+    network_structure.validate()
+    network_structure.build_edge_rtree()
+    network_structure.set_is_dual(True)
+
+    return network_structure
+
+
+def halo_keys(nodes_gdf: gpd.GeoDataFrame, node_keys: pd.Index, halo: float) -> pd.Index:
+    """
+    Return the keys of all nodes within `halo` of the convex hull of `node_keys`, including these.
+
+    The buffered hull is a superset of the nodes within `halo` of any of the nodes.
+    """
+    hull_nodes = nodes_gdf.loc[node_keys]
+    hull = shapely.multipoints(np.column_stack([hull_nodes["x"], hull_nodes["y"]])).convex_hull
+    halo_geom = hull.buffer(halo)
+    shapely.prepare(halo_geom)
+    in_halo = shapely.contains_xy(halo_geom, nodes_gdf["x"], nodes_gdf["y"])
+    return nodes_gdf.index[in_halo].union(node_keys, sort=False)
+
+
+def subset_network(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    node_keys: Sequence[str],
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Extract the nodes and the edges between them, preserving the original node order.
+    """
+    node_mask = nodes_gdf.index.isin(node_keys)
+    sub_nodes_gdf = nodes_gdf[node_mask]
+    edge_mask = edges_gdf["nx_start_node_key"].isin(sub_nodes_gdf.index) & edges_gdf[
+        "nx_end_node_key"
+    ].isin(sub_nodes_gdf.index)
+
+    return sub_nodes_gdf, edges_gdf[edge_mask]
+
+
+def reachable_nodes(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    max_distance: float,
+) -> pd.Index:
+    """
+    Return the keys of the nodes within `max_distance` network distance of any live node.
+
+    Distances are per the edge geom lengths, as used by the shortest path searches, and are found
+    by one Dijkstra search from all live nodes together, stopping at `max_distance`.
+    """
+    edge_lengths = pd.DataFrame(
+        {
+            "start": nodes_gdf.index.get_indexer(edges_gdf["nx_start_node_key"]),
+            "end": nodes_gdf.index.get_indexer(edges_gdf["nx_end_node_key"]),
+            # zero weights would be read as missing edges
+            "length": np.maximum(shapely.length(edges_gdf.geometry.to_numpy()), 1e-9),
+        }
+    )
+    # the sparse matrix would otherwise sum the lengths of any parallel edges
+    edge_lengths = edge_lengths[(edge_lengths["start"] >= 0) & (edge_lengths["end"] >= 0)]
+    edge_lengths = edge_lengths.groupby(["start", "end"], as_index=False)["length"].min()
+    graph = sparse.csr_matrix(
+        (edge_lengths["length"], (edge_lengths["start"], edge_lengths["end"])),
+        shape=(len(nodes_gdf), len(nodes_gdf)),
+    )
+    live_idxs = np.flatnonzero(nodes_gdf["live"].to_numpy(dtype=bool))
+    if not len(live_idxs):
+        return nodes_gdf.index[:0]
+    dists = csgraph.dijkstra(graph, indices=live_idxs, min_only=True, limit=max_distance)
+
+    return nodes_gdf.index[dists <= max_distance]
+
+
+def prune_network(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    max_distance: float,
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Drop the nodes beyond `max_distance` network distance of every live node, and their edges.
+
+    Searches from live nodes out to `max_distance` only visit the retained nodes, so their results
+    are unchanged. The immediate neighbours of the retained nodes are also kept, so that edges
+    crossing `max_distance` remain for the partial segment lengths of segment centralities.
+    """
+    node_keys = reachable_nodes(nodes_gdf, edges_gdf, max_distance)
+    crossing = edges_gdf["nx_start_node_key"].isin(node_keys)
+    node_keys = node_keys.append(pd.Index(edges_gdf.loc[crossing, "nx_end_node_key"])).unique()
+    logger.info(
+        f"Pruned network to {len(node_keys)} of {len(nodes_gdf)} nodes within {max_distance}m "
+        "of live nodes"
+    )
+
+    return subset_network(nodes_gdf, edges_gdf, node_keys)
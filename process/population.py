@@ -0,0 +1,205 @@
+"""
+Batched raster sampling at dual node locations, and population reachable over the network.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Mapping
+from functools import partial
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import rasterio
+import shapely
+from cityseer import config, rustalgos
+from rasterio.windows import Window
+
+from process import landuse
+
+# as per layers.build_data_map
+N_NEAREST_CANDIDATES = 50
+# raster cells are read in strips of about this many rows
+STRIP_ROWS = 256
+
+
+def _sample_raster(
+    path: str,
+    xs: npt.NDArray[np.float64],
+    ys: npt.NDArray[np.float64],
+    band: int,
+    nodata: float | None,
+    fill_value: float,
+) -> npt.NDArray[np.float64]:
+    """
+    Sample the raster cell containing each point, reading one window per block row.
+    """
+    values = np.full(len(xs), fill_value, dtype=np.float64)
+    with rasterio.open(path) as dataset:
+        if nodata is None:
+            nodata = dataset.nodata
+        # convert all coordinates to fractional cols / rows in one pass
+        cols_f, rows_f = ~dataset.transform * (xs, ys)
+        rows = np.floor(rows_f).astype(np.int64)
+        cols = np.floor(cols_f).astype(np.int64)
+        # points outside the raster keep the fill value
+        in_bounds = (rows >= 0) & (rows < dataset.height) & (cols >= 0) & (cols < dataset.width)
+        pt_idxs = np.flatnonzero(in_bounds)
+        if not len(pt_idxs):
+            return values
+        # group points by block row so that only the needed strips / tiles are read
+        block_height = dataset.block_shapes[band - 1][0]
+        block_rows = rows[pt_idxs] // block_height
+        order = np.argsort(block_rows, kind="stable")
+        pt_idxs = pt_idxs[order]
+        block_rows = block_rows[order]
+        splits = np.flatnonzero(np.diff(block_rows)) + 1
+        for group in np.split(pt_idxs, splits):
+            row_off = int(rows[group].min())
+            col_off = int(cols[group].min())
+            window = Window(
+                col_off,
+                row_off,
+                int(cols[group].max()) - col_off + 1,
+                int(rows[group].max()) - row_off + 1,
+            )
+            block = dataset.read(band, window=window)
+            values[group] = block[rows[group] - row_off, cols[group] - col_off]
+    # nodata and NaN cells take the fill value
+    invalid = np.isnan(values)
+    if nodata is not None:
+        invalid |= values == nodata
+    values[invalid] = fill_value
+
+    return values
+
+
+def sample_rasters(
+    rasters: Mapping[str, str],
+    xs: npt.ArrayLike,
+    ys: npt.ArrayLike,
+    index: pd.Index | None = None,
+    band: int = 1,
+    nodata: float | None = None,
+    fill_value: float = 0,
+    clip_min: float = 0,
+    clip_max: float = np.inf,
+) -> pd.DataFrame:
+    """
+    Sample one or more rasters at the given point coordinates.
+
+    Coordinates are converted to row / col indices as arrays and only the windows containing points
+    are read, so the rasters are never loaded in full. Each raster is returned as a column named per
+    its key in `rasters`, e.g. several GHS-POP epochs can be sampled in one call. Nodata, NaN, and
+    out-of-bounds cells are set to `fill_value` and all values are then clipped to `clip_min` /
+    `clip_max`.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if xs.shape != ys.shape:
+        raise ValueError("The x and y coordinate arrays must have the same shape.")
+    samples = {}
+    for col_key, path in rasters.items():
+        values = _sample_raster(path, xs, ys, band=band, nodata=nodata, fill_value=fill_value)
+        samples[col_key] = np.clip(values, clip_min, clip_max)
+
+    return pd.DataFrame(samples, index=index)
+
+
+def raster_cells(
+    path: str,
+    band: int = 1,
+    nodata: float | None = None,
+    bounds: tuple[float, float, float, float] | None = None,
+) -> pd.DataFrame:
+    """
+    Return the cells with positive values as their centre coordinates and values.
+
+    The raster is read in strips of whole blocks, optionally only within `bounds` as (minx, miny,
+    maxx, maxy), and the cells are kept as `x`, `y`, and `value` columns rather than as geometries.
+    Nodata and NaN cells are skipped. Raises a `ValueError` if `bounds` don't overlap the raster.
+    """
+    frames = []
+    with rasterio.open(path) as dataset:
+        if nodata is None:
+            nodata = dataset.nodata
+        row_start, row_stop, col_start, col_stop = 0, dataset.height, 0, dataset.width
+        if bounds is not None:
+            cols_f, rows_f = ~dataset.transform * (
+                np.array([bounds[0], bounds[2]]),
+                np.array([bounds[1], bounds[3]]),
+            )
+            col_start = max(col_start, int(np.floor(cols_f.min())))
+            col_stop = min(col_stop, int(np.ceil(cols_f.max())))
+            row_start = max(row_start, int(np.floor(rows_f.min())))
+            row_stop = min(row_stop, int(np.ceil(rows_f.max())))
+            if col_start >= col_stop or row_start >= row_stop:
+                raise ValueError(
+                    f"The bounds {tuple(bounds)} don't overlap the raster {path} with bounds "
+                    f"{tuple(dataset.bounds)}, check that both are in the same CRS."
+                )
+        # strips of whole blocks, of about STRIP_ROWS rows
+        block_height = dataset.block_shapes[band - 1][0]
+        strip_height = block_height * max(1, STRIP_ROWS // block_height)
+        for strip_off in range(row_start, row_stop, strip_height):
+            window = Window(
+                col_start,
+                strip_off,
+                col_stop - col_start,
+                min(strip_height, row_stop - strip_off),
+            )
+            strip = dataset.read(band, window=window).astype(np.float64)
+            valid = ~np.isnan(strip) & (strip > 0)
+            if nodata is not None:
+                valid &= strip != nodata
+            rows, cols = np.nonzero(valid)
+            xs, ys = dataset.transform * (cols + col_start + 0.5, rows + strip_off + 0.5)
+            frames.append(pd.DataFrame({"x": xs, "y": ys, "value": strip[rows, cols]}))
+    if not frames:
+        return pd.DataFrame(columns=["x", "y", "value"], dtype=np.float64)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def compute_population_access(
+    cells: pd.DataFrame,
+    network_structure: rustalgos.graph.NetworkStructure,
+    node_index: pd.Index,
+    distances: list[int],
+    col_label: str = "pop",
+    max_netw_assign_dist: int = landuse.MAX_ASSIGN_DIST,
+) -> pd.DataFrame:
+    """
+    Sum the cell values reachable within each distance, named as per `layers.compute_stats`.
+
+    Cells are assigned to the network once, as points, and are summed for all distances in one
+    pass, both unweighted and weighted by distance decay. The points' WKT is built from the
+    coordinate arrays in one call, as the `DataMap` only takes entries one at a time.
+    """
+    cell_keys = cells.index.tolist()
+    cell_points = shapely.points(cells["x"].to_numpy(np.float64), cells["y"].to_numpy(np.float64))
+    cell_wkts = shapely.to_wkt(cell_points, rounding_precision=-1)
+    data_map = rustalgos.data.DataMap()
+    # consumes the inserts without a python level loop body
+    deque(map(data_map.insert, cell_keys, cell_wkts.tolist()), maxlen=0)
+    data_map.assign_data_to_network(network_structure, max_netw_assign_dist, N_NEAREST_CANDIDATES)
+    result = config.wrap_progress(
+        total=network_structure.street_node_count(),
+        rust_struct=data_map,
+        partial_func=partial(
+            data_map.stats,
+            network_structure=network_structure,
+            numerical_maps=[dict(zip(cell_keys, cells["value"].tolist(), strict=True))],
+            distances=distances,
+        ),
+    )
+    stats = result.result[0]
+    temp_data = {}
+    for distance in distances:
+        nw_key = config.prep_gdf_key(f"{col_label}_sum", distance, weighted=False)
+        temp_data[nw_key] = stats.sum[distance]
+        wt_key = config.prep_gdf_key(f"{col_label}_sum", distance, weighted=True)
+        temp_data[wt_key] = stats.sum_wt[distance]
+
+    return pd.DataFrame(temp_data, index=result.node_keys_py).reindex(node_index)
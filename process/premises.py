@@ -0,0 +1,124 @@
+"""
+Premises census loading and cleaning.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyogrio
+
+from process import premises_lu_schema
+
+# census columns retained, renamed to english
+PREMISES_COLUMNS = {
+    "id_local": "local_id",
+    "id_distrito_local": "local_distr_id",
+    "desc_distrito_local": "local_distr_desc",
+    "id_barrio_local": "local_neighb_id",
+    "desc_barrio_local": "local_neighb_desc",
+    "cod_barrio_local": "local_neighb_code",
+    "id_seccion_censal_local": "local_census_section_id",
+    "desc_seccion_censal_local": "local_census_section_desc",
+    "id_seccion": "section_id",
+    "desc_seccion": "section_desc",
+    "id_division": "division_id",
+    "desc_division": "division_desc",
+    "id_epigrafe": "epigraph_id",
+    "desc_epigrafe": "epigraph_desc",
+}
+# description columns are held as categoricals
+CATEGORICAL_COLUMNS = [
+    "local_distr_desc",
+    "local_neighb_desc",
+    "local_census_section_desc",
+    "section_desc",
+    "division_desc",
+    "epigraph_desc",
+]
+
+
+def map_categories(values: pd.Series, mapping: Mapping[str, str]) -> pd.Categorical:
+    """
+    Map a categorical's categories per `mapping`, leaving unmapped categories as they are.
+
+    Equivalent to `Series.replace(mapping)` but only the categories are mapped, with the codes then
+    remapped in one pass. Categories mapping to the same value are merged.
+    """
+    mapped = pd.Index([mapping.get(cat, cat) for cat in values.cat.categories])
+    categories = mapped.unique()
+    code_map = categories.get_indexer(mapped)
+    codes = values.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(
+        np.where(codes >= 0, code_map[codes], -1), categories=categories
+    )
+
+
+def categories_contain(values: pd.Series, pattern: str) -> np.ndarray:
+    """
+    Flag the values whose category matches the regex `pattern`, with missing values as False.
+    """
+    cat_matches = np.asarray(values.cat.categories.str.contains(pattern), dtype=bool)
+    codes = values.cat.codes.to_numpy()
+    return np.where(codes >= 0, cat_matches[codes], False)
+
+
+def clean_premises(premises: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Rename columns to english, map the section and division descriptions, and remove nulls.
+    """
+    premises = premises.rename(columns=PREMISES_COLUMNS)
+    premises = premises.astype({col: "category" for col in CATEGORICAL_COLUMNS})
+    # map section and division descriptions to english
+    premises["section_desc"] = map_categories(
+        premises["section_desc"], premises_lu_schema.section_schema
+    )
+    premises["division_desc"] = map_categories(
+        premises["division_desc"], premises_lu_schema.division_schema
+    )
+    # remove none / null
+    keep = ~categories_contain(premises["section_desc"], "none|null")
+    keep &= ~categories_contain(premises["division_desc"], "Null Value at Origin|No Activity")
+
+    return premises[keep]
+
+
+def load_premises(path: str, chunk_size: int | None = None) -> gpd.GeoDataFrame:
+    """
+    Load and clean the premises census, reading only the retained columns.
+
+    Columns are read via Arrow. If `chunk_size` is given then the file is read and cleaned in chunks
+    of `chunk_size` features so that only the cleaned premises are held in memory. The index is the
+    feature's position in the file, cast to string, and the categories are sorted.
+    """
+    feature_count = pyogrio.read_info(path)["features"]
+    chunk_size = chunk_size or max(feature_count, 1)
+    chunks = []
+    for skip_features in range(0, max(feature_count, 1), chunk_size):
+        chunk = gpd.read_file(
+            path,
+            columns=list(PREMISES_COLUMNS),
+            use_arrow=True,
+            skip_features=skip_features,
+            max_features=chunk_size,
+        )
+        chunk.index = pd.RangeIndex(skip_features, skip_features + len(chunk)).astype(str)
+        chunks.append(clean_premises(chunk))
+    # categories are unioned across chunks, then limited to the retained values and sorted so that
+    # they don't depend on the chunk size
+    premises = pd.concat(chunks)
+    for col in CATEGORICAL_COLUMNS:
+        values = premises[col].astype("category").cat.remove_unused_categories()
+        premises[col] = values.cat.reorder_categories(sorted(values.cat.categories))
+
+    return premises
+
+
+def write_premises(premises: gpd.GeoDataFrame, path: str) -> None:
+    """
+    Write the cleaned premises with categoricals cast back to strings.
+    """
+    premises.astype({col: object for col in CATEGORICAL_COLUMNS}).to_file(path)
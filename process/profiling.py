@@ -0,0 +1,257 @@
+"""
+Per-stage instrumentation and run reports for the metrics pipeline.
+
+Each stage records its wall and CPU time, peak resident memory, item counts, and rows per second.
+Stages can optionally be profiled by sampling the running thread's Python stack, which attributes
+time spent in long running Rust calls to the Python call site. Reports are written as JSON so that
+runs can be compared. Where a report directory is given, the report is rewritten as each stage
+starts and finishes, so that a crashed or killed run still leaves a report up to the failing stage.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+RSS_SAMPLE_INTERVAL = 0.01
+STACK_SAMPLE_INTERVAL = 0.005
+# number of the most frequently sampled stacks included in the report
+TOP_STACKS = 20
+
+
+def current_rss_bytes() -> int:
+    """
+    Return the current resident set size, else the peak resident set size where not on Linux.
+
+    Returns 0 where neither is available, e.g. on Windows.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        if resource is None:
+            return 0
+        # reported in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RSSSampler:
+    """
+    Track the peak resident set size from a background thread.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self) -> RSSSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+class StackSampler:
+    """
+    Count the Python stacks of a thread, sampled from a background thread.
+
+    Stacks are collapsed to `file:function:line` frames joined by `;`, outermost first, per the
+    format read by flame graph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = STACK_SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def __enter__(self) -> StackSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str | Path) -> None:
+        """
+        Write the sampled stacks in collapsed format, one `stack count` line per stack.
+        """
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@dataclass
+class StageRecord:
+    """
+    Measurements for one stage. `counts` and `rows` can be set from within the stage.
+
+    `status` is `running` until the stage finishes as `ok` or `error`.
+    """
+
+    name: str
+    counts: dict[str, int] = field(default_factory=dict)
+    rows: int | None = None
+    cached: bool = False
+    status: str = "running"
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: float = 0.0
+    rss_delta_mb: float = 0.0
+    rows_per_s: float | None = None
+    profile: list[dict[str, Any]] | None = None
+
+
+class StageProfiler:
+    """
+    Record each stage of a run and write the run report.
+
+    Reports are written to `report_dir` as `run_<start time>.json` as each stage starts and
+    finishes, and once more by `write_report` at the end of the run. Stages named in
+    `profile_stages` are stack sampled; their most frequent stacks are included in the report, and
+    the full collapsed stacks are written to `run_<start time>_profiles/<stage>.collapsed` if
+    `report_dir` is given. CPU time is for the whole process, so includes the time of threads
+    spawned by the stage, e.g. Rust workers.
+    """
+
+    def __init__(
+        self,
+        report_dir: str | Path | None = None,
+        profile_stages: set[str] | None = None,
+    ) -> None:
+        self.report_dir = None if report_dir is None else Path(report_dir)
+        self.profile_stages = set(profile_stages or ())
+        self.stages: list[StageRecord] = []
+        self.started_at = datetime.now(UTC)
+        self.run_name = f"run_{self.started_at:%Y%m%dT%H%M%SZ}"
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None, **counts: int) -> Iterator[StageRecord]:
+        """
+        Measure the enclosed block as stage `name`, yielding its record.
+        """
+        record = StageRecord(name, counts=dict(counts), rows=rows)
+        self.stages.append(record)
+        self._write_progress()
+        stack_sampler = None
+        if name in self.profile_stages:
+            stack_sampler = StackSampler(threading.get_ident())
+            stack_sampler.__enter__()
+        start_rss = current_rss_bytes()
+        try:
+            with RSSSampler() as rss_sampler:
+                start_wall = time.perf_counter()
+                start_cpu = time.process_time()
+                try:
+                    yield record
+                    record.status = "ok"
+                except BaseException:
+                    record.status = "error"
+                    raise
+                finally:
+                    record.wall_s = round(time.perf_counter() - start_wall, 4)
+                    record.cpu_s = round(time.process_time() - start_cpu, 4)
+        finally:
+            if stack_sampler is not None:
+                stack_sampler.__exit__()
+                record.profile = [
+                    {"stack": stack, "samples": count}
+                    for stack, count in stack_sampler.stacks.most_common(TOP_STACKS)
+                ]
+                if self.report_dir is not None:
+                    profile_dir = self.report_dir / f"{self.run_name}_profiles"
+                    profile_dir.mkdir(parents=True, exist_ok=True)
+                    stack_sampler.write_collapsed(profile_dir / f"{name}.collapsed")
+            record.peak_rss_mb = round(rss_sampler.peak / 1024**2, 1)
+            record.rss_delta_mb = round((rss_sampler.peak - start_rss) / 1024**2, 1)
+            if record.rows is not None and record.wall_s > 0:
+                record.rows_per_s = round(record.rows / record.wall_s, 1)
+            self._write_progress()
+            logger.info(
+                f"Stage {name}: {record.wall_s}s wall, {record.cpu_s}s CPU, "
+                f"{record.peak_rss_mb}MB peak RSS"
+            )
+
+    def report(self) -> dict[str, Any]:
+        """
+        Return the run report with the environment and each stage's measurements.
+        """
+        return {
+            "run_name": self.run_name,
+            "started_at": self.started_at.isoformat(),
+            "wall_s": round((datetime.now(UTC) - self.started_at).total_seconds(), 4),
+            "host": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "stages": [asdict(record) for record in self.stages],
+        }
+
+    def _write_progress(self) -> None:
+        # the report is kept current in case the run does not reach write_report
+        if self.report_dir is not None:
+            self._dump_report(self.report_dir / f"{self.run_name}.json")
+
+    def _dump_report(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file then moved, so a killed run never leaves a partial report
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        tmp_path.replace(path)
+
+    def write_report(self, path: str | Path | None = None) -> Path:
+        """
+        Write the run report as JSON, by default to `report_dir`, returning the path.
+        """
+        if path is None:
+            if self.report_dir is None:
+                raise ValueError("A path is required where the profiler has no report_dir.")
+            path = self.report_dir / f"{self.run_name}.json"
+        path = Path(path)
+        self._dump_report(path)
+        logger.info(f"Run report written to {path}")
+        return path
@@ -0,0 +1,299 @@
+"""
+Indexed spatial and district queries over the written nodes dataset, and a local HTTP server for
+the same queries.
+
+Serve a dataset with e.g.:
+
+    python -m process.query temp/dataset --port 8000
+
+and query `/bbox?bounds=minx,miny,maxx,maxy&columns=cc_beta_500,cc_retail_500_wt`, or likewise
+`/radius?x=..&y=..&distance=..`, `/polygon?wkt=..`, `/district?name=..`, and
+`/neighbourhood?name=..`. `/columns` lists the queryable columns. Responses are GeoJSON in the
+dataset CRS unless an EPSG code is given as `crs`. Errors are returned as JSON `{"error": ..}`,
+with status 400 for malformed parameters, 404 for unknown routes, columns, or names, and 500
+otherwise.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import shapely
+from shapely import geometry
+
+from process import dataset_io
+
+logger = logging.getLogger(__name__)
+
+# number of column blocks, one per column and district, kept in memory
+BLOCK_CACHE_SIZE = 256
+
+
+class DatasetQuery:
+    """
+    Bounding box, radius, polygon, district, and neighbourhood queries for columns of a dataset.
+
+    Node geometries, districts, and neighbourhoods are read once when opened, with the geometries
+    indexed by an STRtree. Metric columns are read per district partition as they are queried, and
+    the `cache_size` most recently used column blocks are kept in memory. Queries can be run from
+    concurrent threads.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        cache_size: int = BLOCK_CACHE_SIZE,
+        partition_col: str = "district",
+        neighbourhood_col: str = "neighb",
+    ) -> None:
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self.partition_col = partition_col
+        self.neighbourhood_col = neighbourhood_col
+        self.nodes = dataset_io.read_dataset(
+            path, columns=[partition_col, neighbourhood_col], partition_col=partition_col
+        )
+        self.nodes[partition_col] = self.nodes[partition_col].astype(str)
+        self.tree = shapely.STRtree(self.nodes.geometry.to_numpy())
+        self.columns = [
+            col
+            for col in dataset_io.dataset_columns(path)
+            if col not in [partition_col, neighbourhood_col]
+        ]
+        self._lookups = {
+            col: {
+                name: np.sort(positions)
+                for name, positions in self.nodes.groupby(col, sort=False).indices.items()
+            }
+            for col in [partition_col, neighbourhood_col]
+        }
+        # each node's position within its district, as column blocks are read per district
+        self._block_offsets = np.empty(len(self.nodes), dtype=np.int64)
+        for positions in self._lookups[partition_col].values():
+            self._block_offsets[positions] = np.arange(len(positions))
+        self._blocks: OrderedDict[tuple[str, str], npt.NDArray[Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"Opened dataset of {len(self.nodes)} nodes and {len(self.columns)} columns")
+
+    def _cached_block(self, column: str, district: str) -> npt.NDArray[Any] | None:
+        with self._lock:
+            block = self._blocks.get((column, district))
+            if block is not None:
+                self._blocks.move_to_end((column, district))
+        return block
+
+    def _cache_block(self, column: str, district: str, block: npt.NDArray[Any]) -> None:
+        with self._lock:
+            self._blocks[(column, district)] = block
+            self._blocks.move_to_end((column, district))
+            while len(self._blocks) > self.cache_size:
+                self._blocks.popitem(last=False)
+
+    def _load_blocks(self, columns: Sequence[str], district: str) -> dict[str, npt.NDArray[Any]]:
+        blocks = {col: self._cached_block(col, district) for col in columns}
+        missing = [col for col, block in blocks.items() if block is None]
+        if missing:
+            district_gdf = dataset_io.read_dataset(
+                self.path, districts=[district], columns=missing, partition_col=self.partition_col
+            )
+            # aligned to the node order of the district
+            keys = self.nodes.index[self._lookups[self.partition_col][district]]
+            district_gdf = district_gdf.reindex(keys)
+            for col in missing:
+                blocks[col] = district_gdf[col].to_numpy()
+                self._cache_block(col, district, blocks[col])
+
+        return blocks
+
+    def select(self, positions: npt.ArrayLike, columns: Sequence[str] = ()) -> gpd.GeoDataFrame:
+        """
+        Return the nodes at `positions` with their district, neighbourhood, and `columns`.
+        """
+        columns = list(dict.fromkeys(columns))
+        unknown = [col for col in columns if col not in self.columns]
+        if unknown:
+            raise KeyError(f"Columns not in the dataset: {', '.join(unknown)}.")
+        positions = np.sort(np.asarray(positions, dtype=np.int64))
+        nodes_gdf = self.nodes.iloc[positions].copy()
+        districts = nodes_gdf[self.partition_col].to_numpy()
+        values = {}
+        for district in np.unique(districts):
+            in_district = districts == district
+            offsets = self._block_offsets[positions[in_district]]
+            for col, block in self._load_blocks(columns, district).items():
+                # partitions share the schema, so blocks of a column share the dtype
+                values.setdefault(col, np.empty(len(positions), dtype=block.dtype))
+                values[col][in_district] = block[offsets]
+
+        return nodes_gdf.assign(**values)
+
+    def bbox(
+        self, bounds: tuple[float, float, float, float], columns: Sequence[str] = ()
+    ) -> gpd.GeoDataFrame:
+        """
+        Return the nodes intersecting the `(minx, miny, maxx, maxy)` bounds.
+        """
+        return self.polygon(shapely.box(*bounds), columns)
+
+    def radius(
+        self, x: float, y: float, distance: float, columns: Sequence[str] = ()
+    ) -> gpd.GeoDataFrame:
+        """
+        Return the nodes within `distance` of the point, in the dataset CRS units.
+        """
+        positions = self.tree.query(geometry.Point(x, y), predicate="dwithin", distance=distance)
+
+        return self.select(positions, columns)
+
+    def polygon(self, geom: shapely.Geometry, columns: Sequence[str] = ()) -> gpd.GeoDataFrame:
+        """
+        Return the nodes intersecting the polygon, in the dataset CRS.
+        """
+        return self.select(self.tree.query(geom, predicate="intersects"), columns)
+
+    def _lookup(self, col: str, name: str, columns: Sequence[str]) -> gpd.GeoDataFrame:
+        if name not in self._lookups[col]:
+            raise KeyError(f"No nodes with {col} {name}.")
+        return self.select(self._lookups[col][name], columns)
+
+    def district(self, name: str, columns: Sequence[str] = ()) -> gpd.GeoDataFrame:
+        """
+        Return the nodes in the district.
+        """
+        return self._lookup(self.partition_col, name, columns)
+
+    def neighbourhood(self, name: str, columns: Sequence[str] = ()) -> gpd.GeoDataFrame:
+        """
+        Return the nodes in the neighbourhood.
+        """
+        return self._lookup(self.neighbourhood_col, name, columns)
+
+
+def _param(params: dict[str, str], key: str) -> str:
+    if key not in params:
+        raise ValueError(f"Missing parameter {key}.")
+    return params[key]
+
+
+def _floats(value: str, count: int) -> list[float]:
+    values = [float(val) for val in value.split(",")]
+    if len(values) != count:
+        raise ValueError(f"Expected {count} comma separated values, got {value}.")
+    return values
+
+
+def run_query(query: DatasetQuery, route: str, params: dict[str, str]) -> gpd.GeoDataFrame:
+    """
+    Run the query for an HTTP route, with the query string parameters as strings.
+
+    Raises ValueError for missing or malformed parameters and KeyError for unknown columns or names.
+    """
+    columns = [col for col in params.get("columns", "").split(",") if col]
+    match route:
+        case "bbox":
+            return query.bbox(tuple(_floats(_param(params, "bounds"), 4)), columns)
+        case "radius":
+            x, y, distance = (float(_param(params, key)) for key in ["x", "y", "distance"])
+            return query.radius(x, y, distance, columns)
+        case "polygon":
+            return query.polygon(shapely.from_wkt(_param(params, "wkt")), columns)
+        case "district":
+            return query.district(_param(params, "name"), columns)
+        case "neighbourhood":
+            return query.neighbourhood(_param(params, "name"), columns)
+    raise ValueError(f"Unknown route {route}.")
+
+
+ROUTES = ["columns", "bbox", "radius", "polygon", "district", "neighbourhood"]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON responses for the `DatasetQuery` set on the server.
+    """
+
+    server: QueryServer
+
+    def _respond(self, status: HTTPStatus, body: str) -> None:
+        content = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        route = url.path.strip("/")
+        params = {key: vals[-1] for key, vals in parse_qs(url.query).items()}
+        if route not in ROUTES:
+            self._respond(HTTPStatus.NOT_FOUND, json.dumps({"error": f"Unknown route {route}."}))
+            return
+        try:
+            if route == "columns":
+                self._respond(HTTPStatus.OK, json.dumps({"columns": self.server.query.columns}))
+                return
+            nodes_gdf = run_query(self.server.query, route, params)
+            if "crs" in params:
+                nodes_gdf = nodes_gdf.to_crs(int(params["crs"]))
+            self._respond(HTTPStatus.OK, nodes_gdf.to_json(na="null"))
+        except KeyError as err:
+            # unknown columns or names
+            self._respond(HTTPStatus.NOT_FOUND, json.dumps({"error": err.args[0]}))
+        except (ValueError, shapely.errors.ShapelyError) as err:
+            self._respond(HTTPStatus.BAD_REQUEST, json.dumps({"error": str(err)}))
+        except Exception as err:
+            # e.g. unknown CRS codes, or an unreadable dataset, are reported rather than dropping
+            # the connection
+            logger.exception(f"Query {self.path} failed")
+            self._respond(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                json.dumps({"error": f"{type(err).__name__}: {err}"}),
+            )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server sharing one opened dataset, and its column block cache, across requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, query: DatasetQuery, host: str = "127.0.0.1", port: int = 8000) -> None:
+        self.query = query
+        super().__init__((host, port), QueryHandler)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve spatial queries over the nodes dataset.")
+    parser.add_argument("path", type=Path, help="partitioned GeoParquet dataset")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=BLOCK_CACHE_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+
+    server = QueryServer(DatasetQuery(args.path, cache_size=args.cache_size), args.host, args.port)
+    logger.info(f"Serving {args.path} at http://{args.host}:{server.server_port}")
+    with server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Memory-mapped column store for per-node metrics.
+
+Metrics are held as one float32 `.npy` file per column, in node order, instead of as columns of the
+nodes GeoDataFrame, so the frame does not grow with each metric added. Columns are only read into
+memory when materialised for writing or querying, and then only for the requested rows. A JSON
+manifest records the node count and the file for each column, in the order the columns were added.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.npy"
+DTYPE = np.float32
+
+
+class ResultStore:
+    """
+    Float32 metric columns keyed by node, backed by memory-mapped files in `store_dir`.
+
+    Use `ResultStore.create` to start a store for a node index, or `ResultStore(store_dir)` to open
+    an existing one.
+    """
+
+    def __init__(self, store_dir: str | Path) -> None:
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / MANIFEST_NAME) as f:
+            manifest = json.load(f)
+        self._files: dict[str, str] = manifest["columns"]
+        self.index = pd.Index(np.load(self.store_dir / INDEX_NAME), name=manifest["index_name"])
+        if len(self.index) != manifest["node_count"]:
+            raise ValueError(f"Index of {len(self.index)} nodes does not match the manifest.")
+
+    @classmethod
+    def create(cls, store_dir: str | Path, index: pd.Index) -> ResultStore:
+        """
+        Create an empty store for the nodes in `index`, replacing any existing store.
+        """
+        store_dir = Path(store_dir)
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        store_dir.mkdir(parents=True)
+        np.save(store_dir / INDEX_NAME, index.to_numpy(dtype=np.str_))
+        cls._write_manifest(store_dir, len(index), index.name, {})
+
+        return cls(store_dir)
+
+    @staticmethod
+    def _write_manifest(
+        store_dir: Path, node_count: int, index_name: str | None, files: dict[str, str]
+    ) -> None:
+        tmp_path = store_dir / f".{MANIFEST_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"node_count": node_count, "index_name": index_name, "columns": files},
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, store_dir / MANIFEST_NAME)
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._files)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._files
+
+    def put(self, data: pd.DataFrame | pd.Series) -> None:
+        """
+        Write the columns of `data`, aligned to the store's nodes, replacing any existing columns.
+
+        Nodes missing from `data` are set to NaN.
+        """
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+        if not data.index.equals(self.index):
+            data = data.reindex(self.index)
+        for column in data.columns:
+            file_name = self._files.get(column, f"col_{len(self._files):05d}.npy")
+            tmp_path = self.store_dir / f".{file_name}.tmp"
+            values = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=DTYPE, shape=(len(self),))
+            values[:] = data[column].to_numpy(dtype=DTYPE, na_value=np.nan)
+            values.flush()
+            del values
+            os.replace(tmp_path, self.store_dir / file_name)
+            self._files[column] = file_name
+        self._write_manifest(self.store_dir, len(self), self.index.name, self._files)
+        logger.info(f"Stored {data.shape[1]} columns, {len(self._files)} in total")
+
+    def column(self, column: str) -> np.memmap:
+        """
+        Return a read-only memory map of a column.
+        """
+        if column not in self._files:
+            raise KeyError(f"Column {column} is not in the result store.")
+        return np.load(self.store_dir / self._files[column], mmap_mode="r")
+
+    def _positions(self, rows: npt.ArrayLike | pd.Index | None) -> slice | npt.NDArray[np.int64]:
+        if rows is None:
+            return slice(None)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            if len(rows) != len(self):
+                raise ValueError(f"Row mask of {len(rows)} does not match {len(self)} nodes.")
+            return np.flatnonzero(rows)
+        positions = self.index.get_indexer(rows)
+        if (positions < 0).any():
+            raise KeyError(f"Nodes not in the result store, e.g. {rows[positions < 0][0]}.")
+        return positions
+
+    def get(
+        self,
+        columns: Sequence[str] | None = None,
+        rows: npt.ArrayLike | pd.Index | None = None,
+    ) -> pd.DataFrame:
+        """
+        Materialise columns, by default all, for the rows selected by node keys or a boolean mask.
+        """
+        columns = self.columns if columns is None else list(columns)
+        positions = self._positions(rows)
+
+        return pd.DataFrame(
+            {column: np.asarray(self.column(column)[positions]) for column in columns},
+            index=self.index[positions],
+        )
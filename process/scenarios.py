@@ -0,0 +1,407 @@
+"""
+What-if street edits, with centralities and land-uses recomputed only for the affected nodes.
+
+A scenario adds streets and removes existing streets, i.e. dual nodes. A shortest or simplest path
+of length at most d passing through a node lies entirely within network distance d of that node, but
+cycles and the simplest and segment traversals depend on everything reachable from sources within d
+of the node, so a node's centralities only depend on the network within `halo_factor` x the maximum
+distance of the node (Euclidean distances never exceed network distances). Only live nodes within
+this reach of the edits can change. These are recomputed against the edited
+network within the same reach of them, and their land-uses likewise within the maximum land-use
+distance. The dual is only rebuilt for the region around the edits, and the results are returned as
+a diff against the baseline result store.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import shapely
+from shapely import ops
+
+from process import centrality, dual_network, landuse, network_structures, result_store
+
+logger = logging.getLogger(__name__)
+
+# added street ends within this distance of a primal node or street are joined to it
+SNAP_TOLERANCE = 5
+DIFF_COLS = ["scenario", "node", "status", "column", "baseline", "edited", "delta"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Streets to add, as LineStrings, and existing streets to remove, as dual node keys.
+    """
+
+    name: str
+    add_streets: tuple[shapely.LineString, ...] = ()
+    remove_streets: tuple[str, ...] = ()
+
+
+@dataclass
+class EditedNetwork:
+    """
+    The edited dual network for the region around a scenario's edits.
+
+    `added` and `removed` are the dual node keys of the added and removed streets, including the
+    parts of streets split to join added streets. `edit_geoms` are the geoms of these streets, and
+    of any removed streets added back unchanged, which are kept.
+    """
+
+    nodes_gdf: gpd.GeoDataFrame
+    edges_gdf: gpd.GeoDataFrame
+    added: pd.Index
+    removed: pd.Index
+    edit_geoms: npt.NDArray[np.object_]
+
+
+class _StreetEdits:
+    """
+    The primal streets of a region, as dual nodes, with streets added and removed.
+    """
+
+    def __init__(self, nodes_gdf: gpd.GeoDataFrame, snap_tolerance: float) -> None:
+        self.snap_tolerance = snap_tolerance
+        self.geoms = list(nodes_gdf.geometry.to_numpy())
+        self.dual_keys: list[str | None] = nodes_gdf.index.tolist()
+        self.live = nodes_gdf["live"].to_numpy(dtype=bool).tolist()
+        self.edge_keys = nodes_gdf["primal_edge_idx"].to_numpy(dtype=np.int64).tolist()
+        key_a = nodes_gdf["primal_edge_node_a"].to_numpy(dtype=np.str_)
+        key_b = nodes_gdf["primal_edge_node_b"].to_numpy(dtype=np.str_)
+        first_xy = shapely.get_coordinates(shapely.get_point(nodes_gdf.geometry.to_numpy(), 0))
+        last_xy = shapely.get_coordinates(shapely.get_point(nodes_gdf.geometry.to_numpy(), -1))
+        # geoms run from either of their primal nodes
+        a_first = dual_network.node_keys_from_xy(dual_network.round_coords(first_xy)) == key_a
+        start_keys = np.where(a_first, key_a, key_b)
+        end_keys = np.where(a_first, key_b, key_a)
+        node_idxs, node_keys = pd.factorize(np.concatenate([start_keys, end_keys]))
+        node_xy = np.zeros((len(node_keys), 2))
+        node_xy[node_idxs] = dual_network.round_coords(np.concatenate([first_xy, last_xy]))
+        self.node_keys: list[str] = list(node_keys)
+        self.node_xy = node_xy
+        self.node_lookup = {key: idx for idx, key in enumerate(self.node_keys)}
+        self.starts = node_idxs[: len(self.geoms)].tolist()
+        self.ends = node_idxs[len(self.geoms) :].tolist()
+        self.a_starts = a_first.tolist()
+        self.kept = [True] * len(self.geoms)
+        self.removed_geoms: list[shapely.LineString] = []
+        self.removed_keys: list[str] = []
+        self.restored_geoms: list[shapely.LineString] = []
+
+    def remove(self, dual_key: str) -> None:
+        street_idx = self.dual_keys.index(dual_key)
+        self.kept[street_idx] = False
+        self.removed_geoms.append(self.geoms[street_idx])
+        self.removed_keys.append(dual_key)
+
+    def _node(self, xy: npt.NDArray[np.float64]) -> int:
+        xy = dual_network.round_coords(xy)
+        node_key = str(dual_network.node_keys_from_xy(xy[None])[0])
+        if node_key not in self.node_lookup:
+            self.node_lookup[node_key] = len(self.node_keys)
+            self.node_keys.append(node_key)
+            self.node_xy = np.vstack([self.node_xy, xy])
+        return self.node_lookup[node_key]
+
+    def _append(self, geom: shapely.LineString, start: int, end: int, live: bool) -> None:
+        # the ends are set to the primal nodes' coordinates
+        coords = shapely.get_coordinates(geom)
+        coords[0], coords[-1] = self.node_xy[start], self.node_xy[end]
+        self.geoms.append(shapely.linestrings(coords))
+        self.dual_keys.append(None)
+        self.live.append(live)
+        self.edge_keys.append(-1)
+        self.a_starts.append(True)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.kept.append(True)
+
+    def join(self, xy: npt.NDArray[np.float64]) -> int:
+        """
+        Return the primal node for an added street end, splitting the nearest street if needed.
+        """
+        node_dists = np.hypot(*(self.node_xy - xy).T)
+        if node_dists.min() <= self.snap_tolerance:
+            return int(node_dists.argmin())
+        point = shapely.points(xy)
+        street_dists = np.where(self.kept, shapely.distance(np.array(self.geoms), point), np.inf)
+        street_idx = int(street_dists.argmin())
+        if street_dists[street_idx] > self.snap_tolerance:
+            # dead end
+            return self._node(xy)
+        geom = self.geoms[street_idx]
+        split_dist = shapely.line_locate_point(geom, point)
+        split_xy = shapely.get_coordinates(shapely.line_interpolate_point(geom, split_dist))[0]
+        node_idx = self._node(split_xy)
+        self.kept[street_idx] = False
+        if self.dual_keys[street_idx] is not None:
+            self.removed_geoms.append(geom)
+            self.removed_keys.append(self.dual_keys[street_idx])
+        start, end, live = self.starts[street_idx], self.ends[street_idx], self.live[street_idx]
+        self._append(ops.substring(geom, 0, split_dist), start, node_idx, live)
+        self._append(ops.substring(geom, split_dist, geom.length), node_idx, end, live)
+        return node_idx
+
+    def _restore(self, geom: shapely.LineString, start: int, end: int) -> bool:
+        # a removed street added back unchanged is kept, with its key and position
+        for removed_idx, dual_key in enumerate(self.removed_keys):
+            street_idx = self.dual_keys.index(dual_key)
+            if {self.starts[street_idx], self.ends[street_idx]} == {start, end} and shapely.equals(
+                self.geoms[street_idx], geom
+            ):
+                self.kept[street_idx] = True
+                self.removed_keys.pop(removed_idx)
+                self.restored_geoms.append(self.removed_geoms.pop(removed_idx))
+                return True
+        return False
+
+    def add(self, geom: shapely.LineString, live: bool) -> None:
+        coords = shapely.get_coordinates(geom)
+        start, end = self.join(coords[0]), self.join(coords[-1])
+        if not self._restore(geom, start, end):
+            self._append(geom, start, end, live)
+
+    def to_dual(
+        self, taken_keys: pd.Index, crs: object
+    ) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame, pd.Index]:
+        """
+        Build the dual of the kept streets, returning the keys of the added streets.
+
+        Added streets are keyed after any parallel streets in `taken_keys`, so keys are not reused.
+        """
+        idxs = np.flatnonzero(self.kept)
+        starts, ends = np.array(self.starts)[idxs], np.array(self.ends)[idxs]
+        a_starts = np.array(self.a_starts)[idxs]
+        node_keys = np.array(self.node_keys, dtype=np.str_)
+        edge_keys = np.array(self.edge_keys)[idxs]
+        taken = set(taken_keys)
+        for idx in np.flatnonzero(edge_keys < 0):
+            key_lo, key_hi = sorted([node_keys[starts[idx]], node_keys[ends[idx]]])
+            edge_key = 0
+            while f"{key_lo}_{key_hi}_k{edge_key}" in taken:
+                edge_key += 1
+            taken.add(f"{key_lo}_{key_hi}_k{edge_key}")
+            edge_keys[idx] = edge_key
+        edges = dual_network.PrimalEdges(
+            starts, ends, np.array(self.geoms, dtype=object)[idxs], np.arange(len(idxs))
+        )
+        nodes_gdf, edges_gdf = dual_network.build_dual(
+            edges,
+            node_keys,
+            np.where(a_starts, starts, ends),
+            np.where(a_starts, ends, starts),
+            edge_keys,
+            np.array(self.live)[idxs],
+            crs,
+        )
+        is_added = np.array([self.dual_keys[idx] is None for idx in idxs], dtype=bool)
+
+        return nodes_gdf, edges_gdf, nodes_gdf.index[is_added]
+
+
+def edit_network(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    scenario: Scenario,
+    snap_tolerance: float = SNAP_TOLERANCE,
+) -> EditedNetwork:
+    """
+    Apply a scenario's edits to the dual network.
+
+    Added street ends are joined to the nearest primal node within `snap_tolerance`, else to the
+    nearest street within `snap_tolerance`, which is split in two at that point, else are left as
+    dead ends. Split streets keep their liveness, and added streets are live where the nearest
+    existing street is live. The dual is only rebuilt for the streets touching the edits and is
+    spliced back into the network. Existing nodes and edges keep their keys and order, and added
+    ones follow them.
+    """
+    removed = pd.Index(scenario.remove_streets, dtype=object)
+    missing = removed.difference(nodes_gdf.index)
+    if len(missing):
+        raise KeyError(f"Streets to remove are not in the network, e.g. {missing[0]}.")
+    add_geoms = np.array(scenario.add_streets, dtype=object)
+    street_geoms = nodes_gdf.geometry.to_numpy()
+    seed_geoms = np.concatenate([nodes_gdf.geometry.loc[removed].to_numpy(), add_geoms])
+    # streets sharing a primal node with an edited street, allowing for snapped ends
+    in_region = landuse.within_distance(street_geoms, seed_geoms, 2 * snap_tolerance)
+    if not in_region.any():
+        raise ValueError(f"Scenario {scenario.name} has no edits within reach of the network.")
+    street_edits = _StreetEdits(nodes_gdf[in_region], snap_tolerance)
+    for dual_key in removed:
+        street_edits.remove(dual_key)
+    if len(add_geoms):
+        # added streets take the liveness of the nearest existing street
+        _add_idxs, nearest_idxs = shapely.STRtree(street_geoms).query_nearest(
+            shapely.line_interpolate_point(add_geoms, 0.5, normalized=True), all_matches=False
+        )
+        for geom, nearest_idx in zip(add_geoms, nearest_idxs, strict=True):
+            street_edits.add(geom, bool(nodes_gdf["live"].iloc[nearest_idx]))
+    region_nodes_gdf, region_edges_gdf, added = street_edits.to_dual(nodes_gdf.index, nodes_gdf.crs)
+    removed = pd.Index(street_edits.removed_keys, dtype=object)
+    logger.info(f"Scenario {scenario.name}: {len(added)} streets added and {len(removed)} removed")
+    # edges within the region are replaced by those of the rebuilt dual
+    region_keys = nodes_gdf.index[in_region]
+    in_region_edges = edges_gdf["nx_start_node_key"].isin(region_keys) & edges_gdf[
+        "nx_end_node_key"
+    ].isin(region_keys)
+    kept_edges = ~in_region_edges | edges_gdf.index.isin(region_edges_gdf.index)
+    edited_nodes_gdf = pd.concat(
+        [nodes_gdf[~nodes_gdf.index.isin(removed)], region_nodes_gdf.loc[added]]
+    )
+    edited_edges_gdf = pd.concat(
+        [
+            edges_gdf[kept_edges],
+            region_edges_gdf[~region_edges_gdf.index.isin(edges_gdf.index)],
+        ]
+    )
+
+    return EditedNetwork(
+        edited_nodes_gdf,
+        edited_edges_gdf,
+        added,
+        removed,
+        np.concatenate(
+            [
+                np.array(street_edits.removed_geoms, dtype=object),
+                np.array(street_edits.restored_geoms, dtype=object),
+                region_nodes_gdf.geometry.loc[added].to_numpy(),
+            ]
+        ),
+    )
+
+
+def _affected_nodes(
+    nodes_gdf: gpd.GeoDataFrame, edit_geoms: npt.NDArray[np.object_], reach: float
+) -> pd.Index:
+    node_points = shapely.points(nodes_gdf["x"].to_numpy(), nodes_gdf["y"].to_numpy())
+    in_reach = landuse.within_distance(node_points, edit_geoms, reach)
+
+    return nodes_gdf.index[in_reach & nodes_gdf["live"].to_numpy(dtype=bool)]
+
+
+def _diff_values(
+    data: pd.DataFrame,
+    results: result_store.ResultStore,
+    edited: EditedNetwork,
+    rtol: float,
+) -> pd.DataFrame:
+    """
+    Return the values of `data` that differ from the baseline, with those of removed streets.
+    """
+    rows = data.index.union(edited.removed)
+    baseline_rows = rows.intersection(results.index)
+    baseline = results.get(data.columns, rows=baseline_rows).reindex(rows).to_numpy()
+    # compared at the store's precision
+    edited_vals = data.reindex(rows).to_numpy(dtype=result_store.DTYPE)
+    changed = ~np.isclose(edited_vals, baseline, rtol=rtol, atol=0, equal_nan=True)
+    row_idxs, col_idxs = np.nonzero(changed)
+    nodes = rows[row_idxs]
+    status = np.where(
+        nodes.isin(edited.added),
+        "added",
+        np.where(nodes.isin(edited.removed), "removed", "changed"),
+    )
+    diff = pd.DataFrame(
+        {
+            "node": nodes,
+            "status": status,
+            "column": data.columns[col_idxs],
+            "baseline": baseline[row_idxs, col_idxs],
+            "edited": edited_vals[row_idxs, col_idxs],
+        }
+    )
+    diff["delta"] = diff["edited"] - diff["baseline"]
+
+    return diff
+
+
+def evaluate_scenario(
+    scenario: Scenario,
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    results: result_store.ResultStore,
+    premises_gdf: gpd.GeoDataFrame,
+    variants: Sequence[centrality.CentralityVariant],
+    cent_distances: list[int],
+    lu_distances: list[int],
+    angular_scaling_unit: float = 90,
+    farness_scaling_offset: float = 1,
+    halo_factor: float = 2,
+    rtol: float = 1e-5,
+) -> pd.DataFrame:
+    """
+    Recompute the centralities and land-uses affected by a scenario, diffed against the baseline.
+
+    Centralities are recomputed for the live nodes within `halo_factor` x the maximum centrality
+    distance of the edits, and land-uses for those within the maximum land-use distance plus the
+    premises assignment distance. Returns one row per changed value, per `DIFF_COLS`, with the
+    baseline values read from `results` as computed for `nodes_gdf`. Values for added streets have
+    no baseline, and removed streets have no edited values.
+    """
+    cent_reach = halo_factor * max(cent_distances)
+    lu_reach = max(lu_distances) + landuse.MAX_ASSIGN_DIST
+    edited = edit_network(nodes_gdf, edges_gdf, scenario)
+    # centralities against the edited network within reach of the affected nodes
+    cent_nodes = _affected_nodes(edited.nodes_gdf, edited.edit_geoms, cent_reach)
+    cent_nodes_gdf, cent_edges_gdf = network_structures.subset_network(
+        edited.nodes_gdf,
+        edited.edges_gdf,
+        network_structures.halo_keys(edited.nodes_gdf, cent_nodes, cent_reach),
+    )
+    network_structures_cache = {}
+
+    def get_network_structure(length_weighted: bool):
+        if length_weighted not in network_structures_cache:
+            network_structures_cache[length_weighted] = network_structures.build_network_structure(
+                cent_nodes_gdf, cent_edges_gdf, length_weighted
+            )
+        return network_structures_cache[length_weighted]
+
+    cent_data = centrality.compute_centralities(
+        variants,
+        get_network_structure,
+        cent_nodes,
+        distances=cent_distances,
+        angular_scaling_unit=angular_scaling_unit,
+        farness_scaling_offset=farness_scaling_offset,
+    )
+    # land-uses, as per landuse.update_landuses, with only the affected nodes live
+    # the network is pruned to the maximum land-use distance as per the baseline, as premises
+    # equidistant to overlapping edges are otherwise assigned to other edges than for the baseline
+    lu_nodes_gdf, lu_edges_gdf = network_structures.prune_network(
+        edited.nodes_gdf, edited.edges_gdf, max(lu_distances)
+    )
+    lu_nodes = _affected_nodes(lu_nodes_gdf, edited.edit_geoms, lu_reach)
+    lu_points = shapely.points(lu_nodes_gdf.loc[lu_nodes, ["x", "y"]].to_numpy())
+    premises_subset = premises_gdf[
+        landuse.within_distance(premises_gdf.geometry.to_numpy(), lu_points, lu_reach)
+    ]
+    network_structure = network_structures.build_network_structure(
+        lu_nodes_gdf.assign(live=lu_nodes_gdf.index.isin(lu_nodes)),
+        lu_edges_gdf,
+        length_weighted=False,
+    )
+    lu_data = landuse.compute_landuses(premises_subset, network_structure, lu_nodes, lu_distances)
+    logger.info(
+        f"Scenario {scenario.name}: recomputed centralities for {len(cent_nodes)} nodes and "
+        f"land-uses for {len(lu_nodes)} nodes"
+    )
+    diff = pd.concat(
+        [
+            _diff_values(data, results, edited, rtol).assign(scenario=scenario.name)
+            for data in [cent_data, lu_data]
+        ],
+        ignore_index=True,
+    )[DIFF_COLS]
+    logger.info(
+        f"Scenario {scenario.name}: {len(diff)} values changed for {diff['node'].nunique()} nodes"
+    )
+
+    return diff
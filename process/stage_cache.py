@@ -0,0 +1,180 @@
+"""
+Content-addressed on-disk cache for pipeline stages.
+
+Each stage output is pickled under a key hashed from the stage's inputs and parameters. Upstream
+stage keys are passed into downstream keys so that a change to any input invalidates everything that
+depends on it. Entries are written atomically when a stage completes, so rerunning after a crash
+resumes from the last completed stage.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+class StageCache:
+    """
+    Persist and retrieve stage outputs keyed by a hash of their inputs.
+
+    `max_bytes` and `max_age_days` bound the cache: entries older than `max_age_days` are removed,
+    after which the least recently used entries are removed until the total size is within
+    `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int | None = None,
+        max_age_days: float | None = None,
+        enabled: bool = True,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.enabled = enabled
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._digests_path = self.cache_dir / "digests.json"
+
+    def file_digest(self, path: str | Path) -> str:
+        """
+        Return the sha256 digest of a file's contents.
+
+        Digests are remembered against the file's size and modification time so unchanged files are
+        not rehashed.
+        """
+        path = Path(path)
+        stat = path.stat()
+        digests = self._read_digests()
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        abs_path = str(path.resolve())
+        if abs_path in digests and digests[abs_path]["stamp"] == stamp:
+            return digests[abs_path]["digest"]
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(DIGEST_CHUNK_SIZE):
+                hasher.update(chunk)
+        digests[abs_path] = {"stamp": stamp, "digest": hasher.hexdigest()}
+        self._atomic_write(self._digests_path, json.dumps(digests, indent=2).encode())
+        return digests[abs_path]["digest"]
+
+    def key(self, stage: str, *parts: Any) -> str:
+        """
+        Hash a stage name and its JSON-serialisable inputs / parameters into a cache key.
+        """
+        payload = json.dumps([stage, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def run(self, stage: str, key: str, compute: Callable[[], T]) -> T:
+        """
+        Return the cached output for `stage` at `key`, else compute, persist, and return it.
+        """
+        if self.has(stage, key):
+            return self.load(stage, key)
+        logger.info(f"Stage {stage}: computing")
+        output = compute()
+        self.store(stage, key, output)
+        return output
+
+    def load(self, stage: str, key: str) -> Any:
+        """
+        Return the cached output for `stage` at `key`, or None if not cached.
+        """
+        if not self.has(stage, key):
+            return None
+        entry_path = self._entry_path(stage, key)
+        logger.info(f"Stage {stage}: loading cached output {entry_path.name}")
+        with open(entry_path, "rb") as f:
+            output = pickle.load(f)
+        # refresh access time for least recently used eviction
+        os.utime(entry_path)
+        return output
+
+    def store(self, stage: str, key: str, output: Any) -> None:
+        """
+        Persist an output for `stage` at `key`, replacing any existing entry.
+
+        Outputs larger than `max_bytes` are not cached. Otherwise older entries are evicted as
+        needed, but never the entry just written.
+        """
+        if not self.enabled:
+            return
+        entry_path = self._entry_path(stage, key)
+        data = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            logger.warning(
+                f"Stage {stage}: not caching the output of {len(data)} bytes as it exceeds the "
+                f"cache size of {self.max_bytes} bytes"
+            )
+            return
+        self._atomic_write(entry_path, data)
+        self.evict(keep=entry_path)
+
+    def has(self, stage: str, key: str) -> bool:
+        """
+        Whether an output exists for `stage` at `key`.
+        """
+        return self.enabled and self._entry_path(stage, key).exists()
+
+    def evict(self, keep: Path | None = None) -> list[Path]:
+        """
+        Remove entries over the maximum age, then least recently used entries over the size budget.
+
+        The `keep` entry counts towards the size budget but is not removed.
+        """
+        entries = sorted(self.cache_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        removed = []
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            for entry_path in [p for p in entries if p.stat().st_mtime < cutoff]:
+                entry_path.unlink()
+                entries.remove(entry_path)
+                removed.append(entry_path)
+        if self.max_bytes is not None:
+            total_bytes = sum(p.stat().st_size for p in entries)
+            entries = [p for p in entries if p != keep]
+            while entries and total_bytes > self.max_bytes:
+                entry_path = entries.pop(0)
+                total_bytes -= entry_path.stat().st_size
+                entry_path.unlink()
+                removed.append(entry_path)
+        for entry_path in removed:
+            logger.info(f"Evicted cached stage output {entry_path.name}")
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove all cached stage outputs.
+        """
+        for entry_path in self.cache_dir.glob("*.pkl"):
+            entry_path.unlink()
+
+    def _entry_path(self, stage: str, key: str) -> Path:
+        return self.cache_dir / f"{stage}-{key[:24]}.pkl"
+
+    def _read_digests(self) -> dict[str, dict[str, str]]:
+        if not self._digests_path.exists():
+            return {}
+        with open(self._digests_path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        # write to a temporary sibling then rename so interrupted writes never leave partial entries
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
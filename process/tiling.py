@@ -0,0 +1,241 @@
+"""
+Spatially tiled, multi-process centrality.
+
+Nodes are partitioned into tiles and each tile is computed in a worker process against the subgraph
+around it, keeping only the tile's rows. A node's closeness only depends on its own traversal, and
+its betweenness on the paths through it of at most the maximum distance d, whose sources and targets
+are both within d of the node. Only the live nodes within d of a tile are therefore kept live as
+sources, and since their traversals reach at most d further, the subgraph is cut at 2 x d of the
+tile (Euclidean distances never exceed network distances). Each tile's rows then match the single
+process run exactly, so merging needs no rescaling. Live flags can not instead be split between
+tiles, since betweenness from disjoint sets of live sources does not sum to the betweenness from
+all of them with cityseer 4.x.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import sys
+from collections.abc import Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from process import centrality, network_structures
+
+logger = logging.getLogger(__name__)
+
+# tiles queued per worker, bounding the subgraphs held by the parent process
+TILES_IN_FLIGHT_PER_WORKER = 2
+
+
+def _split_tile(
+    keys: npt.NDArray[np.object_],
+    xs: npt.NDArray[np.float64],
+    ys: npt.NDArray[np.float64],
+    max_tile_nodes: int | None,
+) -> list[npt.NDArray[np.object_]]:
+    """
+    Recursively split a tile into quadrants until no tile exceeds `max_tile_nodes`.
+    """
+    if max_tile_nodes is None or len(keys) <= max_tile_nodes:
+        return [keys]
+    x_mid = (xs.min() + xs.max()) / 2
+    y_mid = (ys.min() + ys.max()) / 2
+    quadrants = (xs > x_mid).astype(int) * 2 + (ys > y_mid).astype(int)
+    if len(np.unique(quadrants)) == 1:
+        # coincident points can't be split further
+        return [keys]
+    tiles = []
+    for quadrant in np.unique(quadrants):
+        mask = quadrants == quadrant
+        tiles.extend(_split_tile(keys[mask], xs[mask], ys[mask], max_tile_nodes))
+    return tiles
+
+
+def partition_tiles(
+    nodes_gdf: gpd.GeoDataFrame,
+    tile_col: str | None = "district",
+    grid_size: float = 5000,
+    max_tile_nodes: int | None = None,
+) -> list[pd.Index]:
+    """
+    Partition the live nodes, plus any nodes assigned a `tile_col` label, into tiles.
+
+    Nodes are grouped by `tile_col`, e.g. district, and nodes without a label (or all nodes if
+    `tile_col` is None) are grouped by a grid of `grid_size` cells. Tiles with more than
+    `max_tile_nodes` nodes are split into quadrants.
+    """
+    compute_mask = nodes_gdf["live"].to_numpy(dtype=bool, copy=True)
+    labels = pd.Series(pd.NA, index=nodes_gdf.index, dtype=object)
+    if tile_col is not None:
+        compute_mask |= nodes_gdf[tile_col].notna().to_numpy()
+        labels = nodes_gdf[tile_col].astype(object)
+    xs = nodes_gdf["x"].to_numpy(dtype=np.float64)
+    ys = nodes_gdf["y"].to_numpy(dtype=np.float64)
+    grid_labels = pd.Series(
+        [f"grid_{c}_{r}" for c, r in zip(xs // grid_size, ys // grid_size, strict=True)],
+        index=nodes_gdf.index,
+    )
+    labels = labels.fillna(grid_labels)[compute_mask]
+    tiles = []
+    for _label, tile_labels in labels.groupby(labels, sort=True):
+        tile_mask = nodes_gdf.index.isin(tile_labels.index)
+        for tile_keys in _split_tile(
+            nodes_gdf.index.to_numpy()[tile_mask], xs[tile_mask], ys[tile_mask], max_tile_nodes
+        ):
+            tiles.append(pd.Index(tile_keys))
+    return tiles
+
+
+def tile_network(
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    tile_keys: pd.Index,
+    max_distance: float,
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Extract the subgraph within 2 x `max_distance` of a tile, live only within `max_distance`.
+    """
+    sub_nodes_gdf, sub_edges_gdf = network_structures.subset_network(
+        nodes_gdf, edges_gdf, network_structures.halo_keys(nodes_gdf, tile_keys, 2 * max_distance)
+    )
+    source_keys = network_structures.halo_keys(sub_nodes_gdf, tile_keys, max_distance)
+    sub_nodes_gdf = sub_nodes_gdf.assign(
+        live=sub_nodes_gdf["live"].to_numpy(dtype=bool) & sub_nodes_gdf.index.isin(source_keys)
+    )
+
+    return sub_nodes_gdf, sub_edges_gdf
+
+
+@contextmanager
+def _main_path_hidden() -> Iterator[None]:
+    """
+    Hide the main module's path so that spawned workers don't rerun the calling script.
+
+    Workers only run functions from this module, as is the case in notebooks where the main module
+    has no path.
+    """
+    main_module = sys.modules["__main__"]
+    main_file = main_module.__dict__.pop("__file__", None)
+    main_spec = main_module.__dict__.get("__spec__")
+    main_module.__spec__ = None
+    try:
+        yield
+    finally:
+        main_module.__spec__ = main_spec
+        if main_file is not None:
+            main_module.__file__ = main_file
+
+
+def _init_worker(threads_per_worker: int) -> None:
+    # the rust thread pool is sized on first use so this must be set before computing
+    os.environ["RAYON_NUM_THREADS"] = str(threads_per_worker)
+    from cityseer import config
+
+    config.QUIET_MODE = True
+
+
+def _compute_tile(
+    tile_keys: pd.Index,
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    variants: Sequence[centrality.CentralityVariant],
+    distances: list[int],
+    angular_scaling_unit: float,
+    farness_scaling_offset: float,
+) -> pd.DataFrame:
+    """
+    Worker entry point: compute the centralities for a tile's subgraph and keep the tile's rows.
+    """
+    network_structures_cache = {}
+
+    def get_network_structure(length_weighted: bool):
+        if length_weighted not in network_structures_cache:
+            network_structures_cache[length_weighted] = network_structures.build_network_structure(
+                nodes_gdf, edges_gdf, length_weighted
+            )
+        return network_structures_cache[length_weighted]
+
+    return centrality.compute_centralities(
+        variants,
+        get_network_structure,
+        tile_keys,
+        distances=distances,
+        angular_scaling_unit=angular_scaling_unit,
+        farness_scaling_offset=farness_scaling_offset,
+    )
+
+
+def compute_centralities_tiled(
+    variants: Sequence[centrality.CentralityVariant],
+    nodes_gdf: gpd.GeoDataFrame,
+    edges_gdf: gpd.GeoDataFrame,
+    tiles: Sequence[pd.Index],
+    distances: list[int],
+    angular_scaling_unit: float = 90,
+    farness_scaling_offset: float = 1,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Compute centralities per tile in a process pool and merge the tile rows into one frame.
+
+    All distances are computed in one call per tile, as per the untiled run, since the simplest and
+    segment traversals at a given distance depend on the maximum distance. Each worker process
+    handles a single tile before being replaced, so its peak memory is that of the largest tile
+    subgraph, and subgraphs are only extracted for the tiles queued to the workers. The available
+    cores are shared between the workers' thread pools. Nodes not in any tile are NaN.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // max_workers)
+    # larger tiles first for better load balancing
+    tiles = sorted(tiles, key=len, reverse=True)
+    # spawned rather than forked workers as the rust thread pool is not fork safe
+    mp_context = multiprocessing.get_context("spawn")
+    tile_frames: list[pd.DataFrame] = []
+    max_subgraph_nodes = 0
+    with (
+        _main_path_hidden(),
+        ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+            max_tasks_per_child=1,
+        ) as executor,
+    ):
+        pending: set[Future] = set()
+        for tile_keys in tiles:
+            if len(pending) >= TILES_IN_FLIGHT_PER_WORKER * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                tile_frames.extend(future.result() for future in done)
+            sub_nodes_gdf, sub_edges_gdf = tile_network(
+                nodes_gdf, edges_gdf, tile_keys, max(distances)
+            )
+            max_subgraph_nodes = max(max_subgraph_nodes, len(sub_nodes_gdf))
+            pending.add(
+                executor.submit(
+                    _compute_tile,
+                    tile_keys,
+                    sub_nodes_gdf,
+                    sub_edges_gdf,
+                    variants,
+                    distances,
+                    angular_scaling_unit,
+                    farness_scaling_offset,
+                )
+            )
+            del sub_nodes_gdf, sub_edges_gdf
+        tile_frames.extend(future.result() for future in wait(pending).done)
+    logger.info(
+        f"Computed {len(tiles)} centrality tiles on {max_workers} workers, the largest subgraph "
+        f"of {max_subgraph_nodes} nodes"
+    )
+
+    return pd.concat(tile_frames).reindex(nodes_gdf.index)
@@ -0,0 +1,29 @@
+import geopandas as gpd
+import pytest
+import shapely
+from cityseer import config
+
+from benchmarks import synthetic
+from process import dual_network
+
+config.QUIET_MODE = True
+
+# the smallest synthetic network retained by the removal of components under 100 nodes
+CELLS = 12
+
+
+@pytest.fixture(scope="session")
+def streets_gdf() -> gpd.GeoDataFrame:
+    return synthetic.street_network(CELLS, layout="organic")
+
+
+@pytest.fixture(scope="session")
+def live_geom(streets_gdf) -> shapely.Geometry:
+    # nodes near the network's edges are not live, as per the streets beyond the city boundary
+    min_x, min_y, max_x, max_y = streets_gdf.total_bounds
+    return shapely.Point((min_x + max_x) / 2, (min_y + max_y) / 2).buffer(400)
+
+
+@pytest.fixture(scope="session")
+def dual_gdfs(streets_gdf, live_geom) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    return dual_network.dual_network_from_gpd(streets_gdf, live_geom=live_geom)
@@ -0,0 +1,42 @@
+from benchmarks import run
+
+
+def stage(wall_s: float, peak_rss_mb: float = 100) -> dict[str, float]:
+    return {"wall_s": wall_s, "peak_rss_mb": peak_rss_mb}
+
+
+def test_compare_scales_by_calibration():
+    baselines = {"grid-small": {"calibration": stage(0.1), "centrality": stage(1.0)}}
+    # twice as slow on a machine twice as slow
+    results = {"grid-small": {"calibration": stage(0.2), "centrality": stage(2.0)}}
+    assert not run.compare(results, baselines, wall_tolerance=0.5, rss_tolerance=0.25)
+    # twice as slow on the same machine
+    results = {"grid-small": {"calibration": stage(0.1), "centrality": stage(2.0)}}
+    (regression,) = run.compare(results, baselines, wall_tolerance=0.5, rss_tolerance=0.25)
+    assert regression.startswith("grid-small centrality: wall 2.0s")
+    # without calibration times, wall times are compared as is
+    results = {"grid-small": {"centrality": stage(2.0)}}
+    assert len(run.compare(results, baselines, wall_tolerance=0.5, rss_tolerance=0.25)) == 1
+
+
+def test_compare_thresholds():
+    baselines = {"grid-small": {"centrality": stage(1.0), "write": stage(0.05)}}
+    results = {"grid-small": {"centrality": stage(1.4, 130), "write": stage(0.1)}}
+    assert run.compare(results, baselines, wall_tolerance=0.5, rss_tolerance=0.25) == [
+        "grid-small centrality: peak RSS 130MB vs baseline 100MB"
+    ]
+    # fast stages are only flagged above the minimum regression time
+    assert (
+        len(
+            run.compare(
+                results,
+                baselines,
+                wall_tolerance=0.2,
+                rss_tolerance=0.5,
+                min_regression_seconds=0.01,
+            )
+        )
+        == 2
+    )
+    # cases and stages without baselines are skipped
+    assert not run.compare({"grid-large": results["grid-small"]}, baselines, 0.5, 0.25)
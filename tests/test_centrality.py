@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from process import centrality, network_structures
+
+DISTANCES = [200, 400]
+VARIANTS = [
+    centrality.CentralityVariant("shortest", length_weighted=True),
+    centrality.CentralityVariant("simplest"),
+    centrality.CentralityVariant("segment"),
+]
+
+
+@pytest.fixture(scope="module")
+def get_network_structure(dual_gdfs):
+    nodes_gdf, edges_gdf = dual_gdfs
+    network_structures_cache = {}
+
+    def get_network_structure(length_weighted: bool):
+        if length_weighted not in network_structures_cache:
+            network_structures_cache[length_weighted] = network_structures.build_network_structure(
+                nodes_gdf, edges_gdf, length_weighted
+            )
+        return network_structures_cache[length_weighted]
+
+    return get_network_structure
+
+
+@pytest.fixture(scope="module")
+def exact_data(dual_gdfs, get_network_structure) -> pd.DataFrame:
+    nodes_gdf, _edges_gdf = dual_gdfs
+    return centrality.compute_centralities(
+        VARIANTS, get_network_structure, nodes_gdf.index, DISTANCES
+    )
+
+
+def test_sampled_full_fraction_is_exact(dual_gdfs, get_network_structure, exact_data):
+    nodes_gdf, _edges_gdf = dual_gdfs
+    cent_data, errors = centrality.compute_centralities_sampled(
+        VARIANTS,
+        get_network_structure,
+        nodes_gdf.index,
+        DISTANCES,
+        sample_fractions={distance: 1.0 for distance in DISTANCES},
+        random_seed=0,
+    )
+    pd.testing.assert_frame_equal(cent_data, exact_data)
+    assert errors.empty
+
+
+def test_sampled_error_bounds(dual_gdfs, get_network_structure, exact_data):
+    nodes_gdf, _edges_gdf = dual_gdfs
+    sample_kwargs = {
+        "sample_fractions": {400: 0.5},
+        "strata": nodes_gdf["live"],
+        "replicates": 4,
+        "random_seed": 0,
+    }
+    cent_data, errors = centrality.compute_centralities_sampled(
+        VARIANTS, get_network_structure, nodes_gdf.index, DISTANCES, **sample_kwargs
+    )
+    # seeded runs are repeatable
+    repeat_data, _errors = centrality.compute_centralities_sampled(
+        VARIANTS, get_network_structure, nodes_gdf.index, DISTANCES, **sample_kwargs
+    )
+    pd.testing.assert_frame_equal(cent_data, repeat_data)
+    # unsampled distances and segment centralities are exact, and cycles are not estimated
+    exact_cols = [col for col in exact_data.columns if col.endswith("_200") or "seg_" in col]
+    pd.testing.assert_frame_equal(cent_data[exact_cols], exact_data[exact_cols])
+    # simplest paths depend on the maximum distance traversed, so match a call at the exact distance
+    angular_data = centrality.compute_centralities(
+        VARIANTS[1:2], get_network_structure, nodes_gdf.index, [200]
+    )
+    pd.testing.assert_frame_equal(cent_data[angular_data.columns], angular_data)
+    exact_cols.extend(angular_data.columns)
+    assert cent_data["cc_cycles_400"].isna().all()
+    sampled_cols = [
+        col for col in exact_data.columns if col not in exact_cols and col != "cc_cycles_400"
+    ]
+    assert sorted(errors.index) == sorted(sampled_cols)
+    # the median relative error against the exact values is within the reported 95% bounds
+    live = nodes_gdf["live"].to_numpy()
+    for col in sampled_cols:
+        estimates = cent_data.loc[live, col].to_numpy()
+        exact = exact_data.loc[live, col].to_numpy()
+        nonzero = estimates != 0
+        rel_errs = np.abs(estimates[nonzero] - exact[nonzero]) / np.abs(estimates[nonzero])
+        assert np.median(rel_errs) <= errors.loc[col, "rel_error_median"], col
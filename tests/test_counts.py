@@ -0,0 +1,69 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from process import counts
+
+HEADER = "FECHA;IDENTIFICADOR;LATITUD;LONGITUD;PEATONES\n"
+
+
+@pytest.fixture
+def nodes_gdf() -> gpd.GeoDataFrame:
+    # nodes at two stations' projected locations, in EPSG:25830
+    points = gpd.GeoSeries.from_xy([-3.7038, -3.6883], [40.4168, 40.4153], crs=4326).to_crs(25830)
+    return gpd.GeoDataFrame(
+        {"x": points.x.to_numpy(), "y": points.y.to_numpy()},
+        index=pd.Index(["node_a", "node_b"]),
+        geometry=points.to_numpy(),
+        crs=25830,
+    )
+
+
+def test_load_counts(nodes_gdf, tmp_path):
+    csv_path = tmp_path / "counts.csv"
+    csv_path.write_text(
+        HEADER
+        + "01/01/2021 10:00;S1;40,4168;-3,7038;5\n"
+        + "01/01/2021 10:15;S1;40,4168;-3,7038;7\n"
+        + "01/01/2021 11:00;S1;40,4168;-3,7038;1\n"
+        + "01/01/2021 10:00;S2;40,4153;-3,6883;3\n"
+        # beyond the snapping distance of any node
+        + "01/01/2021 10:00;S3;40,5000;-3,6000;9\n"
+    )
+    # chunks of two rows, so that stations and hours span chunks
+    node_counts, stations = counts.load_counts(csv_path, nodes_gdf, chunk_rows=2)
+    assert list(node_counts.columns) == ["node", "hour", "pedestrians"]
+    assert node_counts["node"].astype(str).tolist() == ["node_a", "node_a", "node_b"]
+    assert np.array_equal(node_counts["pedestrians"], [12, 1, 3])
+    assert stations.loc["S1", "node"] == "node_a"
+    assert pd.isna(stations.loc["S3", "node"])
+
+
+def test_load_counts_without_rows(nodes_gdf, tmp_path):
+    csv_path = tmp_path / "counts.csv"
+    csv_path.write_text(HEADER)
+    with pytest.raises(ValueError, match="No count rows"):
+        counts.load_counts(csv_path, nodes_gdf)
+    csv_path.write_text("FECHA;IDENTIFICADOR;LATITUD;LONGITUD\n")
+    with pytest.raises(ValueError, match="No count columns"):
+        counts.load_counts(csv_path, nodes_gdf)
+
+
+def test_load_counts_header_and_missing_coordinates(nodes_gdf, tmp_path, caplog):
+    csv_path = tmp_path / "counts.csv"
+    # padded lower case header names, station ids with leading zeros, and a station without
+    # coordinates
+    csv_path.write_text(
+        " fecha ; identificador ; latitud ; longitud ; peatones \n"
+        + "01/01/2021 10:00;0012;40,4168;-3,7038;5\n"
+        + "01/01/2021 10:00;0013;;;4\n"
+    )
+    node_counts, stations = counts.load_counts(csv_path, nodes_gdf)
+    assert stations.index.tolist() == ["0012", "0013"]
+    assert stations.loc["0012", "node"] == "node_a"
+    assert pd.isna(stations.loc["0013", "node"])
+    assert pd.isna(stations.loc["0013", "snap_dist"])
+    assert "Stations without coordinates, not snapped: 0013" in caplog.text
+    assert node_counts["node"].astype(str).tolist() == ["node_a"]
+    assert np.array_equal(node_counts["pedestrians"], [5])
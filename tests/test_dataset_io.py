@@ -0,0 +1,64 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from process import dataset_io
+
+
+@pytest.fixture
+def nodes_gdf() -> gpd.GeoDataFrame:
+    count = 12
+    xs = np.arange(count, dtype=np.float64) * 100
+    return gpd.GeoDataFrame(
+        {
+            "district": ["Centro", "Retiro", "Chamartín"] * 4,
+            "live": True,
+            "cc_harmonic_1000": np.linspace(0, 1, count),
+            "cc_hill_q0_500_wt": np.arange(count, dtype=np.int64),
+            "primal_edge": shapely.linestrings(
+                np.stack([np.column_stack([xs, xs * 0]), np.column_stack([xs + 50, xs * 0])], 1)
+            ),
+        },
+        index=pd.Index([f"node_{i}" for i in range(count)], name="ns_node_idx"),
+        geometry="primal_edge",
+        crs=25830,
+    )
+
+
+def test_round_trip(nodes_gdf, tmp_path):
+    dataset_io.write_dataset(nodes_gdf, tmp_path / "dataset")
+    read_gdf = dataset_io.read_dataset(tmp_path / "dataset")
+    assert read_gdf.geometry.name == "primal_edge"
+    assert sorted(dataset_io.dataset_columns(tmp_path / "dataset")) == [
+        "cc_harmonic_1000",
+        "cc_hill_q0_500_wt",
+        "live",
+    ]
+    read_gdf = read_gdf.loc[nodes_gdf.index]
+    # 64 bit columns are downcast
+    assert read_gdf["cc_harmonic_1000"].dtype == np.float32
+    assert read_gdf["cc_hill_q0_500_wt"].dtype == np.int32
+    assert np.allclose(read_gdf["cc_harmonic_1000"], nodes_gdf["cc_harmonic_1000"])
+    assert (read_gdf["district"].astype(str) == nodes_gdf["district"]).all()
+    assert shapely.equals(read_gdf.geometry.to_numpy(), nodes_gdf.geometry.to_numpy()).all()
+
+
+def test_read_column_and_district_subsets(nodes_gdf, tmp_path):
+    dataset_io.write_dataset(nodes_gdf, tmp_path / "dataset")
+    read_gdf = dataset_io.read_dataset(
+        tmp_path / "dataset",
+        districts=["Centro", "Chamartín"],
+        columns=["cc_harmonic_1000"],
+    )
+    # the geometry and node index are read with the requested columns
+    assert list(read_gdf.columns) == ["cc_harmonic_1000", "primal_edge"]
+    assert read_gdf.geometry.name == "primal_edge"
+    expected = nodes_gdf[nodes_gdf["district"].isin(["Centro", "Chamartín"])]
+    assert sorted(read_gdf.index) == sorted(expected.index)
+    assert np.allclose(
+        read_gdf.loc[expected.index, "cc_harmonic_1000"], expected["cc_harmonic_1000"]
+    )
+    bbox_gdf = dataset_io.read_dataset(tmp_path / "dataset", columns=[], bbox=(0, -1, 250, 1))
+    assert sorted(bbox_gdf.index) == ["node_0", "node_1", "node_2"]
@@ -0,0 +1,15 @@
+import numpy as np
+from cityseer.tools import util
+
+from process import dual_attributes
+
+
+def test_primal_edge_bearings(dual_gdfs):
+    nodes_gdf, _edges_gdf = dual_gdfs
+    primal_edges = nodes_gdf["primal_edge"].to_numpy()
+    # as per the per node loop replaced by the arrays
+    expected = [
+        util.measure_bearing(list(primal_edge.coords)[0], list(primal_edge.coords)[-1])
+        for primal_edge in primal_edges
+    ]
+    assert np.allclose(dual_attributes.primal_edge_bearings(primal_edges), expected)
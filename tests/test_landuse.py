@@ -0,0 +1,78 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from benchmarks import synthetic
+from process import landuse, network_structures, premises
+
+
+def premises_gdf(records: list[tuple[int, int, str, float, float]]) -> gpd.GeoDataFrame:
+    local_ids, epigraph_ids, divisions, xs, ys = zip(*records, strict=True)
+    return gpd.GeoDataFrame(
+        {"local_id": local_ids, "epigraph_id": epigraph_ids, "division_desc": divisions},
+        geometry=shapely.points(xs, ys),
+        crs=25830,
+    )
+
+
+def test_diff_premises_repeated_local_ids():
+    prev = premises_gdf(
+        [
+            (1, 10, "retail", 0, 0),
+            (1, 11, "food_bev", 0, 0),
+            (2, 10, "retail", 100, 0),
+            (3, 12, "health", 200, 0),
+        ]
+    )
+    # premise 1 gains an activity, premise 2 loses its only activity, premise 3 is reclassified
+    curr = premises_gdf(
+        [
+            (1, 10, "retail", 0, 0),
+            (1, 11, "food_bev", 0, 0),
+            (1, 13, "services", 0, 0),
+            (3, 12, "education", 200, 0),
+            (4, 10, "retail", 300, 0),
+        ]
+    )
+    changed = landuse.diff_premises(prev, curr)
+    assert sorted(shapely.get_x(changed).tolist()) == [0, 100, 200, 200, 300]
+
+
+def test_diff_premises_repeated_activities():
+    # the same activity can be listed more than once for a premise
+    prev = premises_gdf([(1, 10, "retail", 0, 0), (1, 10, "retail", 0, 0)])
+    curr = premises_gdf([(1, 10, "retail", 0, 0)])
+    assert len(landuse.diff_premises(prev, curr)) == 1
+    assert not len(landuse.diff_premises(prev, prev.iloc[::-1]))
+    # snapshots, as cached for the next release, diff as the premises they were taken from
+    assert not len(landuse.diff_premises(landuse.premises_snapshot(prev), prev))
+
+
+def test_within_distance():
+    geoms = shapely.points([0, 50, 200], [0, 0, 0])
+    targets = shapely.points([0], [10])
+    assert np.array_equal(landuse.within_distance(geoms, targets, 60), [True, True, False])
+    assert not landuse.within_distance(geoms, targets[:0], 60).any()
+
+
+def test_update_landuses_matches_full_recompute(streets_gdf, dual_gdfs):
+    nodes_gdf, edges_gdf = dual_gdfs
+    distances = [200, 400]
+    prev = premises.clean_premises(synthetic.premises(streets_gdf, 400, seed=1))
+    prev.index = prev.index.astype(str)
+    # premises are removed, added, and reclassified
+    added = premises.clean_premises(synthetic.premises(streets_gdf, 10, seed=2))
+    added.index = "added_" + added.index.astype(str)
+    curr = pd.concat([prev.iloc[10:], added])
+    curr.loc[curr.index[:5], "division_desc"] = curr["division_desc"].iloc[-1]
+    network_structure = network_structures.build_network_structure(
+        nodes_gdf, edges_gdf, length_weighted=False
+    )
+    prev_lu_data = landuse.compute_landuses(prev, network_structure, nodes_gdf.index, distances)
+    lu_data = landuse.compute_landuses(curr, network_structure, nodes_gdf.index, distances)
+    updated_lu_data = landuse.update_landuses(
+        prev_lu_data, prev, curr, nodes_gdf, edges_gdf, distances
+    )
+    assert not np.allclose(prev_lu_data, lu_data, equal_nan=True)
+    pd.testing.assert_frame_equal(updated_lu_data, lu_data)
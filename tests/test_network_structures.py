@@ -0,0 +1,51 @@
+import pandas as pd
+import shapely
+
+from process import centrality, network_structures
+
+DISTANCES = [200, 400]
+
+
+def centralities(nodes_gdf, edges_gdf, node_index) -> pd.DataFrame:
+    variants = [
+        centrality.CentralityVariant("shortest"),
+        centrality.CentralityVariant("shortest", length_weighted=True),
+        centrality.CentralityVariant("simplest"),
+        centrality.CentralityVariant("segment"),
+    ]
+    return centrality.compute_centralities(
+        variants,
+        lambda length_weighted: network_structures.build_network_structure(
+            nodes_gdf, edges_gdf, length_weighted
+        ),
+        node_index,
+        DISTANCES,
+    )
+
+
+def test_prune_network_preserves_live_centralities(dual_gdfs):
+    nodes_gdf, edges_gdf = dual_gdfs
+    pruned_nodes_gdf, pruned_edges_gdf = network_structures.prune_network(
+        nodes_gdf, edges_gdf, max(DISTANCES)
+    )
+    assert len(pruned_nodes_gdf) < len(nodes_gdf)
+    assert pruned_nodes_gdf["live"].sum() == nodes_gdf["live"].sum()
+    live_index = nodes_gdf.index[nodes_gdf["live"]]
+    pd.testing.assert_frame_equal(
+        centralities(pruned_nodes_gdf, pruned_edges_gdf, live_index),
+        centralities(nodes_gdf, edges_gdf, live_index),
+    )
+
+
+def test_halo_keys(dual_gdfs):
+    nodes_gdf, _edges_gdf = dual_gdfs
+    node_keys = nodes_gdf.index[nodes_gdf["live"]][:3]
+    halo = 150
+    keys = network_structures.halo_keys(nodes_gdf, node_keys, halo)
+    assert node_keys.isin(keys).all()
+    # a superset of the nodes within the halo of any of the nodes
+    points = shapely.points(nodes_gdf[["x", "y"]].to_numpy())
+    node_points = shapely.points(nodes_gdf.loc[node_keys, ["x", "y"]].to_numpy())
+    dists = shapely.distance(points[:, None], node_points[None, :]).min(axis=1)
+    assert nodes_gdf.index[dists <= halo].isin(keys).all()
+    assert len(keys) < len(nodes_gdf)
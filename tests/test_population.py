@@ -0,0 +1,147 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import shapely
+from cityseer import config
+from rasterio.transform import from_origin
+
+from process import network_structures, population
+
+NODATA = -9999
+
+
+@pytest.fixture
+def raster_path(tmp_path) -> str:
+    # one row of 100m cells centred on y=0, at x=50, 150, 250, 350, 450
+    path = str(tmp_path / "pop.tif")
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=1,
+        width=5,
+        count=1,
+        dtype="float32",
+        crs=25830,
+        transform=from_origin(0, 50, 100, 100),
+        nodata=NODATA,
+    ) as dataset:
+        dataset.write(np.array([[5, 7, 0, 11, NODATA]], dtype=np.float32), 1)
+    return path
+
+
+@pytest.fixture
+def sample_raster_path(tmp_path) -> str:
+    # 3 x 4 cells of 100m from (0, 0) to (400, 300), in one row blocks so that windows are per row
+    path = str(tmp_path / "sample.tif")
+    values = np.array(
+        [[1.5, 2, -3, 4], [5, NODATA, 7, np.nan], [9, 10, 11, 12.25]], dtype=np.float32
+    )
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=3,
+        width=4,
+        count=1,
+        dtype="float32",
+        crs=25830,
+        transform=from_origin(0, 300, 100, 100),
+        nodata=NODATA,
+        blockysize=1,
+    ) as dataset:
+        dataset.write(values, 1)
+    return path
+
+
+@pytest.fixture
+def line_network() -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    # three dual nodes 100m apart along y=0, with edges in both directions
+    nodes_gdf = gpd.GeoDataFrame(
+        {"x": [0.0, 100.0, 200.0], "y": 0.0, "live": True, "weight": 1.0},
+        index=["a", "b", "c"],
+        geometry=shapely.points([0, 100, 200], [0, 0, 0]),
+        crs=25830,
+    )
+    edge_ends = [("a", "b"), ("b", "a"), ("b", "c"), ("c", "b")]
+    edges_gdf = gpd.GeoDataFrame(
+        {
+            "edge_idx": 0,
+            "nx_start_node_key": [start for start, _end in edge_ends],
+            "nx_end_node_key": [end for _start, end in edge_ends],
+            "imp_factor": 1.0,
+        },
+        geometry=[
+            shapely.LineString(nodes_gdf.geometry[[start, end]].tolist())
+            for start, end in edge_ends
+        ],
+        crs=25830,
+    )
+    return nodes_gdf, edges_gdf
+
+
+def test_sample_rasters(sample_raster_path):
+    # cell centres, cell edges, the raster's corners, a nodata cell, a NaN cell, and points outside
+    xs = [50, 150, 250, 350, 150, 350, 50, 390, 100, 0, 399.9, -10, 450, 200]
+    ys = [250, 250, 250, 250, 150, 150, 50, 10, 200, 300, 0.1, 150, 150, -20]
+    # as returned by rasterstats' point_query with nearest interpolation, with None set to 0 and
+    # clipped to 0, as per the previous per-node loop, except for the NaN cell which was NaN
+    expected = [1.5, 2, 0, 4, 0, 0, 9, 12.25, 0, 1.5, 12.25, 0, 0, 0]
+    index = pd.RangeIndex(len(xs)) + 10
+    samples = population.sample_rasters(
+        {"pop": sample_raster_path, "pop_2020": sample_raster_path},
+        xs,
+        ys,
+        index=index,
+        nodata=NODATA,
+    )
+    assert samples.index.equals(index)
+    assert samples["pop"].tolist() == expected
+    assert samples["pop_2020"].tolist() == expected
+    capped = population.sample_rasters({"pop": sample_raster_path}, xs, ys, clip_max=5)
+    assert capped["pop"].tolist() == np.clip(expected, 0, 5).tolist()
+    with pytest.raises(ValueError, match="same shape"):
+        population.sample_rasters({"pop": sample_raster_path}, xs, ys[:-1])
+
+
+def test_raster_cells(raster_path):
+    # zero and nodata cells are skipped
+    cells = population.raster_cells(raster_path)
+    assert cells["x"].tolist() == [50, 150, 350]
+    assert cells["y"].tolist() == [0, 0, 0]
+    assert cells["value"].tolist() == [5, 7, 11]
+    # cells intersecting the bounds
+    cells = population.raster_cells(raster_path, bounds=(120, -10, 380, 10))
+    assert cells["x"].tolist() == [150, 350]
+
+
+def test_raster_cells_no_overlap(raster_path):
+    with pytest.raises(ValueError, match="don't overlap the raster"):
+        population.raster_cells(raster_path, bounds=(1000, 1000, 2000, 2000))
+
+
+def test_compute_population_access(raster_path, line_network):
+    nodes_gdf, edges_gdf = line_network
+    network_structure = network_structures.build_network_structure(
+        nodes_gdf, edges_gdf, length_weighted=False
+    )
+    cells = population.raster_cells(raster_path)
+    access = population.compute_population_access(
+        cells, network_structure, nodes_gdf.index, distances=[100, 200]
+    )
+    # cells are reached via the nearest ends of their edges, the cell at x=350 is beyond the
+    # maximum assignment distance of the network
+    cell_dists = {"a": [50, 150], "b": [50, 50], "c": [150, 50]}
+    cell_values = np.array([5, 7])
+    for distance in [100, 200]:
+        beta = 4 / distance
+        nw_key = config.prep_gdf_key("pop_sum", distance, weighted=False)
+        wt_key = config.prep_gdf_key("pop_sum", distance, weighted=True)
+        for node_key, dists in cell_dists.items():
+            reached = np.array(dists) <= distance
+            assert access.loc[node_key, nw_key] == pytest.approx(cell_values[reached].sum())
+            assert access.loc[node_key, wt_key] == pytest.approx(
+                (cell_values * np.exp(-beta * np.array(dists)))[reached].sum(), rel=1e-5
+            )
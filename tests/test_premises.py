@@ -0,0 +1,23 @@
+import pandas as pd
+
+from benchmarks import synthetic
+from process import premises
+
+
+def test_load_premises_chunks_match_single_read(streets_gdf, tmp_path):
+    census_gdf = synthetic.premises(streets_gdf, 250, seed=1).assign(unused="x")
+    path = tmp_path / "premises.gpkg"
+    census_gdf.to_file(path)
+    premises_gdf = premises.load_premises(str(path))
+    # only the retained columns are read, and the null and no activity premises are removed
+    assert premises_gdf.columns.tolist() == [*premises.PREMISES_COLUMNS.values(), "geometry"]
+    assert 0 < len(premises_gdf) < len(census_gdf)
+    assert not premises_gdf["section_desc"].isin(["none", "null"]).any()
+    assert premises_gdf.index.equals(
+        census_gdf.index[census_gdf["id_local"].isin(premises_gdf["local_id"])].astype(str)
+    )
+    # chunks that don't divide the feature count, and larger than the file
+    for chunk_size in [40, 1000]:
+        pd.testing.assert_frame_equal(
+            premises.load_premises(str(path), chunk_size=chunk_size), premises_gdf
+        )
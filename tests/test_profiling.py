@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from process import profiling
+
+
+def test_report_written_per_stage(tmp_path):
+    profiler = profiling.StageProfiler(tmp_path)
+    report_path = tmp_path / f"{profiler.run_name}.json"
+    with profiler.stage("first", rows=10) as record:
+        record.counts = {"nodes": 10}
+        # the running stage is recorded before it finishes
+        stages = json.loads(report_path.read_text())["stages"]
+        assert [(stage["name"], stage["status"]) for stage in stages] == [("first", "running")]
+    with pytest.raises(RuntimeError), profiler.stage("second"):
+        raise RuntimeError("failed")
+    # no write_report call, as for a crashed run
+    stages = json.loads(report_path.read_text())["stages"]
+    assert [(stage["name"], stage["status"]) for stage in stages] == [
+        ("first", "ok"),
+        ("second", "error"),
+    ]
+    assert stages[0]["counts"] == {"nodes": 10}
+    assert stages[0]["peak_rss_mb"] > 0
+
+
+def test_current_rss_bytes_without_resource(monkeypatch):
+    monkeypatch.setattr(profiling, "resource", None)
+    monkeypatch.setattr(
+        profiling, "open", lambda *args: (_ for _ in ()).throw(OSError), raising=False
+    )
+    assert profiling.current_rss_bytes() == 0
@@ -0,0 +1,110 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from process import dataset_io, query
+
+
+@pytest.fixture
+def dataset_query(tmp_path) -> query.DatasetQuery:
+    count = 12
+    xs = np.arange(count, dtype=np.float64) * 100
+    nodes_gdf = gpd.GeoDataFrame(
+        {
+            "district": ["Centro", "Retiro", "Chamartín"] * 4,
+            "neighb": ["Sol", "Jerónimos"] * 6,
+            "cc_harmonic_1000": np.linspace(0, 1, count),
+            "primal_edge": shapely.linestrings(
+                np.stack([np.column_stack([xs, xs * 0]), np.column_stack([xs + 50, xs * 0])], 1)
+            ),
+        },
+        index=pd.Index([f"node_{i}" for i in range(count)], name="ns_node_idx"),
+        geometry="primal_edge",
+        crs=25830,
+    )
+    dataset_io.write_dataset(nodes_gdf, tmp_path / "dataset")
+    # a small cache so that column blocks are evicted and reread
+    return query.DatasetQuery(tmp_path / "dataset", cache_size=1)
+
+
+def test_bbox_and_radius(dataset_query):
+    assert dataset_query.columns == ["cc_harmonic_1000"]
+    bbox_gdf = dataset_query.bbox((0, -1, 250, 1), columns=["cc_harmonic_1000"])
+    # nodes are ordered per district partition
+    assert sorted(bbox_gdf.index) == ["node_0", "node_1", "node_2"]
+    assert np.allclose(
+        bbox_gdf.loc[["node_0", "node_1", "node_2"], "cc_harmonic_1000"], np.linspace(0, 1, 12)[:3]
+    )
+    radius_gdf = dataset_query.radius(1000, 0, 60, columns=["cc_harmonic_1000"])
+    assert sorted(radius_gdf.index) == ["node_10", "node_9"]
+    with pytest.raises(KeyError):
+        dataset_query.bbox((0, -1, 250, 1), columns=["missing"])
+
+
+def test_district_and_neighbourhood(dataset_query):
+    district_gdf = dataset_query.district("Chamartín", columns=["cc_harmonic_1000"])
+    assert list(district_gdf.index) == ["node_2", "node_5", "node_8", "node_11"]
+    assert np.allclose(district_gdf["cc_harmonic_1000"], np.linspace(0, 1, 12)[2::3])
+    neighb_gdf = dataset_query.neighbourhood("Sol", columns=["cc_harmonic_1000"])
+    assert sorted(neighb_gdf.index) == sorted(f"node_{i}" for i in range(0, 12, 2))
+    assert np.allclose(
+        neighb_gdf.loc[[f"node_{i}" for i in range(0, 12, 2)], "cc_harmonic_1000"],
+        np.linspace(0, 1, 12)[::2],
+    )
+    with pytest.raises(KeyError):
+        dataset_query.district("Salamanca")
+
+
+@pytest.fixture
+def server_url(dataset_query):
+    # port 0 binds a free port
+    server = query.QueryServer(dataset_query, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def get_json(url: str) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read())
+
+
+def test_server_responses(dataset_query, server_url):
+    status, body = get_json(f"{server_url}/columns")
+    assert (status, body) == (200, {"columns": ["cc_harmonic_1000"]})
+    status, body = get_json(f"{server_url}/bbox?bounds=0,-1,250,1&columns=cc_harmonic_1000")
+    assert status == 200
+    assert sorted(feature["id"] for feature in body["features"]) == ["node_0", "node_1", "node_2"]
+    status, body = get_json(f"{server_url}/district?name=Centro&crs=4326")
+    assert status == 200
+    expected_gdf = dataset_query.district("Centro").to_crs(4326)
+    assert np.allclose(
+        body["features"][0]["geometry"]["coordinates"],
+        shapely.get_coordinates(expected_gdf.geometry.iloc[0]),
+    )
+    # malformed or missing parameters
+    for path in ["bbox?bounds=0,1", "radius?x=0&y=0", "polygon?wkt=POINT", "bbox?bounds=a,b,c,d"]:
+        status, body = get_json(f"{server_url}/{path}")
+        assert status == 400, path
+        assert body["error"]
+    # unknown routes, columns, and names
+    for path in ["missing", "bbox?bounds=0,-1,250,1&columns=missing", "district?name=Salamanca"]:
+        status, body = get_json(f"{server_url}/{path}")
+        assert status == 404, path
+        assert body["error"]
+    # other errors, e.g. an unknown CRS code, are reported as server errors
+    status, body = get_json(f"{server_url}/district?name=Centro&crs=999999")
+    assert status == 500
+    assert body["error"].startswith("CRSError")
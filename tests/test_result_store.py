@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from process import result_store
+
+
+@pytest.fixture
+def index() -> pd.Index:
+    return pd.Index([f"node_{i}" for i in range(6)], name="ns_node_idx")
+
+
+def test_put_and_get(index, tmp_path):
+    store = result_store.ResultStore.create(tmp_path / "store", index)
+    store.put(pd.DataFrame({"a": np.arange(6, dtype=np.float64)}, index=index))
+    # columns are aligned to the store's nodes, with missing nodes as NaN
+    store.put(pd.Series([1.5, 2.5], index=["node_4", "node_1"], name="b"))
+    assert store.columns == ["a", "b"]
+    data = store.get(rows=["node_4", "node_1"])
+    assert list(data.index) == ["node_4", "node_1"]
+    assert (data.dtypes == result_store.DTYPE).all()
+    assert np.array_equal(data["a"], [4, 1])
+    assert np.array_equal(data["b"], [1.5, 2.5])
+    assert np.isnan(store.get(["b"])["b"]).sum() == 4
+    mask = np.array([True, False] * 3)
+    assert list(store.get(["a"], rows=mask).index) == ["node_0", "node_2", "node_4"]
+    with pytest.raises(KeyError):
+        store.get(rows=["node_9"])
+    with pytest.raises(KeyError):
+        store.column("c")
+
+
+def test_reopen(index, tmp_path):
+    store = result_store.ResultStore.create(tmp_path / "store", index)
+    store.put(pd.DataFrame({"a": np.arange(6), "b": np.ones(6)}, index=index))
+    # replacing a column keeps its file
+    store.put(pd.Series(np.zeros(6), index=index, name="a"))
+    reopened = result_store.ResultStore(tmp_path / "store")
+    assert reopened.index.equals(index)
+    assert reopened.index.name == "ns_node_idx"
+    assert reopened.columns == ["a", "b"]
+    assert np.array_equal(reopened.column("a"), np.zeros(6))
+    assert len(list((tmp_path / "store").glob("col_*.npy"))) == 2
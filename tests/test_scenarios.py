@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from benchmarks import synthetic
+from process import centrality, landuse, network_structures, premises, result_store, scenarios
+
+CENT_DISTANCES = [200, 400]
+LU_DISTANCES = [200]
+VARIANTS = [
+    centrality.CentralityVariant("shortest"),
+    centrality.CentralityVariant("simplest"),
+    centrality.CentralityVariant("segment"),
+]
+
+
+def full_metrics(nodes_gdf, edges_gdf, premises_gdf) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # land-uses are computed on the network pruned to the maximum land-use distance, as per the run
+    cent_data = centrality.compute_centralities(
+        VARIANTS,
+        lambda length_weighted: network_structures.build_network_structure(
+            nodes_gdf, edges_gdf, length_weighted
+        ),
+        nodes_gdf.index,
+        CENT_DISTANCES,
+    )
+    lu_nodes_gdf, lu_edges_gdf = network_structures.prune_network(
+        nodes_gdf, edges_gdf, max(LU_DISTANCES)
+    )
+    network_structure = network_structures.build_network_structure(
+        lu_nodes_gdf, lu_edges_gdf, length_weighted=False
+    )
+    lu_data = landuse.compute_landuses(
+        premises_gdf, network_structure, nodes_gdf.index, LU_DISTANCES
+    )
+    return cent_data, lu_data
+
+
+def changed_values(data: pd.DataFrame, baseline: pd.DataFrame, rows: pd.Index) -> pd.Series:
+    baseline_vals = baseline.reindex(rows, columns=data.columns).to_numpy(dtype=result_store.DTYPE)
+    edited_vals = data.reindex(rows).to_numpy(dtype=result_store.DTYPE)
+    changed = ~np.isclose(edited_vals, baseline_vals, rtol=1e-5, atol=0, equal_nan=True)
+    row_idxs, col_idxs = np.nonzero(changed)
+    return pd.Series(
+        edited_vals[row_idxs, col_idxs],
+        index=pd.MultiIndex.from_arrays([rows[row_idxs], data.columns[col_idxs]]),
+    )
+
+
+@pytest.fixture
+def premises_gdf(streets_gdf):
+    premises_gdf = premises.clean_premises(synthetic.premises(streets_gdf, 300, seed=3))
+    premises_gdf.index = premises_gdf.index.astype(str)
+    return premises_gdf
+
+
+@pytest.fixture
+def baseline_results(dual_gdfs, premises_gdf, tmp_path):
+    nodes_gdf, edges_gdf = dual_gdfs
+    baseline = pd.concat(full_metrics(nodes_gdf, edges_gdf, premises_gdf), axis=1)
+    results = result_store.ResultStore.create(tmp_path / "results", nodes_gdf.index)
+    results.put(baseline)
+    return baseline, results
+
+
+def test_scenario_matches_full_recompute(dual_gdfs, premises_gdf, baseline_results):
+    nodes_gdf, edges_gdf = dual_gdfs
+    baseline, results = baseline_results
+    # remove a live street and join two others by a new street
+    live_nodes_gdf = nodes_gdf[nodes_gdf["live"]]
+    start, end = shapely.get_coordinates(live_nodes_gdf.geometry.iloc[[0, 5]])[[0, 2]]
+    scenario = scenarios.Scenario(
+        "edit",
+        add_streets=(shapely.LineString([start, end]),),
+        remove_streets=(live_nodes_gdf.index[10],),
+    )
+    diff = scenarios.evaluate_scenario(
+        scenario,
+        nodes_gdf,
+        edges_gdf,
+        results,
+        premises_gdf,
+        VARIANTS,
+        CENT_DISTANCES,
+        LU_DISTANCES,
+    )
+    assert list(diff.columns) == scenarios.DIFF_COLS
+    assert set(diff["status"]) == {"added", "removed", "changed"}
+    # the changes found by a full recompute against the edited network
+    edited = scenarios.edit_network(nodes_gdf, edges_gdf, scenario)
+    cent_data, lu_data = full_metrics(edited.nodes_gdf, edited.edges_gdf, premises_gdf)
+    live_index = edited.nodes_gdf.index[edited.nodes_gdf["live"]]
+    # premises equidistant to overlapping dual edges can be assigned to other nodes once the edge
+    # R-tree is rebuilt, so land-uses are only compared within their reach of the edits
+    node_points = shapely.points(edited.nodes_gdf[["x", "y"]].to_numpy())
+    lu_reach = max(LU_DISTANCES) + landuse.MAX_ASSIGN_DIST
+    lu_index = live_index[
+        landuse.within_distance(node_points, edited.edit_geoms, lu_reach)[
+            edited.nodes_gdf["live"].to_numpy()
+        ]
+    ]
+    expected = pd.concat(
+        [
+            changed_values(cent_data, baseline, live_index.union(edited.removed)),
+            changed_values(lu_data, baseline, lu_index.union(edited.removed)),
+        ]
+    ).sort_index()
+    assert expected.index.get_level_values(1).isin(lu_data.columns).any()
+    found = diff.set_index(["node", "column"])["edited"].sort_index()
+    assert found.index.equals(expected.index)
+    assert np.allclose(found, expected, rtol=1e-5, equal_nan=True)
+
+
+def test_undone_edit_near_boundary(dual_gdfs, live_geom, premises_gdf, baseline_results):
+    nodes_gdf, edges_gdf = dual_gdfs
+    _baseline, results = baseline_results
+    # the live street nearest the study boundary is removed and added back
+    live_nodes_gdf = nodes_gdf[nodes_gdf["live"]]
+    boundary_dists = shapely.distance(
+        live_geom.exterior, shapely.points(live_nodes_gdf[["x", "y"]].to_numpy())
+    )
+    dual_key = live_nodes_gdf.index[np.argmin(boundary_dists)]
+    scenario = scenarios.Scenario(
+        "undone",
+        add_streets=(nodes_gdf.geometry.loc[dual_key],),
+        remove_streets=(dual_key,),
+    )
+    edited = scenarios.edit_network(nodes_gdf, edges_gdf, scenario)
+    assert not len(edited.added) and not len(edited.removed)
+    assert edited.nodes_gdf.index.equals(nodes_gdf.index)
+    assert edited.edges_gdf.index.equals(edges_gdf.index)
+    diff = scenarios.evaluate_scenario(
+        scenario,
+        nodes_gdf,
+        edges_gdf,
+        results,
+        premises_gdf,
+        VARIANTS,
+        CENT_DISTANCES,
+        LU_DISTANCES,
+    )
+    assert diff.empty
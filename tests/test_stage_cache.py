@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from process import stage_cache
+
+
+@pytest.fixture
+def cache(tmp_path) -> stage_cache.StageCache:
+    return stage_cache.StageCache(tmp_path / "cache")
+
+
+def test_run_computes_once(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"rows": [1, 2, 3]}
+
+    key = cache.key("stage", "input_digest", [100, 200])
+    assert not cache.has("stage", key)
+    assert cache.run("stage", key, compute) == {"rows": [1, 2, 3]}
+    assert cache.run("stage", key, compute) == {"rows": [1, 2, 3]}
+    assert len(calls) == 1
+    assert cache.load("stage", cache.key("stage", "input_digest", [100])) is None
+
+
+def test_key_depends_on_stage_and_parts(cache):
+    key = cache.key("stage", "digest", {"a": 1, "b": 2})
+    assert key == cache.key("stage", "digest", {"b": 2, "a": 1})
+    assert key != cache.key("other", "digest", {"a": 1, "b": 2})
+    assert key != cache.key("stage", "digest", {"a": 1, "b": 3})
+
+
+def test_file_digest(cache, tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("streets")
+    digest = cache.file_digest(path)
+    assert digest == cache.file_digest(path)
+    path.write_text("streets and more")
+    assert cache.file_digest(path) != digest
+
+
+def test_evict_least_recently_used(tmp_path):
+    # room for three of the pickled entries
+    cache = stage_cache.StageCache(tmp_path / "cache", max_bytes=3500)
+    for idx, key in enumerate(["a", "b", "c"]):
+        cache.store("stage", key, b"x" * 1000)
+        entry_path = cache._entry_path("stage", key)
+        os.utime(entry_path, (idx, idx))
+    # reading an entry makes it the most recently used
+    cache.load("stage", "a")
+    cache.store("stage", "d", b"x" * 1000)
+    assert [cache.has("stage", key) for key in "abcd"] == [True, False, True, True]
+
+
+def test_disabled(tmp_path):
+    cache = stage_cache.StageCache(tmp_path / "cache", enabled=False)
+    cache.store("stage", "key", 1)
+    assert not cache.has("stage", "key")
+    assert cache.run("stage", "key", lambda: 2) == 2
+
+
+def test_store_keeps_the_written_entry(tmp_path):
+    cache = stage_cache.StageCache(tmp_path / "cache", max_bytes=3500)
+    for key in "ab":
+        cache.store("stage", key, b"x" * 1000)
+        # modified after the next write, e.g. per coarse timestamps or clock skew
+        entry_path = cache._entry_path("stage", key)
+        os.utime(entry_path, (time.time() + 60, time.time() + 60))
+    # an output larger than the cache is not stored, rather than evicting all entries
+    cache.store("stage", "c", b"x" * 4000)
+    assert [cache.has("stage", key) for key in "abc"] == [True, True, False]
+    assert cache.run("stage", "c", lambda: b"y" * 4000) == b"y" * 4000
+    assert not cache.has("stage", "c")
+    # the entry just written is kept even if it is the least recently modified
+    cache.store("stage", "d", b"x" * 2000)
+    assert [cache.has("stage", key) for key in "abd"] == [False, True, True]
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from process import centrality, network_structures, tiling
+
+DISTANCES = [200, 400]
+VARIANTS = [
+    centrality.CentralityVariant("shortest", length_weighted=True),
+    centrality.CentralityVariant("simplest"),
+    centrality.CentralityVariant("segment"),
+]
+
+
+def test_partition_tiles(dual_gdfs):
+    nodes_gdf, _edges_gdf = dual_gdfs
+    tiles = tiling.partition_tiles(nodes_gdf, tile_col=None, grid_size=300, max_tile_nodes=10)
+    tile_keys = pd.Index([key for tile_keys in tiles for key in tile_keys])
+    assert tile_keys.is_unique
+    assert tile_keys.sort_values().equals(nodes_gdf.index[nodes_gdf["live"]].sort_values())
+    assert max(len(tile_keys) for tile_keys in tiles) <= 10
+
+
+def test_tiled_matches_single_process(dual_gdfs):
+    nodes_gdf, edges_gdf = dual_gdfs
+    tiles = tiling.partition_tiles(nodes_gdf, tile_col=None, grid_size=300)
+    assert len(tiles) > 2
+    tiled_data = tiling.compute_centralities_tiled(
+        VARIANTS, nodes_gdf, edges_gdf, tiles, DISTANCES, max_workers=2
+    )
+    cent_data = centrality.compute_centralities(
+        VARIANTS,
+        lambda length_weighted: network_structures.build_network_structure(
+            nodes_gdf, edges_gdf, length_weighted
+        ),
+        nodes_gdf.index,
+        DISTANCES,
+    )
+    live_index = nodes_gdf.index[nodes_gdf["live"]]
+    pd.testing.assert_frame_equal(tiled_data.loc[live_index], cent_data.loc[live_index])